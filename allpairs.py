@@ -12,6 +12,7 @@ from helpers.logging import Logger, NotificationHandler
 from helpers.misc import wait_time_interval
 from helpers.threecommas import (
     get_threecommas_account_marketcode,
+    get_threecommas_bots_by_id,
     get_threecommas_market,
     init_threecommas_api,
     set_threecommas_bot_pairs,
@@ -85,12 +86,11 @@ def all_pairs(thebot):
     if not tickerlist:
         return
 
-    for pair in tickerlist:
-        if pair.split("_")[0] == base:
-            if pair in blacklist:
-                blackpairs.append(pair)
-                continue
-            newpairs.append(pair)
+    for pair in tickerlist.get_base_pairs(base):
+        if pair in blacklist:
+            blackpairs.append(pair)
+            continue
+        newpairs.append(pair)
 
     newpairs.sort()
 
@@ -121,6 +121,9 @@ parser = argparse.ArgumentParser(description="Cyberjunky's 3Commas bot helper.")
 parser.add_argument(
     "-d", "--datadir", help="directory to use for config and logs files", type=str
 )
+parser.add_argument(
+    "-s", "--sharedir", help="directory to use for shared files", type=str
+)
 parser.add_argument(
     "-b", "--blacklist", help="local blacklist to use instead of 3Commas's", type=str
 )
@@ -131,6 +134,12 @@ if args.datadir:
 else:
     datadir = os.getcwd()
 
+# pylint: disable-msg=C0103
+if args.sharedir:
+    sharedir = args.sharedir
+else:
+    sharedir = None
+
 # pylint: disable-msg=C0103
 if args.blacklist:
     blacklistfile = f"{datadir}/{args.blacklist}"
@@ -177,7 +186,7 @@ else:
     logger.info(f"Loaded configuration from '{datadir}/{program}.ini'")
 
 # Initialize 3Commas API
-api = init_threecommas_api(logger, config)
+api = init_threecommas_api(logger, config, sharedir)
 if not api:
     sys.exit(0)
 
@@ -195,19 +204,19 @@ while True:
     timeint = int(config.get("settings", "timeinterval"))
     botids = json.loads(config.get("settings", "botids"))
 
-    # Walk through all bots configured
-    for bot in botids:
-        boterror, botdata = api.request(
-            entity="bots",
-            action="show",
-            action_id=str(bot),
+    # Updating the pairs can wait while 3Commas is degraded
+    if api.circuitbreaker.is_open():
+        logger.warning(
+            "3Commas API is degraded, skipping the update of the bot pairs this interval",
+            False
         )
-        if botdata:
+    else:
+        # Walk through all bots configured
+        botsdata, boterrors = get_threecommas_bots_by_id(logger, api, botids)
+        for botdata in botsdata.values():
             all_pairs(botdata)
-        elif boterror and "msg" in boterror:
-            logger.error("Error occurred updating bots: %s" % boterror["msg"])
-        else:
-            logger.error("Error occurred updating bots")
+        for botid, message in boterrors.items():
+            logger.error(f"Error occurred updating bot {botid}: {message}")
 
     if not wait_time_interval(logger, notification, timeint):
         break
@@ -22,6 +22,7 @@ from helpers.threecommas import (
     get_threecommas_accounts,
     get_threecommas_bots,
     get_threecommas_deals,
+    get_threecommas_finished_deals,
     init_threecommas_api,
 )
 from helpers.threecommas_smarttrade import (
@@ -205,9 +206,10 @@ def process_bot_deals(bot_id, bot_name, strategy):
                 # If short is for one of the major types (currencies as supported by this script),
                 # we should take those SO funds also into account
 
-    finisheddeals = get_threecommas_deals(logger, api, bot_id, "finished")
+    # Fetch all deals closed since yesterday, not only the latest page
+    yesterdaydate = f"{(datetime.today() - timedelta(days=1)).strftime('%Y-%m-%d')}"
+    finisheddeals = get_threecommas_finished_deals(logger, api, bot_id, yesterdaydate)
     if finisheddeals is not None:
-        yesterdaydate = f"{(datetime.today() - timedelta(days=1)).strftime('%Y-%m-%d')}"
 
         # TODO Ready for improvement, compare date in a better way by converting to a
         # datetime object and using that
@@ -262,8 +262,8 @@ def convert_pairs(ticker_list, base, marketcode, black_list, pair_list):
         if currentbase in coin:
             coin = coin.replace(currentbase, "")
 
-        newpair = format_pair(marketcode, base, coin)
-        if newpair in ticker_list:
+        newpair = ticker_list.get_pair(base, coin)
+        if newpair:
             if newpair not in black_list:
                 convertedpairs.append(newpair)
             else:
@@ -272,7 +272,7 @@ def convert_pairs(ticker_list, base, marketcode, black_list, pair_list):
                 )
         else:
             logger.debug(
-                f"Converted pair {newpair} not in tickerlist"
+                f"Converted pair {format_pair(marketcode, base, coin)} not in tickerlist"
             )
 
     return convertedpairs
@@ -351,7 +351,7 @@ else:
     logger.info(f"Loaded configuration from '{datadir}/{program}.ini'")
 
 # Initialize 3Commas API
-api = init_threecommas_api(logger, config)
+api = init_threecommas_api(logger, config, sharedir)
 if not api:
     sys.exit(0)
 
@@ -8,7 +8,16 @@ import sqlite3
 import sys
 import time
 from pathlib import Path
-from helpers.database import get_next_process_time, set_next_process_time
+from helpers.database import (
+    check_identifier,
+    explain_query,
+    fetch_all,
+    fetch_one,
+    fetch_value,
+    open_database,
+    replace_row,
+    ProcessScheduler
+)
 
 from helpers.logging import Logger, NotificationHandler
 from helpers.misc import (
@@ -22,6 +31,7 @@ from helpers.threecommas import (
     control_threecommas_bots,
     get_threecommas_market,
     get_threecommas_account_marketcode,
+    get_threecommas_bots_by_id,
     init_threecommas_api,
     load_blacklist,
     set_threecommas_bot_pairs,
@@ -41,6 +51,7 @@ def load_config():
         "timeinterval": 3600,
         "debug": False,
         "debug-log-query": False,
+        "debug-query-plan": False,
         "logrotate": 7,
         "3c-apikey": "Your 3Commas API Key",
         "3c-apisecret": "Your 3Commas API Secret",
@@ -96,6 +107,14 @@ def upgrade_config(cfg):
 
         logger.info("Upgraded section settings to have debug-log-query option")
 
+    if not cfg.has_option("settings", "debug-query-plan"):
+        cfg.set("settings", "debug-query-plan", "False")
+
+        with open(f"{datadir}/{program}.ini", "w+") as cfgfile:
+            cfg.write(cfgfile)
+
+        logger.info("Upgraded section settings to have debug-query-plan option")
+
     for cfgsection in cfg.sections():
         if not cfgsection.startswith("bu_"):
             continue
@@ -160,9 +179,7 @@ def open_shared_db():
 
     try:
         shareddbname = "marketdata.sqlite3"
-        shareddbpath = f"file:{sharedir}/{shareddbname}?mode=rw"
-        shareddbconnection = sqlite3.connect(shareddbpath, uri=True)
-        shareddbconnection.row_factory = sqlite3.Row
+        shareddbconnection = open_database(f"{sharedir}/{shareddbname}", "rw")
 
         logger.info(f"Shared database '{sharedir}/{shareddbname}' opened successfully")
 
@@ -177,15 +194,12 @@ def open_bu_db():
 
     try:
         dbname = f"{program}.sqlite3"
-        dbpath = f"file:{datadir}/{dbname}?mode=rw"
-        dbconnection = sqlite3.connect(dbpath, uri=True)
-        dbconnection.row_factory = sqlite3.Row
+        dbconnection = open_database(f"{datadir}/{dbname}", "rw")
 
         logger.info(f"Database '{datadir}/{dbname}' opened successfully")
 
     except sqlite3.OperationalError:
-        dbconnection = sqlite3.connect(f"{datadir}/{dbname}")
-        dbconnection.row_factory = sqlite3.Row
+        dbconnection = open_database(f"{datadir}/{dbname}")
         dbcursor = dbconnection.cursor()
         logger.info(f"Database '{datadir}/{dbname}' created successfully")
 
@@ -215,28 +229,15 @@ def store_bot_maxdeals(bot_id, max_deals):
         f"Store max active deals {max_deals} for bot {bot_id}"
     )
 
-    db.execute(
-        f"INSERT OR REPLACE INTO bots ("
-        f"botid, "
-        f"max_deals "
-        f") VALUES ("
-        f"{bot_id}, {max_deals}"
-        f")"
-    )
-
-    db.commit()
+    replace_row(db, "bots", {"botid": bot_id, "max_deals": max_deals})
 
 
 def get_bot_maxdeals(bot_id):
     """Get the max deals of the given bot from the database"""
 
-    data = cursor.execute(
-        f"SELECT max_deals FROM bots WHERE botid = {bot_id}"
-    ).fetchone()
-
-    maxdeals = 0
-    if data:
-        maxdeals = data[0]
+    maxdeals = fetch_value(
+        db, "SELECT max_deals FROM bots WHERE botid = ?", (bot_id,), 0
+    )
 
     logger.debug(
         f"Database has {maxdeals} max active deals stored for bot {bot_id}"
@@ -311,21 +312,18 @@ def process_bu_section(section_id):
     )
 
     # Walk through all bots configured
+    botsdata, boterrors = get_threecommas_bots_by_id(logger, api, botids)
     for bot in botids:
-        error, data = api.request(
-            entity="bots",
-            action="show",
-            action_id=str(bot),
-        )
-        if data:
-            botsupdated |= update_bot_pairs(section_id, base, data, coindata, conditionstate)
+        if int(bot) in botsdata:
+            botsupdated |= update_bot_pairs(
+                section_id, base, botsdata[int(bot)], coindata, conditionstate
+            )
         else:
             botsupdated = False
 
-            if error and "msg" in error:
-                logger.error("Error occurred updating bots: %s" % error["msg"])
-            else:
-                logger.error("Error occurred updating bots")
+            logger.error(
+                f"Error occurred updating bot {bot}: {boterrors.get(int(bot), 'unknown error')}"
+            )
 
     return botsupdated
 
@@ -343,7 +341,8 @@ def evaluatecondition(condition_config):
         pair = entry["pair"].split("_")
 
         query = "SELECT prices.coin FROM prices "
-        query += f"WHERE prices.base = '{pair[0]}' AND prices.coin = '{pair[1]}' "
+        query += "WHERE prices.base = ? AND prices.coin = ? "
+        parameters = [pair[0], pair[1]]
 
         pricefilter = {}
 
@@ -351,14 +350,17 @@ def evaluatecondition(condition_config):
             if f"percent-change-{period}" in entry:
                 pricefilter[f"change_{period}"] = entry[f"percent-change-{period}"]
 
-        query += create_change_condition(pricefilter)
+        changequery, changeparameters = create_change_condition(pricefilter)
+        query += changequery
+        parameters += changeparameters
 
         if config.getboolean("settings", "debug-log-query"):
             logger.debug(
-                f"Execute condition query: {query}"
+                f"Execute condition query: {query} with {parameters}"
             )
+        log_query_plan(query, parameters)
 
-        dbresult = sharedcursor.execute(query).fetchone()
+        dbresult = fetch_one(shareddb, query, parameters)
         if dbresult is None:
             logger.info(
                 f"Condition {entry} not met!"
@@ -424,23 +426,9 @@ def update_bot_pairs(section_id, base, botdata, coindata, condition_state):
     if not marketcode:
         return botupdated
 
-    # Load tickerlist for this exchange. First try from the cache (which is only
-    # kept during the current cycle), otherwise fetch the tickerlist and add it
-    # to the cache
-    tickerlist = tickerlistcache.get(marketcode)
-    if not tickerlist:
-        tickerlist = get_threecommas_market(logger, api, marketcode)
-        tickerlistcache[marketcode] = tickerlist
-
-        logger.info(
-            f"Updated cache with tickerlist ({len(tickerlist)} pairs) "
-            f"for market '{marketcode}'."
-        )
-    else:
-        logger.debug(
-            f"Using cached tickerlist with {len(tickerlist)} pairs "
-            f"for market '{marketcode}'."
-        )
+    # Load tickerlist for this exchange. The indexed pairs are kept between cycles
+    # and checked for changes after their TTL
+    tickerlist = get_threecommas_market(logger, api, marketcode)
 
     # Process list of coins
     for coin in coindata[1]:
@@ -582,7 +570,8 @@ def get_coins_from_market_data(base, filteroptions):
     """Get pairs based on the specified filtering"""
 
     # Query for the total count of coins
-    countquery = f"SELECT COUNT(pairs.coin) FROM pairs WHERE base = '{base}'"
+    countquery = "SELECT COUNT(pairs.coin) FROM pairs WHERE base = ? "
+    countparameters = [base]
 
     # Base query and joining of all tables
     query = "SELECT pairs.coin FROM pairs "
@@ -590,59 +579,81 @@ def get_coins_from_market_data(base, filteroptions):
     query += "INNER JOIN prices ON pairs.base = prices.base AND pairs.coin = prices.coin "
 
     # Specify the base
-    query += f"WHERE pairs.base = '{base}' "
+    query += "WHERE pairs.base = ? "
+    parameters = [base]
 
     # Len greater than 2, because empty list has length of 2
     if "coin-whitelist" in filteroptions and len(filteroptions['coin-whitelist']) > 2:
         whitelistquery = "AND pairs.coin IN ("
-        whitelistquery += ", ".join(f'"{c}"' for c in filteroptions['coin-whitelist'])
+        whitelistquery += ", ".join("?" for _ in filteroptions['coin-whitelist'])
         whitelistquery += ") "
 
         # Include only the coins of the whitelist in the count
         countquery += whitelistquery
+        countparameters += filteroptions['coin-whitelist']
         query += whitelistquery
+        parameters += filteroptions['coin-whitelist']
 
     # Len greater than 2, because empty list has length of 2
     if "coin-blacklist" in filteroptions and len(filteroptions['coin-blacklist']) > 2:
         blacklistquery = "AND pairs.coin NOT IN ("
-        blacklistquery += ", ".join(f'"{c}"' for c in filteroptions['coin-blacklist'])
+        blacklistquery += ", ".join("?" for _ in filteroptions['coin-blacklist'])
         blacklistquery += ") "
 
         # Exclude the coins on the blacklist from the count
         countquery += blacklistquery
+        countparameters += filteroptions['coin-blacklist']
         query += blacklistquery
+        parameters += filteroptions['coin-blacklist']
 
     # Specify cmc-rank
     if "cmcrank" in filteroptions and len(filteroptions['cmcrank']) == 2:
-        query += "AND rankings.coinmarketcap "
-        query += f"BETWEEN {filteroptions['cmcrank'][0]} AND {filteroptions['cmcrank'][1]} "
+        query += "AND rankings.coinmarketcap BETWEEN ? AND ? "
+        parameters += filteroptions['cmcrank']
 
     # Specify altrank
     if "altrank" in filteroptions and len(filteroptions['altrank']) == 2:
-        query += "AND rankings.altrank "
-        query += f"BETWEEN {filteroptions['altrank'][0]} AND {filteroptions['altrank'][1]} "
+        query += "AND rankings.altrank BETWEEN ? AND ? "
+        parameters += filteroptions['altrank']
 
     # Specify galaxyscore
     if "galaxyscore" in filteroptions and len(filteroptions['galaxyscore']) == 2:
-        query += "AND rankings.galaxyscore "
-        query += f"BETWEEN {filteroptions['galaxyscore'][0]} AND {filteroptions['galaxyscore'][1]} "
+        query += "AND rankings.galaxyscore BETWEEN ? AND ? "
+        parameters += filteroptions['galaxyscore']
 
     # Specify percent change
     if "change" in filteroptions:
-        query += create_change_condition(filteroptions["change"])
+        changequery, changeparameters = create_change_condition(filteroptions["change"])
+        query += changequery
+        parameters += changeparameters
 
     if config.getboolean("settings", "debug-log-query"):
         logger.debug(
-            f"Build query for fetch of coins: {query}"
+            f"Build query for fetch of coins: {query} with {parameters}"
         )
+    log_query_plan(countquery, countparameters)
+    log_query_plan(query, parameters)
+
+    return (
+        fetch_one(shareddb, countquery, countparameters),
+        fetch_all(shareddb, query, parameters)
+    )
+
 
-    return sharedcursor.execute(countquery).fetchone(), sharedcursor.execute(query).fetchall()
+def log_query_plan(query, parameters):
+    """Log the query plan of the query, to check which indexes are used, when enabled"""
+
+    if config.getboolean("settings", "debug-query-plan"):
+        logger.debug(
+            f"Query plan of '{query}': {explain_query(shareddb, query, parameters)}"
+        )
 
 
 def create_change_condition(filteroptions):
-    """Build the WHERE query string part for price change"""
+    """Build the WHERE query string part for price change, and its parameters"""
 
     query = ""
+    parameters = []
 
     for key, value in filteroptions.items():
         # Only accept entries with lower and upper limit for price change
@@ -652,15 +663,12 @@ def create_change_condition(filteroptions):
         firstvalue = float(value[0])
         secondvalue = float(value[-1])
 
-        query += f"AND prices.{key} BETWEEN "
+        query += f"AND prices.{check_identifier(key)} BETWEEN ? AND ? "
 
         # Between needs the proper range, so keep that into account
-        if secondvalue < firstvalue:
-            query += f"{secondvalue} AND {firstvalue} "
-        else:
-            query += f"{firstvalue} AND {secondvalue} "
+        parameters += sorted([firstvalue, secondvalue])
 
-    return query
+    return query, parameters
 
 
 def create_marketcode_cache():
@@ -751,25 +759,24 @@ else:
     logger.info(f"Loaded configuration from '{datadir}/{program}.ini'")
 
 # Initialize 3Commas API
-api = init_threecommas_api(logger, config)
+api = init_threecommas_api(logger, config, sharedir)
 if not api:
     sys.exit(0)
 
 # Initialize or open the database
 db = open_bu_db()
-cursor = db.cursor()
+
+# Next processing time of each section
+scheduler = ProcessScheduler(db, "sections", "sectionid")
 
 # Open the shared database
 shareddb = open_shared_db()
-sharedcursor = shareddb.cursor()
 
 # Prefetch all Marketcodes to reduce API calls and improve speed
 # New bot(s) will also be added later, for example when the configuration
 # has been changed after starting this script
 marketcodecache = create_marketcode_cache()
 
-tickerlistcache = {}
-
 # Refresh coin pairs in 3C bots based on the market data
 while True:
 
@@ -783,17 +790,14 @@ while True:
     # Update the blacklist
     blacklist = load_blacklist(logger, api, blacklistfile)
 
-    # Cache is used for one cycle, where we can optimize. But, we want to prevent
-    # working with old data so therefor the clear before each cycle
-    tickerlistcache.clear()
-
     # Current time to determine which sections to process
     starttime = int(time.time())
 
+    scheduler.keep(config.sections())
     for section in config.sections():
         if section.startswith("bu_"):
             sectiontimeinterval = int(config.get(section, "timeinterval"))
-            nextprocesstime = get_next_process_time(db, "sections", "sectionid", section)
+            nextprocesstime = scheduler.get(section)
 
             # Only process the section if it's time for the next interval, or
             # time exceeds the check interval (clock has changed somehow)
@@ -801,16 +805,17 @@ while True:
                     abs(nextprocesstime - starttime) > sectiontimeinterval
             ):
                 if not process_bu_section(section):
-                    # Update failed somewhere, retry soon
-                    sectiontimeinterval = 60
+                    # Update failed somewhere, retry soon or when 3Commas has recovered
+                    sectiontimeinterval = max(60, int(api.circuitbreaker.get_retry_time()))
 
                     logger.error(
-                        f"Update for section {section} failed. Retry possible after 60 seconds."
+                        f"Update for section {section} failed. Retry possible after "
+                        f"{sectiontimeinterval} seconds."
                     )
 
                 # Determine new time to process this section
                 newtime = starttime + sectiontimeinterval
-                set_next_process_time(db, "sections", "sectionid", section, newtime)
+                scheduler.set(section, newtime)
             else:
                 logger.debug(
                     f"Section {section} will be processed after "
@@ -822,5 +827,10 @@ while True:
                 False
             )
 
+    scheduler.persist()
+
+    # Wait until the next section is due, and reload the configuration and blacklist
+    # at least each timeinterval
+    timeint = scheduler.get_wait_time(timeint)
     if not wait_time_interval(logger, notification, timeint, False):
         break
@@ -8,6 +8,7 @@ import sys
 import time
 from pathlib import Path
 
+from helpers.database import fetch_one, open_database, replace_row
 from helpers.logging import Logger, NotificationHandler
 from helpers.datasources import (
     get_shared_bot_data
@@ -89,12 +90,7 @@ def get_fields_and_types():
 def get_db_data(bot_id):
     """Get the saved dataset for the specified bot."""
 
-    record = cursor.execute(
-        f"SELECT * FROM bot_data "
-        f"WHERE bot_id = {bot_id}"
-    ).fetchone()
-
-    return record
+    return fetch_one(db, "SELECT * FROM bot_data WHERE bot_id = ?", (bot_id,))
 
 
 def store_bot_data(bot_data):
@@ -124,12 +120,7 @@ def store_bot_data(bot_data):
                 else:
                     values.append(int(bot_data[field]))
 
-    db.execute(
-        f"INSERT OR REPLACE INTO bot_data ({str(datadef.keys())[11:-2]}) "
-        f"VALUES ({str(values)[1:-1]})"
-    )
-
-    db.commit()
+    replace_row(db, "bot_data", dict(zip(datadef.keys(), values)))
 
     logger.info(
         f"Stored latest data for bot '{bot_data['bot_name']}' in database"
@@ -214,15 +205,12 @@ def init_botwatcher_db():
 
     try:
         dbname = f"{program}.sqlite3"
-        dbpath = f"file:{datadir}/{dbname}?mode=rw"
-        dbconnection = sqlite3.connect(dbpath, uri=True)
-        dbconnection.row_factory = sqlite3.Row
+        dbconnection = open_database(f"{datadir}/{dbname}", "rw")
 
         logger.info(f"Database '{datadir}/{dbname}' opened successfully")
 
     except sqlite3.OperationalError:
-        dbconnection = sqlite3.connect(f"{datadir}/{dbname}")
-        dbconnection.row_factory = sqlite3.Row
+        dbconnection = open_database(f"{datadir}/{dbname}")
         dbcursor = dbconnection.cursor()
         logger.info(f"Database '{datadir}/{dbname}' created successfully")
 
@@ -306,7 +294,6 @@ else:
 
 # Initialize or open the database
 db = init_botwatcher_db()
-cursor = db.cursor()
 
 # Bot monitor watching for configuration changes
 while True:
@@ -10,7 +10,10 @@ import sqlite3
 import sys
 import time
 from pathlib import Path
-from helpers.database import get_next_process_time, set_next_process_time
+from helpers.database import (
+    open_database,
+    ProcessScheduler
+)
 
 from helpers.datasources import (
     get_coinmarketcap_data
@@ -140,15 +143,12 @@ def open_cmc_db():
 
     try:
         dbname = f"{program}.sqlite3"
-        dbpath = f"file:{datadir}/{dbname}?mode=rw"
-        dbconnection = sqlite3.connect(dbpath, uri=True)
-        dbconnection.row_factory = sqlite3.Row
+        dbconnection = open_database(f"{datadir}/{dbname}", "rw")
 
         logger.info(f"Database '{datadir}/{dbname}' opened successfully")
 
     except sqlite3.OperationalError:
-        dbconnection = sqlite3.connect(f"{datadir}/{dbname}")
-        dbconnection.row_factory = sqlite3.Row
+        dbconnection = open_database(f"{datadir}/{dbname}")
         dbcursor = dbconnection.cursor()
         logger.info(f"Database '{datadir}/{dbname}' created successfully")
 
@@ -371,13 +371,15 @@ else:
     logger.info(f"Loaded configuration from '{datadir}/{program}.ini'")
 
 # Initialize 3Commas API
-api = init_threecommas_api(logger, config)
+api = init_threecommas_api(logger, config, sharedir)
 if not api:
     sys.exit(0)
 
 # Initialize or open the database
 db = open_cmc_db()
-cursor = db.cursor()
+
+# Next processing time of each section
+scheduler = ProcessScheduler(db, "sections", "sectionid")
 
 # Refresh coin pairs based on CoinMarketCap data
 while True:
@@ -395,10 +397,14 @@ while True:
     # Current time to determine which sections to process
     starttime = int(time.time())
 
+    # Set when CoinMarketCap replied with an error, to wait 24h
+    cmcerror = False
+
+    scheduler.keep(config.sections())
     for section in config.sections():
         if section.startswith("cmc_"):
             sectiontimeinterval = int(config.get(section, "timeinterval"))
-            nextprocesstime = get_next_process_time(db, "sections", "sectionid", section)
+            nextprocesstime = scheduler.get(section)
 
             # Only process the section if it's time for the next interval, or
             # time exceeds the check interval (clock has changed somehow)
@@ -432,6 +438,7 @@ while True:
                         f"Stop processing and retry in 24h again."
                     )
                     timeint = 86400
+                    cmcerror = True
 
                     # And exit loop so we can wait 24h before trying again
                     break
@@ -460,7 +467,7 @@ while True:
 
                     # Determine new time to process this section
                     newtime = starttime + sectiontimeinterval
-                    set_next_process_time(db, "sections", "sectionid", section, newtime)
+                    scheduler.set(section, newtime)
                 else:
                     logger.error("Error occurred during fetch of CMC data")
             else:
@@ -474,5 +481,11 @@ while True:
                 False
             )
 
+    scheduler.persist()
+
+    # Wait until the next section is due, and reload the configuration and blacklist
+    # at least each timeinterval
+    if not cmcerror:
+        timeint = scheduler.get_wait_time(timeint)
     if not wait_time_interval(logger, notification, timeint, False):
         break
@@ -10,16 +10,17 @@ import sys
 import time
 from pathlib import Path
 
+from helpers.database import open_database
 from helpers.logging import Logger, NotificationHandler
 from helpers.misc import (
     calculate_deal_funds,
-    check_deal,
     get_round_digits,
     remove_prefix,
     wait_time_interval
 )
 from helpers.threecommas import (
-    get_threecommas_deals,
+    get_threecommas_bots_by_id,
+    get_threecommas_finished_deals,
     init_threecommas_api
 )
 
@@ -127,7 +128,7 @@ def get_logged_profit_for_bot(bot_id):
     """Get the sum of all logged profit"""
 
     data = cursor.execute(
-        f"SELECT sum(profit) FROM deals WHERE botid = {bot_id}"
+        "SELECT sum(profit) FROM deals WHERE botid = ?", (bot_id,)
     ).fetchone()[0]
 
     if data is None:
@@ -158,19 +159,19 @@ def update_bot_order_volumes(
     #### db_lastcalcbo = Last Calculated BO from Database
     #### db_lastcalcso = Last Caclulated SO from Database
     db_lastpassupdate = cursor.execute(
-        f"SELECT lastpassupdate FROM bots WHERE botid = {bot_id}"
+        "SELECT lastpassupdate FROM bots WHERE botid = ?", (bot_id,)
     ).fetchone()[0]
     logger.debug(
         f"lastpassupdate value in db is {db_lastpassupdate}"
     )
     db_lastcalcbo = cursor.execute(
-        f"SELECT lastcalcbo FROM bots WHERE botid = {bot_id}"
+        "SELECT lastcalcbo FROM bots WHERE botid = ?", (bot_id,)
     ).fetchone()[0]
     logger.debug(
         f"lastcalcbo value in db is {db_lastcalcbo}"
     )
     db_lastcalcso = cursor.execute(
-        f"SELECT lastcalcso FROM bots WHERE botid = {bot_id}"
+        "SELECT lastcalcso FROM bots WHERE botid = ?", (bot_id,)
     ).fetchone()[0]
     logger.debug(
         f"lastcalcso value in db is {db_lastcalcso}"
@@ -199,7 +200,7 @@ def update_bot_order_volumes(
             )
 
     db.execute(
-        f"UPDATE bots SET lastcalcbo = {new_base_order_volume} WHERE botid = {bot_id}"
+        "UPDATE bots SET lastcalcbo = ? WHERE botid = ?", (new_base_order_volume, bot_id)
     )
     logger.info(
         "Calculated BO volume changed from: %s to %s"
@@ -208,7 +209,7 @@ def update_bot_order_volumes(
 
     if max_safety_orders > 0:
         db.execute(
-            f"UPDATE bots SET lastcalcso = {new_safety_order_volume} WHERE botid = {bot_id}"
+            "UPDATE bots SET lastcalcso = ? WHERE botid = ?", (new_safety_order_volume, bot_id)
         )
         logger.info(
             "Calculated SO volume changed from: %s to %s"
@@ -234,7 +235,7 @@ def update_bot_order_volumes(
             "The new BO value would not change with these deals, only storing value in database"
         )
         db.execute(
-            f"UPDATE bots SET lastpassupdate = 'No' WHERE botid = {bot_id}"
+            "UPDATE bots SET lastpassupdate = ? WHERE botid = ?", ("No", bot_id)
         )
         db.commit()
     else:
@@ -264,7 +265,7 @@ def update_bot_order_volumes(
 
         if data:
             db.execute(
-                f"UPDATE bots SET lastpassupdate = 'Yes' WHERE botid = {bot_id}"
+                "UPDATE bots SET lastpassupdate = ? WHERE botid = ?", ("Yes", bot_id)
             )
             db.commit()
 
@@ -295,28 +296,41 @@ def update_bot_order_volumes(
                 logger.error("Error occurred updating bot with new BO/SO values")
 
 
+def get_new_finished_deals(bot_id):
+    """Get the finished deals of the bot which haven't been processed yet."""
+
+    lastclosedat = cursor.execute(
+        "SELECT MAX(closed_at) FROM deals WHERE botid = ?", (bot_id,)
+    ).fetchone()[0]
+
+    # Deals closed at the last moment, or processed before closed_at was stored
+    knowndealids = {
+        row[0] for row in cursor.execute(
+            "SELECT dealid FROM deals WHERE botid = ? AND (closed_at IS NULL OR closed_at = ?)",
+            (bot_id, lastclosedat)
+        )
+    }
+
+    # A new bot only processes the latest deals, not its whole history
+    return get_threecommas_finished_deals(
+        logger, api, bot_id, lastclosedat, knowndealids,
+        None if (lastclosedat or knowndealids) else 1
+    )
+
+
 def process_deals(deals):
-    """Check deals from bot."""
-
-    deals_count = 0
-    profit_sum = 0.0
-
-    for deal in deals:
-        deal_id = deal["id"]
-        bot_id = deal["bot_id"]
-        # Register deal in database
-        exist = check_deal(cursor, deal_id)
-        if exist:
-            logger.debug("Deal with id '%s' already processed, skipping." % deal_id)
-        else:
-            # Deal not processed yet
-            profit = float(deal["final_profit"])
-            deals_count += 1
-            profit_sum += profit
+    """Register the new deals of the bot."""
 
-            db.execute(
-                f"INSERT INTO deals (dealid, profit, botid) VALUES ({deal_id}, {profit}, {bot_id})"
-            )
+    deals_count = len(deals)
+    profit_sum = sum(float(deal["final_profit"]) for deal in deals)
+
+    db.executemany(
+        "INSERT OR IGNORE INTO deals (dealid, profit, botid, closed_at) VALUES (?, ?, ?, ?)",
+        [
+            (deal["id"], float(deal["final_profit"]), deal["bot_id"], deal["closed_at"])
+            for deal in deals
+        ]
+    )
 
     logger.info("Finished deals: %s total profit: %s" % (deals_count, profit_sum))
     db.commit()
@@ -336,7 +350,7 @@ def get_bot_values(thebot):
     bot_id = thebot["id"]
 
     data = cursor.execute(
-        f"SELECT startbo, startso, startactivedeals FROM bots WHERE botid = {bot_id}"
+        "SELECT startbo, startso, startactivedeals FROM bots WHERE botid = ?", (bot_id,)
     ).fetchone()
 
     if data:
@@ -354,8 +368,9 @@ def get_bot_values(thebot):
         startso = float(thebot["safety_order_volume"])
         startactivedeals = thebot["max_active_deals"]
         db.execute(
-            f"INSERT INTO bots (botid, startbo, startso, startactivedeals) "
-            f"VALUES ({bot_id}, {startbo}, {startso}, {startactivedeals})"
+            "INSERT INTO bots (botid, startbo, startso, startactivedeals) "
+            "VALUES (?, ?, ?, ?)",
+            (bot_id, startbo, startso, startactivedeals)
         )
 
         logger.info(
@@ -382,7 +397,7 @@ def update_bot_max_deals(thebot, org_base_order, org_safety_order, new_max_deals
     )
 
     db.execute(
-        f"UPDATE bots SET lastcalcbo = {org_base_order} WHERE botid = {bot_id}"
+        "UPDATE bots SET lastcalcbo = ? WHERE botid = ?", (org_base_order, bot_id)
     )
     logger.info(
         "Calculated BO volume changed from: %s to %s"
@@ -390,7 +405,7 @@ def update_bot_max_deals(thebot, org_base_order, org_safety_order, new_max_deals
     )
 
     db.execute(
-        f"UPDATE bots SET lastcalcso = {org_safety_order} WHERE botid = {bot_id}"
+        "UPDATE bots SET lastcalcso = ? WHERE botid = ?", (org_safety_order, bot_id)
     )
     logger.info(
         "Calculated SO volume changed from: %s to %s"
@@ -461,14 +476,14 @@ def update_bot_max_safety_orders(
         % (max_safety_orders, new_max_safety_orders)
     )
     db.execute(
-        f"UPDATE bots SET lastcalcbo = {org_base_order} WHERE botid = {bot_id}"
+        "UPDATE bots SET lastcalcbo = ? WHERE botid = ?", (org_base_order, bot_id)
     )
     logger.info(
         "Calculated BO volume changed from: %s to %s"
         % (base_order_volume, org_base_order)
     )
     db.execute(
-        f"UPDATE bots SET lastcalcso = {org_safety_order} WHERE botid = {bot_id}"
+        "UPDATE bots SET lastcalcso = ? WHERE botid = ?", (org_safety_order, bot_id)
     )
     logger.info(
         "Calculated SO volume changed from: %s to %s"
@@ -528,7 +543,7 @@ def compound_bot(cfg, thebot):
     bot_name = thebot["name"]
     bot_id = thebot["id"]
 
-    deals = get_threecommas_deals(logger, api, bot_id)
+    deals = get_new_finished_deals(bot_id)
     bot_profit_percentage = float(
         cfg.get(
             f"bot_{bot_id}",
@@ -774,18 +789,17 @@ def init_compound_db():
     """Create or open database to store bot and deals data."""
     try:
         dbname = f"{program}.sqlite3"
-        dbpath = f"file:{datadir}/{dbname}?mode=rw"
-        dbconnection = sqlite3.connect(dbpath, uri=True)
+        dbconnection = open_database(f"{datadir}/{dbname}", "rw")
 
         logger.info(f"Database '{datadir}/{dbname}' opened successfully")
 
     except sqlite3.OperationalError:
-        dbconnection = sqlite3.connect(f"{datadir}/{dbname}")
+        dbconnection = open_database(f"{datadir}/{dbname}")
         dbcursor = dbconnection.cursor()
         logger.info(f"Database '{datadir}/{dbname}' created successfully")
 
         dbcursor.execute(
-            "CREATE TABLE deals (dealid INT Primary Key, profit REAL, botid int)"
+            "CREATE TABLE deals (dealid INT Primary Key, profit REAL, botid int, closed_at TEXT)"
         )
         dbcursor.execute(
             "CREATE TABLE bots (botid INT Primary Key, startbo REAL, startso REAL, startactivedeals int, lastcalcbo REAL, lastcalcso REAL, lastpassupdate TEXT)"
@@ -809,6 +823,12 @@ def upgrade_compound_db():
     except sqlite3.OperationalError:
         pass
 
+    try:
+        cursor.execute("ALTER TABLE deals ADD COLUMN closed_at TEXT")
+        logger.info("Database table deals upgraded (column closed_at)")
+    except sqlite3.OperationalError:
+        pass
+
     try:
         cursor.execute(
             "CREATE TABLE bots (botid INT Primary Key, startbo REAL, startso REAL, startactivedeals int)"
@@ -831,6 +851,9 @@ program = Path(__file__).stem
 # Parse and interpret options.
 parser = argparse.ArgumentParser(description="Cyberjunky's 3Commas bot helper.")
 parser.add_argument("-d", "--datadir", help="data directory to use", type=str)
+parser.add_argument(
+    "-s", "--sharedir", help="directory to use for shared files", type=str
+)
 
 args = parser.parse_args()
 if args.datadir:
@@ -838,6 +861,12 @@ if args.datadir:
 else:
     datadir = os.getcwd()
 
+# pylint: disable-msg=C0103
+if args.sharedir:
+    sharedir = args.sharedir
+else:
+    sharedir = None
+
 # Create or load configuration file
 config = load_config()
 if not config:
@@ -874,7 +903,7 @@ else:
 
 
 # Initialize 3Commas API
-api = init_threecommas_api(logger, config)
+api = init_threecommas_api(logger, config, sharedir)
 if not api:
     sys.exit(0)
 
@@ -899,26 +928,29 @@ while True:
     # Configuration settings
     timeint = int(config.get("settings", "timeinterval"))
 
+    # Fetch the data of all configured bots at once
+    botsdata, boterrors = get_threecommas_bots_by_id(
+        logger, api,
+        [
+            remove_prefix(section, "bot_")
+            for section in config.sections()
+            if section.startswith("bot_") and remove_prefix(section, "bot_").isdigit()
+        ]
+    )
+
     for section in config.sections():
         # Each section is a bot
         if section.startswith("bot_"):
             botid = remove_prefix(section, "bot_")
 
-            if botid:
-                boterror, botdata = api.request(
-                    entity="bots",
-                    action="show",
-                    action_id=str(botid),
-                )
-                if botdata:
-                    compound_bot(config, botdata)
+            if botid and botid.isdigit():
+                if int(botid) in botsdata:
+                    compound_bot(config, botsdata[int(botid)])
                 else:
-                    if boterror and "msg" in boterror:
-                        logger.error(
-                            "Error occurred updating bots: %s" % boterror["msg"]
-                        )
-                    else:
-                        logger.error("Error occurred updating bots")
+                    logger.error(
+                        f"Error occurred updating bot {botid}: "
+                        f"{boterrors.get(int(botid), 'unknown error')}"
+                    )
             else:
                 logger.error("Invalid botid found: %s" % botid)
         elif section not in "settings":
@@ -4,12 +4,15 @@ import argparse
 import configparser
 import json
 import os
+import queue
 import sqlite3
 import sys
+import threading
 import time
 from pathlib import Path
 from constants.pair import PAIREXCLUDE_EXT
 
+from helpers.database import fetch_all, open_database
 from helpers.logging import (
     Logger,
     NotificationHandler
@@ -27,6 +30,12 @@ from helpers.threecommas import (
     set_threecommas_bot_pairs
 )
 
+# Maximum number of websocket events waiting to be handled
+EVENT_QUEUE_SIZE = 1000
+
+# Number of seconds to collect a burst of websocket events before handling them
+EVENT_COALESCE_SECONDS = 0.5
+
 
 def load_config():
     """Create default or load existing config file."""
@@ -76,15 +85,12 @@ def init_cluster_db():
     """Create or open database to store cluster and coin data."""
     try:
         dbname = f"{program}.sqlite3"
-        dbpath = f"file:{datadir}/{dbname}?mode=rw"
-        dbconnection = sqlite3.connect(dbpath, uri=True)
-        dbconnection.row_factory = sqlite3.Row
+        dbconnection = open_database(f"{datadir}/{dbname}", "rw")
 
         logger.info(f"Database '{datadir}/{dbname}' opened successfully")
 
     except sqlite3.OperationalError:
-        dbconnection = sqlite3.connect(f"{datadir}/{dbname}")
-        dbconnection.row_factory = sqlite3.Row
+        dbconnection = open_database(f"{datadir}/{dbname}")
         dbcursor = dbconnection.cursor()
         logger.info(f"Database '{datadir}/{dbname}' created successfully")
 
@@ -116,9 +122,7 @@ def init_thread_db():
     """Open connection with database for usage in thread"""
 
     dbname = f"{program}.sqlite3"
-    dbpath = f"file:{datadir}/{dbname}?mode=rw"
-    dbconnection = sqlite3.connect(dbpath, uri=True)
-    dbconnection.row_factory = sqlite3.Row
+    dbconnection = open_database(f"{datadir}/{dbname}", "rw")
 
     return dbconnection
 
@@ -163,8 +167,9 @@ def add_cluster_deal(db_connection, deal_data, cluster_id):
         coin = deal_data['pair'].split("_")[1]
 
         db_connection.execute(
-            f"INSERT INTO deals (dealid, coin, clusterid, botid, active) "
-            f"VALUES ({deal_id}, '{coin}', '{cluster_id}', {deal_data['bot_id']}, {1})"
+            "INSERT INTO deals (dealid, coin, clusterid, botid, active) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (deal_id, coin, cluster_id, deal_data["bot_id"], 1)
         )
         # db.commit() on higher level
 
@@ -192,22 +197,19 @@ def process_bot_deals(cluster_id, bot_data):
 
         # Remove all other deals as not active anymore.
         if current_deals:
-            # Remove start and end square bracket so we can properly use it
-            current_deals_str = str(current_deals)[1:-1]
-
-            logger.debug(f"Delete finished deals from {bot_id} except {current_deals_str}")
+            logger.debug(f"Delete finished deals from {bot_id} except {current_deals}")
 
+            placeholders = ", ".join("?" for _ in current_deals)
             db.execute(
-                f"DELETE FROM deals "
-                f"WHERE botid = {bot_id} AND dealid NOT IN ({current_deals_str})"
+                f"DELETE FROM deals WHERE botid = ? AND dealid NOT IN ({placeholders})",
+                (bot_id, *current_deals)
             )
 
     # No deals for this bot anymore, so remove them all (if any left)
     if not current_deals:
         logger.debug(f"No deals active for {bot_id}")
         db.execute(
-            f"DELETE FROM deals "
-            f"WHERE botid = {bot_id}"
+            "DELETE FROM deals WHERE botid = ?", (bot_id,)
         )
 
     # Commit the added and removed deals to the db
@@ -220,38 +222,42 @@ def aggregrate_cluster(db_connection, cluster_id, bot_list):
     logger.debug(f"Cleaning and aggregating data for '{cluster_id}'")
 
     # Get the current cluster data and pair numbers
-    oldclusterdata = [c[0] for c in db_connection.execute(
-        f"SELECT coin FROM cluster_coins "
-        f"WHERE clusterid = '{cluster_id}' AND "
-        f"number_active >= {int(config.get(cluster_id, 'max-same-deals'))} "
-        f"ORDER BY coin ASC"
-    ).fetchall()]
+    maxsamedeals = int(config.get(cluster_id, "max-same-deals"))
+    oldclusterdata = [c[0] for c in fetch_all(
+        db_connection,
+        "SELECT coin FROM cluster_coins "
+        "WHERE clusterid = ? AND number_active >= ? "
+        "ORDER BY coin ASC",
+        (cluster_id, maxsamedeals)
+    )]
 
     # Remove current data
     db_connection.execute(
-        f"DELETE from cluster_coins WHERE clusterid = '{cluster_id}'"
+        "DELETE from cluster_coins WHERE clusterid = ?", (cluster_id,)
     )
 
     # Create the cluster data, how many of the same coins are active within the
     # cluster based on the active deals
     db_connection.execute(
-        f"INSERT INTO cluster_coins (clusterid, coin, number_active) "
-        f"SELECT clusterid, coin, "
-        f"SUM ( CASE WHEN active = {1} THEN 1 ELSE 0 END) AS number_active "
-        f"FROM deals "
-        f"WHERE clusterid = '{cluster_id}' "
-        f"GROUP BY coin"
+        "INSERT INTO cluster_coins (clusterid, coin, number_active) "
+        "SELECT clusterid, coin, "
+        "SUM ( CASE WHEN active = 1 THEN 1 ELSE 0 END) AS number_active "
+        "FROM deals "
+        "WHERE clusterid = ? "
+        "GROUP BY coin",
+        (cluster_id,)
     )
 
     db_connection.commit()
 
     # Get the new cluster data and pair numbers
-    newclusterdata = [c[0] for c in db_connection.execute(
-        f"SELECT coin FROM cluster_coins "
-        f"WHERE clusterid = '{cluster_id}' AND "
-        f"number_active >= {int(config.get(cluster_id, 'max-same-deals'))} "
-        f"ORDER BY coin ASC"
-    ).fetchall()]
+    newclusterdata = [c[0] for c in fetch_all(
+        db_connection,
+        "SELECT coin FROM cluster_coins "
+        "WHERE clusterid = ? AND number_active >= ? "
+        "ORDER BY coin ASC",
+        (cluster_id, maxsamedeals)
+    )]
 
     log_cluster_changes(cluster_id, oldclusterdata, newclusterdata)
 
@@ -308,23 +314,71 @@ def write_bot_exclude_file(bot_id, coins):
 
 
 def websocket_update(deal_data):
-    """Handle the received deal data from the websocket"""
+    """Queue the received deal data from the websocket, to be handled by the worker"""
+
+    # Blocks only when the worker is far behind, which keeps the queue bounded
+    eventqueue.put(deal_data)
+
+
+def process_websocket_events():
+    """Handle the queued websocket deal data, using one database connection. All events
+    of a burst are handled together, so each cluster is aggregated and updated once."""
+
+    threaddb = init_thread_db()
+
+    while True:
+        events = [eventqueue.get()]
+
+        # Give a burst (like deals opened at the same time) a moment to arrive
+        time.sleep(EVENT_COALESCE_SECONDS)
+        while True:
+            try:
+                events.append(eventqueue.get_nowait())
+            except queue.Empty:
+                break
+
+        try:
+            clusterids = set()
+            for deal_data in events:
+                clusterid = handle_deal_event(threaddb, deal_data)
+                if clusterid:
+                    clusterids.add(clusterid)
+            threaddb.commit()
+
+            logger.debug(
+                f"Handled {len(events)} websocket event(s) affecting cluster(s) {sorted(clusterids)}"
+            )
+
+            for clusterid in clusterids:
+                # Get Bot list
+                botlist = json.loads(config.get(clusterid, "botids"))
+                aggregrate_cluster(threaddb, clusterid, botlist)
+                process_cluster_bots(clusterid, botlist, "update")
+        except Exception as err:  # pylint: disable=broad-except
+            logger.error(f"Handling websocket events failed: {err}")
+            threaddb.rollback()
+
+        # Send notifications, if there are any
+        notification.send_notification()
+
+
+def handle_deal_event(db_connection, deal_data):
+    """Handle the deal data received from the websocket. Returns the cluster which
+    should be aggregated again, or an empty string"""
 
     # Indicator if the cluster should be aggregrated again. Updates over the websocket
     # also contain filled SO's which don't have impact on the cluster
     aggregrate = False
     clusterid = ""
 
-    threaddb = init_thread_db()
-    existingdeal = check_deal(threaddb.cursor(), deal_data["id"])
+    existingdeal = check_deal(db_connection.cursor(), deal_data["id"])
 
     if existingdeal and deal_data["finished?"]:
         # Deal is finished, remove it from the db
-        threaddb.execute(
-            f"DELETE FROM deals "
-            f"WHERE botid = {deal_data['bot_id']} AND dealid = {deal_data['id']}"
+        db_connection.execute(
+            "DELETE FROM deals WHERE botid = ? AND dealid = ?",
+            (deal_data["bot_id"], deal_data["id"])
         )
-        threaddb.commit()
 
         logger.info(
             f"Deal {deal_data['id']}/{deal_data['pair']} on "
@@ -342,9 +396,7 @@ def websocket_update(deal_data):
             clusterid = get_bot_cluster(deal_data["bot_id"])
 
             if clusterid:
-                add_cluster_deal(threaddb, deal_data, clusterid)
-
-                threaddb.commit()
+                add_cluster_deal(db_connection, deal_data, clusterid)
 
                 aggregrate = True
             #else:
@@ -352,20 +404,13 @@ def websocket_update(deal_data):
         #else:
             # Here we could inform the user about deal updates (filled SO, trailing activated)
 
-    if aggregrate:
-        if clusterid:
-            # Get Bot list
-            botlist = json.loads(config.get(clusterid, "botids"))
-            aggregrate_cluster(threaddb, clusterid, botlist)
-            process_cluster_bots(clusterid, botlist, "update")
-        else:
-            logger.error(
-                f"Deal {deal_data['id']}/{deal_data['pair']} needs "
-                f"to be aggregated but cluster is unknown!"
-            )
+    if aggregrate and not clusterid:
+        logger.error(
+            f"Deal {deal_data['id']}/{deal_data['pair']} needs "
+            f"to be aggregated but cluster is unknown!"
+        )
 
-    # Send notifications, if there are any
-    notification.send_notification()
+    return clusterid if aggregrate else ""
 
 
 def process_cluster_bots(cluster_id, bot_list, action):
@@ -532,7 +577,7 @@ else:
     logger.info(f"Loaded configuration from '{datadir}/{program}.ini'")
 
 # Initialize 3Commas API
-api = init_threecommas_api(logger, config)
+api = init_threecommas_api(logger, config, sharedir)
 if not api:
     sys.exit(0)
 
@@ -548,8 +593,12 @@ upgrade_cluster_db()
 # has been changed after starting this script
 marketcodecache = create_marketcode_cache()
 
+# Handle the websocket events in a worker, so the websocket thread is never blocked
+eventqueue = queue.Queue(EVENT_QUEUE_SIZE)
+threading.Thread(target=process_websocket_events, name="dealcluster-events", daemon=True).start()
+
 # Initialize 3Commas WebSocket connection
-websocket = init_threecommas_websocket(logger, config, websocket_update)
+websocket = init_threecommas_websocket(logger, config, websocket_update, api=api)
 if not websocket:
     sys.exit(0)
 websocket.start_listener(seperate_thread = True)
@@ -1,33 +1,256 @@
 """Cyberjunky's 3Commas bot helpers."""
 
+import heapq
+import pathlib
+import re
+import sqlite3
+import threading
 import time
+from contextlib import contextmanager
 
+# Page cache per connection in KiB (negative cache_size) and the size of the memory map
+SQLITE_CACHE_SIZE_KB = 16384
+SQLITE_MMAP_SIZE = 64 * 1024 * 1024
 
-def get_next_process_time(database, table, column, value_id):
-    """Get the next processing time for the specified bot."""
+# Number of seconds to wait for a lock held by another connection or script
+SQLITE_TIMEOUT = 10
 
-    dbrow = database.cursor().execute(
-            f"SELECT next_processing_timestamp FROM {table} WHERE {column} = '{value_id}'"
-        ).fetchone()
+# Number of prepared statements kept per connection
+SQLITE_CACHED_STATEMENTS = 256
 
-    # Start with initial time, and substract one second to allow direct processing
-    # for sections that did'nt have any previous process time stored
-    nexttime = int(time.time() - 1.0)
-    if dbrow is not None:
-        nexttime = dbrow["next_processing_timestamp"]
-    else:
-        # Record missing, create one
-        set_next_process_time(database, table, column, value_id, nexttime)
+# Connections (pool) and the nesting depth of their write batch (batches) per thread
+_connections = threading.local()
 
-    return nexttime
 
+def open_database(path, mode="rwc", autocommit=False):
+    """Return the connection of this thread to the database, opened on first use.
 
-def set_next_process_time(database, table, column, value_id, new_time):
-    """Set the next processing time for the specified bot."""
+    The connection uses WAL, so readers (for example botupdater.py) are never blocked
+    by a writer (marketcollector.py) of the same database. With mode 'rw' an
+    sqlite3.OperationalError is raised when the database doesn't exist yet. With
+    autocommit, transactions are only started by an explicit BEGIN."""
 
-    database.execute(
-        f"REPLACE INTO {table} ({column}, next_processing_timestamp) "
-        f"VALUES ('{value_id}', {new_time})"
+    pool = _connections.__dict__.setdefault("pool", {})
+
+    dbconnection = pool.get(path)
+    if dbconnection is not None:
+        try:
+            dbconnection.total_changes  # pylint: disable=pointless-statement
+            return dbconnection
+        except sqlite3.ProgrammingError:
+            # Closed by the caller, open a new one
+            del pool[path]
+
+    dbconnection = sqlite3.connect(
+        f"{pathlib.Path(path).absolute().as_uri()}?mode={mode}",
+        uri=True,
+        timeout=SQLITE_TIMEOUT,
+        cached_statements=SQLITE_CACHED_STATEMENTS,
+    )
+    dbconnection.row_factory = sqlite3.Row
+    if autocommit:
+        dbconnection.isolation_level = None
+
+    dbconnection.execute("PRAGMA journal_mode=WAL")
+    dbconnection.execute("PRAGMA synchronous=NORMAL")
+    dbconnection.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    dbconnection.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    dbconnection.execute("PRAGMA temp_store=MEMORY")
+
+    pool[path] = dbconnection
+
+    return dbconnection
+
+
+def open_memory_database(autocommit=False):
+    """Return a new in-memory database, private to the caller. It can be used by all
+    threads, so the caller must serialize the access."""
+
+    dbconnection = sqlite3.connect(
+        ":memory:", check_same_thread=False, cached_statements=SQLITE_CACHED_STATEMENTS
     )
+    dbconnection.row_factory = sqlite3.Row
+    if autocommit:
+        dbconnection.isolation_level = None
+
+    return dbconnection
+
+
+@contextmanager
+def write_batch(database):
+    """Commit all writes made within the block at once at the end, instead of one
+    commit (and disk sync) per write. Use flush() before actions which can't be
+    undone, so the stored state is on disk before they are done."""
+
+    batches = _connections.__dict__.setdefault("batches", {})
+    batches[database] = batches.get(database, 0) + 1
+    try:
+        yield database
+    finally:
+        batches[database] -= 1
+        if batches[database] == 0:
+            del batches[database]
+
+            # Also on errors, the writes reflect what has been done on 3Commas
+            database.commit()
+
+
+def commit(database):
+    """Commit the writes, unless within a write batch which commits them at the end."""
+
+    if database not in _connections.__dict__.get("batches", {}):
+        database.commit()
+
+
+def flush(database):
+    """Commit the writes made so far, also within a write batch."""
 
     database.commit()
+
+
+def check_identifier(name):
+    """Return the table or column name, after checking it is a plain identifier.
+    Names can't be passed as parameters, so they must never come from data."""
+
+    if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", name):
+        raise ValueError(f"Invalid SQL identifier '{name}'")
+
+    return name
+
+
+def fetch_one(database, query, parameters=()):
+    """Return the first row of the parameterized query, or None."""
+
+    return database.execute(query, parameters).fetchone()
+
+
+def fetch_all(database, query, parameters=()):
+    """Return all rows of the parameterized query."""
+
+    return database.execute(query, parameters).fetchall()
+
+
+def fetch_value(database, query, parameters=(), default=None):
+    """Return the first column of the first row of the parameterized query, or the
+    default when there is no row."""
+
+    dbrow = database.execute(query, parameters).fetchone()
+
+    return dbrow[0] if dbrow is not None else default
+
+
+def replace_row(database, table, values):
+    """Insert or replace the row with the values (column: value) in the table."""
+
+    columns = ", ".join(check_identifier(column) for column in values)
+    placeholders = ", ".join("?" for _ in values)
+
+    database.execute(
+        f"REPLACE INTO {check_identifier(table)} ({columns}) VALUES ({placeholders})",
+        tuple(values.values())
+    )
+
+    commit(database)
+
+
+def explain_query(database, query, parameters=()):
+    """Return the query plan of the parameterized query, one line per step, to check
+    which indexes are used."""
+
+    return [
+        dbrow["detail"] for dbrow in database.execute(f"EXPLAIN QUERY PLAN {query}", parameters)
+    ]
+
+
+class ProcessScheduler:
+    """Next processing times of the sections or bots of a script, kept in memory.
+
+    The times are read from the table once. Changes are written by persist() in one
+    batch, so the loops don't need a query and commit per section or bot."""
+
+    def __init__(self, database, table, column):
+        self.database = database
+        self.table = check_identifier(table)
+        self.column = check_identifier(column)
+
+        self.times = {
+            str(dbrow[0]): dbrow[1]
+            for dbrow in database.execute(
+                f"SELECT {self.column}, next_processing_timestamp FROM {self.table}"
+            )
+        }
+
+        # Min-heap of (time, id) of the scheduled items. Entries of items which are
+        # rescheduled or not scheduled anymore are skipped when they reach the top.
+        self.heap = []
+        self.scheduled = set()
+        self.changed = set()
+
+    def get(self, value_id):
+        """Return the next processing time of the item, and schedule it."""
+
+        key = str(value_id)
+
+        nexttime = self.times.get(key)
+        if nexttime is None:
+            # Substract one second to allow direct processing of new items
+            nexttime = int(time.time() - 1.0)
+            self.set(key, nexttime)
+        elif key not in self.scheduled:
+            self.scheduled.add(key)
+            heapq.heappush(self.heap, (nexttime, key))
+
+        return nexttime
+
+    def set(self, value_id, new_time):
+        """Set the next processing time of the item, stored by the next persist()."""
+
+        key = str(value_id)
+
+        self.times[key] = new_time
+        self.scheduled.add(key)
+        self.changed.add(key)
+        heapq.heappush(self.heap, (new_time, key))
+
+    def keep(self, value_ids):
+        """Only keep the items (for example the configured sections) scheduled."""
+
+        self.scheduled &= {str(value_id) for value_id in value_ids}
+
+    def next_due(self):
+        """Return the earliest next processing time of the scheduled items, or None."""
+
+        while self.heap:
+            nexttime, key = self.heap[0]
+            if key in self.scheduled and self.times.get(key) == nexttime:
+                return nexttime
+
+            heapq.heappop(self.heap)
+
+        return None
+
+    def get_wait_time(self, maximum):
+        """Return the seconds until the next item is due, at most the maximum (the time
+        interval of the script). Items which are still due after the pass were not
+        rescheduled, for example after an error, and are retried after the maximum."""
+
+        nexttime = self.next_due()
+        if nexttime is None or maximum <= 0 or nexttime <= time.time():
+            return maximum
+
+        return int(max(1, min(maximum, nexttime - time.time())))
+
+    def persist(self):
+        """Write the changed processing times to the table."""
+
+        if not self.changed:
+            return
+
+        self.database.executemany(
+            f"REPLACE INTO {self.table} ({self.column}, next_processing_timestamp) "
+            "VALUES (?, ?)",
+            [(key, self.times[key]) for key in self.changed]
+        )
+        commit(self.database)
+
+        self.changed.clear()
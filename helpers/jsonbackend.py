@@ -0,0 +1,39 @@
+"""Cyberjunky's 3Commas bot helpers."""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Name of the backend used to decode JSON, orjson when it's installed
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+def set_json_backend(name):
+    """Select the backend used to decode JSON: orjson or json."""
+
+    global BACKEND  # pylint: disable=global-statement
+
+    if name not in ("orjson", "json"):
+        raise ValueError(f"Unknown JSON backend '{name}'")
+    if name == "orjson" and orjson is None:
+        raise ValueError("JSON backend 'orjson' is not installed")
+
+    BACKEND = name
+
+
+def loads(data):
+    """Decode the JSON document (str or bytes)."""
+
+    if BACKEND == "orjson":
+        return orjson.loads(data)
+
+    return json.loads(data)
+
+
+def dumps(obj):
+    """Encode the object exactly like json.dumps, because the output is signed for 3Commas
+    and must match what is sent."""
+
+    return json.dumps(obj)
@@ -0,0 +1,391 @@
+"""Cyberjunky's 3Commas bot helpers."""
+import time
+
+from helpers.database import check_identifier
+
+
+# Secondary indexes for the filters of the scripts reading the market data. The joins
+# on base and coin already use the primary keys.
+MARKETDATA_INDEXES = {
+    "pairs_last_updated": ("pairs", ("last_updated",)),
+    "rankings_coinmarketcap": ("rankings", ("base", "coinmarketcap")),
+    "rankings_altrank": ("rankings", ("base", "altrank")),
+    "rankings_galaxyscore": ("rankings", ("base", "galaxyscore")),
+    "prices_change_1h": ("prices", ("base", "change_1h")),
+    "prices_change_24h": ("prices", ("base", "change_24h")),
+    "prices_change_7d": ("prices", ("base", "change_7d")),
+}
+
+
+# Metrics which can be recorded in the history, stored by their position so never
+# reorder or remove entries
+HISTORY_METRICS = (
+    "coinmarketcap", "altrank", "galaxyscore",
+    "change_1h", "change_24h", "change_7d", "change_14d", "change_30d", "change_200d",
+    "change_1y", "volatility_24h",
+)
+
+# Resolutions of the history samples, in seconds (raw samples use 0)
+HISTORY_RAW = 0
+HISTORY_HOUR = 3600
+HISTORY_DAY = 86400
+
+
+def create_marketdata_tables(database):
+    """Create the tables of the shared market data database."""
+
+    database.execute(
+        "CREATE TABLE IF NOT EXISTS pairs ("
+        "base STRING, "
+        "coin STRING, "
+        "last_updated INT, "
+        "PRIMARY KEY(base, coin)"
+        ")"
+    )
+
+    database.execute(
+        "CREATE TABLE IF NOT EXISTS rankings ("
+        "base STRING, "
+        "coin STRING, "
+        "coinmarketcap INT DEFAULT 0, "
+        "altrank INT DEFAULT 0, "
+        "galaxyscore FLOAT DEFAULT 0.0, "
+        "PRIMARY KEY(base, coin)"
+        ")"
+    )
+
+    database.execute(
+        "CREATE TABLE IF NOT EXISTS prices ("
+        "base STRING, "
+        "coin STRING, "
+        "change_1h FLOAT DEFAULT 0.0, "
+        "change_24h FLOAT DEFAULT 0.0, "
+        "change_7d FLOAT DEFAULT 0.0, "
+        "change_14d FLOAT DEFAULT 0.0, "
+        "change_30d FLOAT DEFAULT 0.0, "
+        "change_200d FLOAT DEFAULT 0.0, "
+        "change_1y FLOAT DEFAULT 0.0, "
+        "volatility_24h FLOAT DEFAULT 0.0, "
+        "PRIMARY KEY(base, coin)"
+        ")"
+    )
+
+
+def create_marketdata_indexes(logger, database):
+    """Create the missing secondary indexes, and let SQLite update its statistics so
+    the query planner picks them."""
+
+    existing = {
+        dbrow[0] for dbrow in database.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'"
+        )
+    }
+
+    for name, (table, columns) in MARKETDATA_INDEXES.items():
+        if f"idx_{name}" in existing:
+            continue
+
+        database.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{check_identifier(name)} "
+            f"ON {check_identifier(table)} "
+            f"({', '.join(check_identifier(column) for column in columns)})"
+        )
+        logger.info(f"Created index idx_{name} on {table} {columns}")
+
+    database.execute("PRAGMA optimize")
+    database.commit()
+
+
+def get_upsert_query(table, columns):
+    """Return the query to insert a base/coin row with the columns, or update the
+    columns of the existing row."""
+
+    table = check_identifier(table)
+    columns = [check_identifier(column) for column in columns]
+
+    query = (
+        f"INSERT INTO {table} (base, coin{''.join(f', {column}' for column in columns)}) "
+        f"VALUES (?, ?{', ?' * len(columns)}) ON CONFLICT(base, coin) DO "
+    )
+
+    if not columns:
+        return query + "NOTHING"
+
+    return query + "UPDATE SET " + ", ".join(
+        f"{column} = excluded.{column}" for column in columns
+    )
+
+
+class MarketDataBatch:
+    """The rankings and prices of the coins of one provider payload, collected first
+    and then stored in the shared database with one statement per table.
+
+    Use base '*' to update the coin for all bases it already exists with."""
+
+    def __init__(self, base, rankcolumns=(), pricecolumns=()):
+        self.base = base.upper()
+        self.rankcolumns = tuple(rankcolumns)
+        self.pricecolumns = tuple(pricecolumns)
+
+        self.coins = []
+        self.rankings = []
+        self.prices = []
+
+        # Rows (base, coin, values...) of the pairs written by store()
+        self.storedrankings = []
+        self.storedprices = []
+
+    def __len__(self):
+        return len(self.coins)
+
+    def add(self, coin, rankings=(), prices=()):
+        """Add the values of the coin, in the order of the rank and price columns."""
+
+        self.coins.append(coin.upper())
+        self.rankings.append(tuple(rankings))
+        self.prices.append(tuple(prices))
+
+    def store(self, database, addmissing=False, updatetime=True):
+        """Store the collected data. Pairs which don't exist are added when addmissing,
+        otherwise skipped. With updatetime the last_updated time of the pairs is set,
+        which prevents them from being cleaned up.
+
+        Returns the number of stored pairs and the skipped coins. The caller commits."""
+
+        if self.base == "*":
+            existing = database.execute("SELECT base, coin FROM pairs").fetchall()
+        else:
+            existing = database.execute(
+                "SELECT base, coin FROM pairs WHERE base = ?", (self.base,)
+            ).fetchall()
+
+        basesofcoin = {}
+        for dbrow in existing:
+            basesofcoin.setdefault(dbrow[1], []).append(dbrow[0])
+
+        keys = []
+        rankrows = []
+        pricerows = []
+        skippedcoins = []
+        for coin, rankings, prices in zip(self.coins, self.rankings, self.prices):
+            bases = basesofcoin.get(coin)
+            if bases is None:
+                if not addmissing or self.base == "*":
+                    skippedcoins.append(coin)
+                    continue
+
+                bases = [self.base]
+
+            for base in bases:
+                keys.append((base, coin))
+                rankrows.append((base, coin, *rankings))
+                pricerows.append((base, coin, *prices))
+
+        self.storedrankings = rankrows
+        self.storedprices = pricerows
+
+        if not keys:
+            return 0, skippedcoins
+
+        now = int(time.time())
+        if updatetime:
+            database.executemany(
+                "INSERT INTO pairs (base, coin, last_updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(base, coin) DO UPDATE SET last_updated = excluded.last_updated",
+                [(base, coin, now) for base, coin in keys]
+            )
+        else:
+            database.executemany(
+                "INSERT INTO pairs (base, coin, last_updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(base, coin) DO NOTHING",
+                [(base, coin, now) for base, coin in keys]
+            )
+
+        database.executemany(get_upsert_query("rankings", self.rankcolumns), rankrows)
+        database.executemany(get_upsert_query("prices", self.pricecolumns), pricerows)
+
+        return len(keys), skippedcoins
+
+
+class MarketDataHistory:
+    """Append-only history of market data metrics per pair, next to the current values.
+
+    Samples are stored raw, and downsampled into hourly and daily averages (with the
+    minimum and maximum) when they age. Each resolution has its own retention."""
+
+    def __init__(self, logger, database, metrics, retention):
+        self.logger = logger
+        self.database = database
+        self.metrics = [
+            check_identifier(metric) for metric in metrics if metric in HISTORY_METRICS
+        ]
+        self.retention = retention
+
+        database.execute(
+            "CREATE TABLE IF NOT EXISTS history ("
+            "base STRING, "
+            "metric INT, "
+            "resolution INT, "
+            "coin STRING, "
+            "timestamp INT, "
+            "value FLOAT, "
+            "minimum FLOAT, "
+            "maximum FLOAT, "
+            "samples INT, "
+            "PRIMARY KEY(base, metric, resolution, coin, timestamp)"
+            ") WITHOUT ROWID"
+        )
+        database.execute(
+            "CREATE INDEX IF NOT EXISTS idx_history_resolution "
+            "ON history (resolution, timestamp)"
+        )
+        database.commit()
+
+    def record(self, batch, timestamp=None):
+        """Append the values of the pairs stored by the batch, for the recorded metrics.
+        The caller commits."""
+
+        timestamp = int(timestamp or time.time())
+
+        rows = []
+        for columns, storedrows in (
+            (batch.rankcolumns, batch.storedrankings),
+            (batch.pricecolumns, batch.storedprices),
+        ):
+            for index, column in enumerate(columns):
+                if column not in self.metrics:
+                    continue
+
+                metric = HISTORY_METRICS.index(column)
+                rows += [
+                    (
+                        storedrow[0], metric, HISTORY_RAW, storedrow[1], timestamp,
+                        storedrow[2 + index], storedrow[2 + index], storedrow[2 + index], 1
+                    )
+                    for storedrow in storedrows
+                    if storedrow[2 + index] is not None
+                ]
+
+        self.database.executemany(
+            "REPLACE INTO history "
+            "(base, metric, resolution, coin, timestamp, value, minimum, maximum, samples) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+
+        return len(rows)
+
+    def downsample(self, now=None):
+        """Aggregate the complete buckets which are not aggregated yet into the next
+        resolution, and remove the samples older than the retention of their resolution."""
+
+        now = int(now or time.time())
+
+        for source, target in ((HISTORY_RAW, HISTORY_HOUR), (HISTORY_HOUR, HISTORY_DAY)):
+            # The last bucket is aggregated again, in case it was incomplete last time
+            lastbucket = self.database.execute(
+                "SELECT MAX(timestamp) FROM history WHERE resolution = ?", (target,)
+            ).fetchone()[0] or 0
+            endbucket = now - (now % target)
+
+            self.database.execute(
+                "INSERT INTO history "
+                "(base, metric, resolution, coin, timestamp, value, minimum, maximum, samples) "
+                "SELECT base, metric, ?, coin, timestamp - (timestamp % ?) AS bucket, "
+                "SUM(value * samples) / SUM(samples), MIN(minimum), MAX(maximum), SUM(samples) "
+                "FROM history "
+                "WHERE resolution = ? AND timestamp >= ? AND timestamp < ? "
+                "GROUP BY base, metric, coin, bucket "
+                "ON CONFLICT(base, metric, resolution, coin, timestamp) DO UPDATE SET "
+                "value = excluded.value, minimum = excluded.minimum, "
+                "maximum = excluded.maximum, samples = excluded.samples",
+                (target, target, source, lastbucket, endbucket)
+            )
+
+        removed = 0
+        for resolution, retention in self.retention.items():
+            removed += self.database.execute(
+                "DELETE FROM history WHERE resolution = ? AND timestamp < ?",
+                (resolution, now - retention)
+            ).rowcount
+
+        self.database.commit()
+
+        if removed:
+            self.logger.debug(f"Removed {removed} market data history samples")
+
+    def get_resolution(self, start, now=None):
+        """Return the finest resolution which still has samples from the start time."""
+
+        age = int(now or time.time()) - start
+        for resolution in (HISTORY_RAW, HISTORY_HOUR, HISTORY_DAY):
+            if age <= self.retention.get(resolution, 0):
+                return resolution
+
+        return HISTORY_DAY
+
+    def get_range(self, base, coin, metric, start, end=None, resolution=None):
+        """Return the (timestamp, value, minimum, maximum, samples) rows of the metric
+        of the pair between start and end, oldest first."""
+
+        if resolution is None:
+            resolution = self.get_resolution(start)
+
+        return self.database.execute(
+            "SELECT timestamp, value, minimum, maximum, samples FROM history "
+            "WHERE base = ? AND metric = ? AND resolution = ? AND coin = ? "
+            "AND timestamp >= ? AND timestamp <= ? "
+            "ORDER BY timestamp ASC",
+            (
+                base.upper(), HISTORY_METRICS.index(metric), resolution, coin.upper(),
+                start, end or int(time.time())
+            )
+        ).fetchall()
+
+    def get_aggregate(self, base, coin, metric, start, end=None):
+        """Return the average, minimum, maximum, first and last value of the metric of
+        the pair between start and end, or None without samples."""
+
+        samples = self.get_range(base, coin, metric, start, end)
+        if not samples:
+            return None
+
+        return {
+            "average": (
+                sum(sample[1] * sample[4] for sample in samples)
+                / sum(sample[4] for sample in samples)
+            ),
+            "minimum": min(sample[2] for sample in samples),
+            "maximum": max(sample[3] for sample in samples),
+            "first": samples[0][1],
+            "last": samples[-1][1],
+        }
+
+    def get_changes(self, base, metric, period, now=None):
+        """Return the change of the metric per coin of the base over the last period
+        (seconds), as the last value minus the first value within the period. For
+        example, an altrank change of -20 means the coin improved 20 places."""
+
+        now = int(now or time.time())
+        start = now - period
+        parameters = (
+            base.upper(), HISTORY_METRICS.index(metric), self.get_resolution(start, now),
+            start, now
+        )
+
+        # SQLite returns the value of the row with the MIN/MAX timestamp
+        query = (
+            "SELECT coin, value, {}(timestamp) FROM history "
+            "WHERE base = ? AND metric = ? AND resolution = ? "
+            "AND timestamp >= ? AND timestamp <= ? "
+            "GROUP BY coin"
+        )
+        first = {
+            dbrow[0]: dbrow[1]
+            for dbrow in self.database.execute(query.format("MIN"), parameters)
+        }
+
+        return {
+            dbrow[0]: dbrow[1] - first[dbrow[0]]
+            for dbrow in self.database.execute(query.format("MAX"), parameters)
+        }
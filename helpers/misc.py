@@ -6,8 +6,8 @@ import time
 from constants.pair import PAIREXCLUDE_EXT
 
 
-def wait_time_interval(logger, notification, time_interval, notify=True):
-    """Wait for time interval."""
+def wait_time_interval(logger, notification, time_interval, notify=True, waitfunction=None):
+    """Wait for time interval, or use waitfunction(seconds) which can return earlier."""
 
     if time_interval > 0:
         localtime = time.time()
@@ -17,7 +17,10 @@ def wait_time_interval(logger, notification, time_interval, notify=True):
             "Next update in %s at %s" % (str(datetime.timedelta(seconds = time_interval)), timeresult), notify
         )
         notification.send_notification()
-        time.sleep(time_interval)
+        if waitfunction is not None:
+            waitfunction(time_interval)
+        else:
+            time.sleep(time_interval)
         return True
 
     notification.send_notification()
@@ -42,7 +45,7 @@ def populate_pair_lists(pair, blacklist, blackpairs, badpairs, newpairs, tickerl
 def check_deal(cursor, dealid):
     """Check if deal was already logged."""
 
-    return cursor.execute(f"SELECT * FROM deals WHERE dealid = {dealid}").fetchone()
+    return cursor.execute("SELECT * FROM deals WHERE dealid = ?", (dealid,)).fetchone()
 
 
 def format_pair(marketcode, base, coin):
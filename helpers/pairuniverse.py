@@ -0,0 +1,82 @@
+"""Cyberjunky's 3Commas bot helpers."""
+import hashlib
+import time
+
+# Number of seconds the pairs of a market are used before checking 3Commas for changes
+PAIR_UNIVERSE_TTL = 3600
+
+
+class PairUniverse:
+    """The valid pairs of a market (exchange), indexed for fast lookups.
+
+    Behaves like the list of pairs returned by 3Commas (iteration, len and 'in'),
+    so it can be used everywhere a tickerlist is expected.
+    """
+
+    def __init__(self, market_code, pairs, ttl=PAIR_UNIVERSE_TTL):
+        self.market_code = market_code
+        self.ttl = ttl
+        self.pairs = tuple(pairs)
+        self.pairset = frozenset(self.pairs)
+        self.etag = self.create_etag(self.pairs)
+        self.fetched = time.time()
+
+        self.basepairs = {}
+        self.coinpairs = {}
+        for pair in self.pairs:
+            base, coin = self.split_pair(pair)
+            self.basepairs.setdefault(base, []).append(pair)
+            self.coinpairs.setdefault(coin, {})[base] = pair
+
+    def __contains__(self, pair):
+        return pair in self.pairset
+
+    def __iter__(self):
+        return iter(self.pairs)
+
+    def __len__(self):
+        return len(self.pairs)
+
+    @staticmethod
+    def create_etag(pairs):
+        """Create a tag which changes when the pairs change."""
+
+        return hashlib.sha1("\n".join(sorted(pairs)).encode()).hexdigest()
+
+    def split_pair(self, pair):
+        """Return the base and coin of the pair, the reverse of format_pair."""
+
+        base, _, coin = pair.partition("_")
+
+        # Futures are formatted like USDT_BTCUSDT and USDT_BTC-PERP
+        if self.market_code == "binance_futures" and coin.endswith(base):
+            coin = coin[:-len(base)]
+        elif self.market_code == "ftx_futures" and coin.endswith("-PERP"):
+            coin = coin[:-len("-PERP")]
+
+        return base, coin
+
+    def is_expired(self):
+        """Return True when the pairs should be checked for changes."""
+
+        return (time.time() - self.fetched) > self.ttl
+
+    def revalidate(self, pairs):
+        """Check the freshly fetched pairs. Returns True when unchanged, so the index
+        can be used for another TTL period."""
+
+        if self.create_etag(pairs) != self.etag:
+            return False
+
+        self.fetched = time.time()
+        return True
+
+    def get_base_pairs(self, base):
+        """Return all pairs with the base."""
+
+        return list(self.basepairs.get(base, []))
+
+    def get_pair(self, base, coin):
+        """Return the pair for the base and coin, or None when not on the market."""
+
+        return self.coinpairs.get(coin, {}).get(base)
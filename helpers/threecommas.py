@@ -1,13 +1,339 @@
 """Cyberjunky's 3Commas bot helpers."""
+import copy
+import inspect
+import json
 from math import nan
 import os
+import threading
+import time
+from py3cw.config import (
+    API_METHODS, API_URL, API_VERSION_V1, API_VERSION_V2, API_VERSION_V2_ENTITIES
+)
 from py3cw.request import Py3CW
 from Crypto.PublicKey import RSA
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from helpers.misc import get_round_digits
-
+from helpers.pairuniverse import PairUniverse
+
+from . import jsonbackend
+from .threecommas_accounts import ThreeCommasAccountCache
+from .threecommas_async import ThreeCommasAsyncApi
+from .threecommas_broker import ThreeCommasEventSubscriber
+from .threecommas_cache import ThreeCommasCache
+from .threecommas_circuit import ThreeCommasCircuitBreaker, is_server_failure
+from .threecommas_metrics import ThreeCommasMetrics
+from .threecommas_ratelimit import ThreeCommasRateLimiter
+from .threecommas_traffic import TRAFFIC_MODES, ThreeCommasTraffic
 from .threecommas_websocket import ThreeCommasWebsocketHandler
 
+# Jitter of the retry backoff is supported from urllib3 2.0
+RETRY_BACKOFF_JITTER = "backoff_jitter" in inspect.signature(Retry.__init__).parameters
+
+# Maximum number of bots and deals 3Commas returns in one request
+BOTS_PAGE_LIMIT = 100
+DEALS_PAGE_LIMIT = 100
+
+
+class ThreeCommasApi(Py3CW):
+    """Py3CW client which serves read requests from a shared cache when available, and
+    shares identical read requests which are in progress between threads."""
+
+    def __init__(self, logger, key, secret, selfsigned, request_options, cache=None,
+                 ratelimiter=None, accountcachedir=None, metrics=None, api_url=API_URL,
+                 traffic=None, circuitbreaker=None):
+        super().__init__(
+            key = key,
+            secret = secret,
+            selfsigned = selfsigned,
+            request_options = request_options
+        )
+        self.logger = logger
+        self.cache = cache
+        self.ratelimiter = ratelimiter
+        self.metrics = metrics
+        self.traffic = traffic
+        self.circuitbreaker = circuitbreaker
+
+        # Retry with jittered backoff (urllib3 2.x), so the scripts don't retry all at
+        # the same time. A Retry-After is handled by the circuit breaker instead of
+        # blocking here.
+        retryoptions = {}
+        if RETRY_BACKOFF_JITTER:
+            retryoptions["backoff_jitter"] = self.request_retry_backoff_factor
+
+        adapter = HTTPAdapter(
+            max_retries=Retry(
+                total=self.request_retries_count,
+                backoff_factor=self.request_retry_backoff_factor,
+                status_forcelist=self.request_retry_status_codes,
+                respect_retry_after_header=False,
+                raise_on_status=False,
+                **retryoptions,
+            )
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.lastresponse = threading.local()
+        self.session.hooks["response"].append(self.__store_retry_after)
+
+        self.api_url = api_url
+        if api_url != API_URL:
+            logger.info(f"Using 3Commas API at {api_url}")
+
+        self.inflightlock = threading.Lock()
+        self.inflight = {}
+        self.coalesced = 0
+
+        # Indexed pairs (PairUniverse) per market code
+        self.markets = {}
+
+        # Market orders per deal id, cleared each processing cycle and after a write
+        self.dealorders = {}
+
+        # Account metadata, stored on disk when there is a (shared) directory for it
+        self.accounts = ThreeCommasAccountCache(
+            logger,
+            accountcachedir,
+            lambda accountid: fetch_threecommas_account_info(logger, self, accountid)
+        )
+        self.accounts.start_refresh()
+
+    def request(self, entity, action="", action_id=None, action_sub_id=None,
+                payload=None, additional_headers=None, max_age=None):
+        """Make the request, or return the cached response for reads."""
+
+        method = API_METHODS.get(entity, {}).get(action, ("GET", ""))[0]
+        if method != "GET":
+            error, data = self.__send(
+                entity, action, action_id, action_sub_id, payload, additional_headers
+            )
+
+            # Also invalidate on error, the write could have been applied partly
+            if self.cache is not None:
+                self.cache.invalidate(entity, action_id)
+            if entity == "deals":
+                self.dealorders.pop(str(action_id), None)
+
+            return error, data
+
+        key = ThreeCommasCache.create_key(entity, action, action_id, payload, additional_headers)
+
+        ttl = 0
+        if self.cache is not None:
+            ttl = self.cache.get_ttl(entity, action)
+
+        if ttl > 0:
+            data = self.cache.get(key, max_age)
+            if data is not None:
+                if self.metrics is not None:
+                    self.metrics.record_cache_hit(entity, action)
+
+                return {}, data
+
+        error, data = self.__send_single_flight(
+            key, entity, action, action_id, action_sub_id, payload, additional_headers
+        )
+        if ttl > 0 and data and not error:
+            self.cache.set(key, entity, action_id, data, ttl)
+
+        return error, data
+
+    def get_stats(self):
+        """Return the statistics of the cache, rate limiter and coalesced requests."""
+
+        return {
+            "coalesced": self.coalesced,
+            "cache": self.cache.get_stats() if self.cache is not None else None,
+            "ratelimit": self.ratelimiter.get_stats() if self.ratelimiter is not None else None,
+            "metrics": self.metrics.get_stats() if self.metrics is not None else None,
+            "traffic": self.traffic.get_stats() if self.traffic is not None else None,
+            "circuits": (
+                self.circuitbreaker.get_stats() if self.circuitbreaker is not None else None
+            ),
+        }
+
+    def __send_single_flight(self, key, entity, action, action_id, action_sub_id, payload,
+                             additional_headers):
+        """Send the read request, or wait for the identical request already in progress."""
+
+        with self.inflightlock:
+            call = self.inflight.get(key)
+            leader = call is None
+            if leader:
+                call = {
+                    "done": threading.Event(),
+                    "followers": 0,
+                    "result": ({"error": True, "msg": "Shared request failed"}, {}),
+                }
+                self.inflight[key] = call
+            else:
+                call["followers"] += 1
+                self.coalesced += 1
+
+        if not leader:
+            call["done"].wait()
+
+            self.logger.debug(
+                f"Shared in-progress request {entity}/{action} {action_id or ''} "
+                f"({self.coalesced} duplicate requests saved)"
+            )
+
+            # Every caller gets its own copy, because callers can modify the data
+            return copy.deepcopy(call["result"])
+
+        try:
+            call["result"] = self.__send(
+                entity, action, action_id, action_sub_id, payload, additional_headers
+            )
+        finally:
+            with self.inflightlock:
+                del self.inflight[key]
+            call["done"].set()
+
+        if call["followers"]:
+            return copy.deepcopy(call["result"])
+
+        return call["result"]
+
+    def __send(self, entity, action, action_id, action_sub_id, payload, additional_headers):
+        """Send the request to 3Commas."""
+
+        if self.traffic is not None and self.traffic.mode == "replay":
+            return self.traffic.replay(
+                entity, action, action_id, action_sub_id, payload, additional_headers
+            )
+
+        if self.circuitbreaker is not None:
+            waitseconds = self.circuitbreaker.allow(entity, action)
+            if waitseconds > 0:
+                return {
+                    "error": True,
+                    "msg": (
+                        f"3Commas API endpoint {entity}/{action} is unavailable, "
+                        f"retry in {waitseconds:.0f}s"
+                    ),
+                    "status_code": None,
+                    "circuit_open": True,
+                }, {}
+
+        if self.ratelimiter is not None:
+            self.ratelimiter.acquire()
+
+        self.lastresponse.retryafter = None
+        self.lastresponse.requestbytes = 0
+        self.lastresponse.responsebytes = 0
+        start = time.time()
+        error, data = super().request(
+            entity = entity,
+            action = action,
+            action_id = action_id,
+            action_sub_id = action_sub_id,
+            payload = payload,
+            additional_headers = additional_headers,
+        )
+
+        duration = time.time() - start
+        if self.metrics is not None:
+            self.metrics.record(
+                entity, action, duration, error,
+                self.lastresponse.requestbytes, self.lastresponse.responsebytes
+            )
+        if self.traffic is not None:
+            self.traffic.record(
+                entity, action, action_id, action_sub_id, payload, additional_headers,
+                duration, error, data
+            )
+        if self.circuitbreaker is not None:
+            if is_server_failure(error):
+                self.circuitbreaker.record_failure(
+                    entity, action, getattr(self.lastresponse, "retryafter", None)
+                )
+            else:
+                self.circuitbreaker.record_success(entity, action)
+
+        return error, data
+
+    def _Py3CW__make_request(self, http_method, path, params, payload, additional_headers,
+                             retry_count=0):
+        """Make the request of Py3CW to the URL of this instance, and decode the response
+        with the fast JSON backend."""
+
+        entity = path.split("/")[0]
+        if entity in API_VERSION_V2_ENTITIES:
+            path = path.replace("_v2", "")
+            relative_url = f"{API_VERSION_V2}{path}"
+        else:
+            relative_url = f"{API_VERSION_V1}{path}"
+
+        if params:
+            relative_url += f"?{params}"
+
+        if http_method == "GET" or (payload is not None and len(payload) == 0):
+            payload = None
+
+        # The signature must be calculated over the relative URL
+        signature = self._Py3CW__generate_signature(
+            relative_url, jsonbackend.dumps(payload) if payload is not None else ""
+        )
+
+        response = None
+        try:
+            response = self.session.request(
+                method = http_method,
+                url = f"{self.api_url}{relative_url}",
+                headers = {
+                    "APIKEY": self.key,
+                    "Signature": signature,
+                    **additional_headers
+                },
+                json = payload,
+                timeout = (self.request_timeout, self.request_timeout)
+            )
+            data = jsonbackend.loads(response.content)
+        except Exception as err:
+            return {
+                "error": True,
+                "msg": f"Other error occurred: {err}",
+                "status_code": response.status_code if response is not None else None,
+            }, {}
+
+        if not isinstance(data, dict) or "error" not in data:
+            return {}, data
+
+        # Errors of 3Commas itself, like Py3CW reports them
+        if not isinstance(data["error"], dict):
+            return {
+                "error": True,
+                "msg": (
+                    f"Other error occurred: {data.get('error')} "
+                    f"{data.get('error_description')} {data.get('error_attributes')}."
+                ),
+                "status_code": response.status_code,
+            }, {}
+
+        errorstatus = data["error"].get("status_code")
+        if errorstatus in self.request_retry_status_codes and \
+                retry_count < self.request_retries_count:
+            return self._Py3CW__make_request(
+                http_method, path, params, payload, additional_headers, retry_count + 1
+            )
+
+        data["status_code"] = errorstatus
+        return data, {}
+
+    def __store_retry_after(self, response, *args, **kwargs):
+        """Remember the Retry-After of the response for the circuit breaker, and the size
+        of the request and response body for the metrics."""
+
+        retryafter = response.headers.get("Retry-After")
+        self.lastresponse.retryafter = (
+            float(retryafter) if retryafter and retryafter.isdigit() else None
+        )
+        self.lastresponse.requestbytes = len(response.request.body or "")
+        self.lastresponse.responsebytes = len(response.content)
+
 
 def load_blacklist(logger, api, blacklistfile):
     """Return blacklist data to be used."""
@@ -52,7 +378,7 @@ def load_rsa_key(logger, path):
     return key
 
 
-def init_threecommas_api(logger, cfg):
+def init_threecommas_api(logger, cfg, sharedir=None):
     """Init the 3commas API."""
 
     selfsigned = ""
@@ -63,7 +389,19 @@ def init_threecommas_api(logger, cfg):
         if not selfsigned:
             return None
 
-    return Py3CW(
+    # Share responses of read requests with the other scripts using the same sharedir
+    # and API key, when enabled
+    cache = None
+    if sharedir and cfg.getboolean("settings", "3c-cache-enabled", fallback = False):
+        cache = ThreeCommasCache(
+            logger,
+            sharedir,
+            cfg.get("settings", "3c-apikey"),
+            json.loads(cfg.get("settings", "3c-cache-ttl", fallback = "{}")),
+        )
+
+    return ThreeCommasApi(
+        logger = logger,
         key = cfg.get("settings", "3c-apikey"),
         secret = cfg.get("settings", "3c-apisecret") if not selfsigned else "",
         selfsigned = selfsigned,
@@ -73,11 +411,18 @@ def init_threecommas_api(logger, cfg):
             "retry_status_codes": [502, 429],
             "retry_backoff_factor": 1,
         },
+        cache = cache,
+        ratelimiter = init_threecommas_ratelimiter(logger, cfg, sharedir),
+        accountcachedir = sharedir,
+        metrics = init_threecommas_metrics(logger, cfg),
+        api_url = cfg.get("settings", "3c-api-url", fallback = API_URL).rstrip("/"),
+        traffic = init_threecommas_traffic(logger, cfg),
+        circuitbreaker = init_threecommas_circuitbreaker(logger, cfg, sharedir),
     )
 
 
-def init_threecommas_websocket(logger, cfg, event_handler):
-    """Init the 3commas WebSocket connection."""
+def init_threecommas_async_api(logger, cfg, sharedir=None, metrics=None, cache=None):
+    """Init the asyncio 3commas API. Writes invalidate the data of the (shared) cache."""
 
     selfsigned = ""
     apikeypath = cfg.get("settings", "3c-apikey-path", fallback = "")
@@ -87,13 +432,132 @@ def init_threecommas_websocket(logger, cfg, event_handler):
         if not selfsigned:
             return None
 
-    return ThreeCommasWebsocketHandler(
+    return ThreeCommasAsyncApi(
+        logger = logger,
+        key = cfg.get("settings", "3c-apikey"),
+        secret = cfg.get("settings", "3c-apisecret") if not selfsigned else "",
+        selfsigned = selfsigned,
+        request_options={
+            "request_timeout": 10,
+            "nr_of_retries": 3,
+            "retry_status_codes": [502, 429],
+            "retry_backoff_factor": 1,
+            "max_connections": int(cfg.get("settings", "3c-max-connections", fallback = 10)),
+        },
+        ratelimiter = init_threecommas_ratelimiter(logger, cfg, sharedir),
+        metrics = metrics,
+        circuitbreaker = init_threecommas_circuitbreaker(logger, cfg, sharedir),
+        api_url = cfg.get("settings", "3c-api-url", fallback = API_URL).rstrip("/"),
+        cache = cache,
+    )
+
+
+def init_threecommas_metrics(logger, cfg):
+    """Init the instrumentation of the 3Commas API requests."""
+
+    return ThreeCommasMetrics(
+        logger,
+        f"{logger.datadir}/{logger.program}_apimetrics.json",
+        int(cfg.get("settings", "3c-metrics-interval", fallback = 0)),
+        int(cfg.get("settings", "3c-metrics-port", fallback = 0)),
+        cfg.get("settings", "3c-metrics-host", fallback = "127.0.0.1"),
+    )
+
+
+def init_threecommas_circuitbreaker(logger, cfg, sharedir=None):
+    """Init the circuit breaker, shared by all scripts using the sharedir."""
+
+    return ThreeCommasCircuitBreaker(
+        logger,
+        sharedir,
+        int(cfg.get("settings", "3c-circuit-threshold", fallback = 5)),
+        float(cfg.get("settings", "3c-circuit-open-time", fallback = 30)),
+    )
+
+
+def init_threecommas_traffic(logger, cfg):
+    """Init the recording or replaying of the 3Commas API traffic, when enabled."""
+
+    mode = cfg.get("settings", "3c-traffic-mode", fallback = "").lower()
+    if not mode:
+        return None
+
+    if mode not in TRAFFIC_MODES:
+        logger.error(f"Unknown 3Commas traffic mode '{mode}', use record or replay")
+        return None
+
+    path = cfg.get(
+        "settings",
+        "3c-traffic-file",
+        fallback = f"{logger.datadir}/{logger.program}_traffic.jsonl.gz",
+    )
+    if mode == "replay" and not os.path.isfile(path):
+        logger.error(f"3Commas traffic file '{path}' to replay not found")
+        return None
+
+    return ThreeCommasTraffic(
+        logger,
+        mode,
+        path,
+        cfg.getboolean("settings", "3c-replay-latency", fallback = True),
+    )
+
+
+def init_threecommas_ratelimiter(logger, cfg, sharedir):
+    """Init the rate limiter shared by all scripts using the sharedir."""
+
+    if not sharedir:
+        return None
+
+    return ThreeCommasRateLimiter(
+        logger,
+        sharedir,
+        float(cfg.get("settings", "3c-ratelimit-rate", fallback = 2.0)),
+        float(cfg.get("settings", "3c-ratelimit-burst", fallback = 20)),
+        cfg.get("settings", "3c-ratelimit-priority", fallback = ""),
+    )
+
+
+def init_threecommas_websocket(logger, cfg, event_handler, on_subscribed=None, api=None):
+    """Init the 3commas WebSocket connection. The event handler is a function for the
+    DealsChannel, or a dict with a function per channel to subscribe to.
+
+    With the api, the deals updated while disconnected are fetched after a reconnect and
+    passed to the event handler.
+
+    When an event broker is configured, the events are received from the broker instead."""
+
+    handlers = event_handler if isinstance(event_handler, dict) else {
+        "DealsChannel": event_handler
+    }
+
+    brokeraddress = cfg.get("settings", "3c-websocket-broker", fallback = "")
+    if brokeraddress:
+        return ThreeCommasEventSubscriber(logger, brokeraddress, handlers, on_subscribed)
+
+    selfsigned = ""
+    apikeypath = cfg.get("settings", "3c-apikey-path", fallback = "")
+
+    if apikeypath:
+        selfsigned = load_rsa_key(logger, apikeypath)
+        if not selfsigned:
+            return None
+
+    websocket = ThreeCommasWebsocketHandler(
         api_key = cfg.get("settings", "3c-apikey"),
         api_secret = cfg.get("settings", "3c-apisecret") if not selfsigned else "",
         api_selfsigned = selfsigned,
-        channel = "DealsChannel",
-        external_event_handler = event_handler
+        channel = tuple(handlers.keys()),
+        on_subscribed = on_subscribed,
+        backfill = (
+            lambda channel, since: get_threecommas_deals_updated_since(logger, api, since)
+            if channel == "DealsChannel" else []
+        ) if api is not None else None
     )
+    for channel, handler in handlers.items():
+        websocket.register_handler(channel, handler)
+
+    return websocket
 
 
 def get_threecommas_blacklist(logger, api):
@@ -196,6 +660,20 @@ def get_threecommas_account(logger, api, accountid):
 def get_threecommas_account_marketcode(logger, api, accountid):
     """Get market_code for account."""
 
+    # Use the stored account data, shared by all scripts and refreshed in the background
+    if getattr(api, "accounts", None) is not None:
+        return api.accounts.get_marketcode(accountid)
+
+    data = fetch_threecommas_account_info(logger, api, accountid)
+    if data:
+        return data["market_code"]
+
+    return None
+
+
+def fetch_threecommas_account_info(logger, api, accountid):
+    """Fetch the account info from 3Commas, used to get the market_code."""
+
     # get account data for accountid, in real mode
     error, data = api.request(
         entity="accounts",
@@ -204,7 +682,7 @@ def get_threecommas_account_marketcode(logger, api, accountid):
         additional_headers={"Forced-Mode": "real"},
     )
     if data:
-        return data["market_code"]
+        return data
     if error and "status_code" in error:
         if error["status_code"] == 404:
             logger.error(
@@ -307,18 +785,33 @@ def get_threecommas_account_balance_chart_data(
 def get_threecommas_market(logger, api, market_code):
     """Get all the valid pairs for market_code from 3Commas account."""
 
-    tickerlist = []
+    # Use the indexed pairs while still valid
+    markets = getattr(api, "markets", {})
+    tickerlist = markets.get(market_code)
+    if tickerlist is not None and not tickerlist.is_expired():
+        return tickerlist
+
+    # Revalidate against 3Commas itself, a cached response would add its own age to
+    # the expired pairs
+    options = {"max_age": 0} if tickerlist is not None else {}
     error, data = api.request(
         entity="accounts",
         action="market_pairs",
         payload={"market_code": market_code},
+        **options,
     )
     if data:
-        tickerlist = data
-        logger.info(
-            f"Fetched 3Commas market data "
-            f"for '{market_code}' OK ({len(tickerlist)} pairs)"
-        )
+        if tickerlist is not None and tickerlist.revalidate(data):
+            logger.debug(
+                f"3Commas market data for '{market_code}' unchanged ({len(tickerlist)} pairs)"
+            )
+        else:
+            tickerlist = PairUniverse(market_code, data)
+            markets[market_code] = tickerlist
+            logger.info(
+                f"Fetched 3Commas market data "
+                f"for '{market_code}' OK ({len(tickerlist)} pairs)"
+            )
     else:
         if error and "msg" in error:
             logger.error(
@@ -331,6 +824,10 @@ def get_threecommas_market(logger, api, market_code):
                 f"for market code {market_code}"
             )
 
+        # Previous market data is better than none, pairs don't change that often
+        if tickerlist is None:
+            tickerlist = PairUniverse(market_code, [])
+
     return tickerlist
 
 
@@ -519,6 +1016,123 @@ def get_threecommas_deals(logger, api, botid, actiontype="finished"):
     return data
 
 
+def get_threecommas_finished_deals(logger, api, botid, closedafter=None, knowndealids=None,
+                                   maxpages=None):
+    """Get the finished deals of a bot, newest first, paging until the deals closed
+    before closedafter or an already known deal are reached."""
+
+    knowndealids = knowndealids or set()
+
+    payload = {
+        "scope": "finished",
+        "bot_id": str(botid),
+        "limit": DEALS_PAGE_LIMIT,
+        "offset": 0,
+        "order": "closed_at",
+        "order_direction": "desc",
+    }
+
+    newdeals = []
+    pages = 0
+    while True:
+        error, data = api.request(
+            entity="deals",
+            action="",
+            payload=dict(payload),
+        )
+        if error:
+            if "msg" in error:
+                logger.error(
+                    f"Error occurred while fetching deals error: {error['msg']}"
+                )
+            else:
+                logger.error("Error occurred while fetching deals")
+
+            # Incomplete result, let the caller try again later
+            return None
+
+        reachedknown = False
+        for deal in data:
+            if closedafter and deal["closed_at"] < closedafter:
+                reachedknown = True
+                break
+
+            if deal["id"] in knowndealids:
+                # Deals closed at the same moment as the last known deal can follow
+                if closedafter and deal["closed_at"] == closedafter:
+                    continue
+
+                reachedknown = True
+                break
+
+            newdeals.append(deal)
+
+        pages += 1
+        if reachedknown or len(data) < DEALS_PAGE_LIMIT or (maxpages and pages >= maxpages):
+            break
+
+        payload["offset"] += DEALS_PAGE_LIMIT
+
+    logger.debug(
+        f"Fetched {len(newdeals)} new finished deals for bot {botid} in {pages} request(s)"
+    )
+
+    return newdeals
+
+
+def get_threecommas_deals_updated_since(logger, api, since, maxpages=10):
+    """Get the deals (active and finished) of all bots which were updated after the
+    since timestamp, newest first."""
+
+    # Same format as the updated_at of the deals, which makes it comparable
+    updatedafter = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(since))
+
+    payload = {
+        "limit": DEALS_PAGE_LIMIT,
+        "offset": 0,
+        "order": "updated_at",
+        "order_direction": "desc",
+    }
+
+    updateddeals = []
+    pages = 0
+    while True:
+        error, data = api.request(
+            entity="deals",
+            action="",
+            payload=dict(payload),
+        )
+        if error:
+            if "msg" in error:
+                logger.error(
+                    f"Error occurred while fetching updated deals: {error['msg']}"
+                )
+            else:
+                logger.error("Error occurred while fetching updated deals")
+
+            break
+
+        reachedolder = False
+        for deal in data:
+            if deal["updated_at"] < updatedafter:
+                reachedolder = True
+                break
+
+            updateddeals.append(deal)
+
+        pages += 1
+        if reachedolder or len(data) < DEALS_PAGE_LIMIT or pages >= maxpages:
+            break
+
+        payload["offset"] += DEALS_PAGE_LIMIT
+
+    logger.debug(
+        f"Fetched {len(updateddeals)} deals updated after {updatedafter} in {pages} request(s)"
+    )
+
+    return updateddeals
+
+
 def close_threecommas_deal(logger, api, dealid, pair):
     """Close deal with certain id."""
 
@@ -563,6 +1177,72 @@ def get_threecommas_bots(logger, api, accountid):
     return None
 
 
+def get_threecommas_bots_by_id(logger, api, botids=None, accountid=None, scope=None,
+                               max_age=None):
+    """Get the data of multiple bots using as few requests as possible. Returns the data
+    and the error message of the bots which could not be fetched, per bot id."""
+
+    wantedids = {int(botid) for botid in botids} if botids is not None else None
+
+    payload = {
+        "limit": BOTS_PAGE_LIMIT,
+        "offset": 0,
+    }
+    if accountid:
+        payload["account_id"] = accountid
+    if scope:
+        payload["scope"] = scope
+
+    bots = {}
+    while wantedids is None or not wantedids.issubset(bots):
+        error, data = api.request(
+            entity="bots",
+            action="",
+            payload=dict(payload),
+            max_age=max_age,
+        )
+        if error:
+            if "msg" in error:
+                logger.error(
+                    f"Error occurred while fetching bots (offset {payload['offset']}): "
+                    f"{error['msg']}"
+                )
+            else:
+                logger.error(
+                    f"Error occurred while fetching bots (offset {payload['offset']})"
+                )
+            break
+
+        for botdata in data or []:
+            if wantedids is None or botdata["id"] in wantedids:
+                bots[botdata["id"]] = botdata
+
+        # Last page reached
+        if not data or len(data) < BOTS_PAGE_LIMIT:
+            break
+
+        payload["offset"] += BOTS_PAGE_LIMIT
+
+    # Bots not returned by the list (other account, scope or error) are fetched one by one,
+    # so the caller still receives the data or the error of 3Commas
+    errors = {}
+    for botid in sorted((wantedids or set()) - set(bots)):
+        error, data = api.request(
+            entity="bots",
+            action="show",
+            action_id=str(botid),
+            max_age=max_age,
+        )
+        if data:
+            bots[botid] = data
+        else:
+            errors[botid] = error.get("msg", "unknown error") if error else "no data"
+
+    logger.debug(f"Fetched the data of {len(bots)} bots")
+
+    return bots, errors
+
+
 def threecommas_deal_add_funds(logger, api, deal_pair, deal_id, quantity, limit_price):
     """Add funds to existing deal."""
 
@@ -604,10 +1284,12 @@ def threecommas_deal_add_funds(logger, api, deal_pair, deal_id, quantity, limit_
     return orderplaced
 
 
-def get_threecommas_deal_order_status(logger, api, deal_pair, deal_id, order_id):
-    """Get the status of the specified order."""
+def get_threecommas_deal_market_orders(api, deal_id):
+    """Get the market orders of the deal, fetched at most once per processing cycle."""
 
-    orderstatus = ""
+    dealorders = getattr(api, "dealorders", None)
+    if dealorders is not None and str(deal_id) in dealorders:
+        return {}, dealorders[str(deal_id)]
 
     error, data = api.request(
         entity="deals",
@@ -615,6 +1297,26 @@ def get_threecommas_deal_order_status(logger, api, deal_pair, deal_id, order_id)
         action_id=str(deal_id)
     )
 
+    if data and dealorders is not None:
+        dealorders[str(deal_id)] = data
+
+    return error, data
+
+
+def clear_threecommas_deal_market_orders(api):
+    """Forget the market orders fetched during the previous processing cycle."""
+
+    if getattr(api, "dealorders", None) is not None:
+        api.dealorders.clear()
+
+
+def get_threecommas_deal_order_status(logger, api, deal_pair, deal_id, order_id):
+    """Get the status of the specified order."""
+
+    orderstatus = ""
+
+    error, data = get_threecommas_deal_market_orders(api, deal_id)
+
     if data:
         for order in data:
             if str(order["order_id"]) == str(order_id):
@@ -642,11 +1344,7 @@ def get_threecommas_deal_order_id(logger, api, deal_id, order_type, order_status
 
     orderid = ""
 
-    error, data = api.request(
-        entity="deals",
-        action="market_orders",
-        action_id=str(deal_id)
-    )
+    error, data = get_threecommas_deal_market_orders(api, deal_id)
 
     if data:
         for order in data:
@@ -741,29 +1439,30 @@ def prefetch_marketcodes(logger, api, botids):
         f"Prefetch marketcodes for the following bots: {botids}"
     )
 
+    # The account of a bot is stored, so only unknown bots have to be fetched
+    accounts = getattr(api, "accounts", None)
+    botaccounts = {}
     for botid in botids:
-        if botid and botid not in marketcodearray:
-            boterror, botdata = api.request(
-                entity="bots",
-                action="show",
-                action_id=str(botid),
-            )
+        if botid and accounts is not None and accounts.lookup_bot_accountid(botid):
+            botaccounts[int(botid)] = accounts.lookup_bot_accountid(botid)
+
+    unknownbotids = [botid for botid in botids if botid and int(botid) not in botaccounts]
+    if unknownbotids:
+        botsdata, boterrors = get_threecommas_bots_by_id(logger, api, unknownbotids)
+        for botid, botdata in botsdata.items():
+            botaccounts[botid] = botdata["account_id"]
+            if accounts is not None:
+                accounts.store_bot_accountid(botid, botdata["account_id"])
+        for botid, message in boterrors.items():
+            logger.error(f"Error occurred fetching bot {botid}: {message}")
+
+    for botid, accountid in botaccounts.items():
+        marketcode = get_threecommas_account_marketcode(logger, api, accountid)
+        marketcodearray[botid] = marketcode
 
-            if botdata:
-                accountid = botdata["account_id"]
-                marketcode = get_threecommas_account_marketcode(logger, api, accountid)
-                marketcodearray[botdata["id"]] = marketcode
-
-                logger.info(
-                    f"Fetched marketcode '{marketcode}' for "
-                    f"bot {botdata['id']} with account id {accountid}."
-                )
-            else:
-                if boterror and "msg" in boterror:
-                    logger.error(
-                        f"Error occurred fetching marketcode data: {boterror['msg']}"
-                    )
-                else:
-                    logger.error("Error occurred fetching marketcode data")
+        logger.info(
+            f"Fetched marketcode '{marketcode}' for "
+            f"bot {botid} with account id {accountid}."
+        )
 
     return marketcodearray
@@ -0,0 +1,183 @@
+"""Cyberjunky's 3Commas bot helpers."""
+import json
+import threading
+import time
+
+from .database import open_database, open_memory_database
+
+# Number of seconds after which the account metadata is refreshed in the background
+ACCOUNT_REFRESH_INTERVAL = 6 * 3600
+
+
+class ThreeCommasAccountCache:
+    """Account metadata (like the market code) and the account of each bot, stored on disk
+    so it's shared between the scripts and survives a restart."""
+
+    def __init__(self, logger, cache_dir, fetcher, refresh_interval=ACCOUNT_REFRESH_INTERVAL):
+        self.logger = logger
+        self.fetcher = fetcher
+        self.refresh_interval = refresh_interval
+
+        self.lock = threading.Lock()
+        self.accounts = {}
+        self.botaccounts = {}
+        self.refresher = None
+
+        # Without a cache directory the data is only kept for the lifetime of the process,
+        # and refreshed on lookup instead of in the background
+        self.shared = bool(cache_dir)
+        self.dbpath = f"{cache_dir}/threecommas_accounts.sqlite3" if cache_dir else None
+        self.memorydb = open_memory_database() if not cache_dir else None
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS accounts ("
+            "accountid INT Primary Key, "
+            "market_code STRING, "
+            "data STRING, "
+            "last_updated FLOAT"
+            ")"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS bots ("
+            "botid INT Primary Key, "
+            "accountid INT"
+            ")"
+        )
+        self.db.commit()
+
+        self.__load()
+
+        if cache_dir:
+            logger.info(
+                f"3Commas account cache '{self.dbpath}' opened successfully "
+                f"({len(self.accounts)} accounts, {len(self.botaccounts)} bots)"
+            )
+
+    @property
+    def db(self):
+        """The connection of this thread to the database."""
+
+        if self.memorydb is not None:
+            return self.memorydb
+
+        return open_database(self.dbpath)
+
+    def __load(self):
+        """Load the stored data, which could have been updated by other scripts."""
+
+        with self.lock:
+            for dbrow in self.db.execute(
+                "SELECT accountid, market_code, data, last_updated FROM accounts"
+            ):
+                self.accounts[dbrow[0]] = {
+                    "market_code": dbrow[1],
+                    "data": json.loads(dbrow[2]) if dbrow[2] else {},
+                    "last_updated": dbrow[3],
+                }
+
+            for dbrow in self.db.execute("SELECT botid, accountid FROM bots"):
+                self.botaccounts[dbrow[0]] = dbrow[1]
+
+    def lookup_marketcode(self, accountid):
+        """Return the stored market code of the account, without calling 3Commas."""
+
+        account = self.accounts.get(int(accountid))
+        if account is None:
+            self.__load()
+            account = self.accounts.get(int(accountid))
+
+        return account["market_code"] if account else None
+
+    def get_marketcode(self, accountid):
+        """Return the market code of the account, fetched from 3Commas when unknown (or
+        outdated, when not refreshed in the background)."""
+
+        marketcode = self.lookup_marketcode(accountid)
+        if marketcode is None:
+            marketcode = self.refresh(accountid)
+        elif not self.shared and (
+            time.time() - self.accounts[int(accountid)]["last_updated"] >= self.refresh_interval
+        ):
+            marketcode = self.refresh(accountid) or marketcode
+
+        return marketcode
+
+    def refresh(self, accountid):
+        """Fetch the account data from 3Commas and store it."""
+
+        data = self.fetcher(accountid)
+        if not data:
+            return None
+
+        self.store(accountid, data)
+
+        return data["market_code"]
+
+    def store(self, accountid, data):
+        """Store the account data."""
+
+        now = time.time()
+        with self.lock:
+            self.accounts[int(accountid)] = {
+                "market_code": data["market_code"],
+                "data": data,
+                "last_updated": now,
+            }
+            self.db.execute(
+                "REPLACE INTO accounts (accountid, market_code, data, last_updated) "
+                "VALUES (?, ?, ?, ?)",
+                (int(accountid), data["market_code"], json.dumps(data), now)
+            )
+            self.db.commit()
+
+    def lookup_bot_accountid(self, botid):
+        """Return the stored account id of the bot, without calling 3Commas."""
+
+        return self.botaccounts.get(int(botid))
+
+    def store_bot_accountid(self, botid, accountid):
+        """Store the account id of the bot."""
+
+        if self.botaccounts.get(int(botid)) == int(accountid):
+            return
+
+        with self.lock:
+            self.botaccounts[int(botid)] = int(accountid)
+            self.db.execute(
+                "REPLACE INTO bots (botid, accountid) VALUES (?, ?)",
+                (int(botid), int(accountid))
+            )
+            self.db.commit()
+
+    def start_refresh(self):
+        """Start refreshing the account data in the background, when it's shared with
+        the other scripts."""
+
+        if self.refresher is not None or not self.shared:
+            return
+
+        self.refresher = threading.Thread(
+            target=self.__refresh_loop, name="threecommas-accounts", daemon=True
+        )
+        self.refresher.start()
+
+    def __refresh_loop(self):
+        """Refresh the account data which is older than the refresh interval."""
+
+        while True:
+            # Another script could have refreshed the data already
+            self.__load()
+
+            now = time.time()
+            for accountid, account in list(self.accounts.items()):
+                if now - account["last_updated"] < self.refresh_interval:
+                    continue
+
+                try:
+                    if self.refresh(accountid):
+                        self.logger.debug(f"Refreshed 3Commas account data of {accountid}")
+                except Exception as err:  # pylint: disable=broad-except
+                    self.logger.debug(
+                        f"Refreshing 3Commas account data of {accountid} failed: {err}"
+                    )
+
+            time.sleep(min(self.refresh_interval, 3600))
@@ -0,0 +1,460 @@
+"""Cyberjunky's 3Commas bot helpers."""
+import asyncio
+import copy
+import hashlib
+import hmac
+import json
+import time
+from base64 import b64encode
+from urllib.parse import quote_plus, urlencode
+
+import aiohttp
+from Crypto.Hash import SHA256
+from Crypto.PublicKey import RSA
+from Crypto.Signature import pkcs1_15
+from py3cw.config import (
+    API_METHODS,
+    API_URL,
+    API_VERSION_V1,
+    API_VERSION_V2,
+    API_VERSION_V2_ENTITIES,
+)
+
+from . import jsonbackend
+from .threecommas_cache import ThreeCommasCache
+from .threecommas_circuit import get_backoff_time, is_server_failure
+
+
+class ThreeCommasAsyncApi:
+    """Asyncio 3Commas client with the same request signature as Py3CW."""
+
+    def __init__(self, logger, key, secret, selfsigned, request_options, ratelimiter=None,
+                 metrics=None, api_url=API_URL, circuitbreaker=None, cache=None):
+        if not key:
+            raise ValueError("Please enter a 3commas API key")
+        if not secret and not selfsigned:
+            raise ValueError("Please enter a 3Commas API secret or Private Key")
+
+        self.logger = logger
+        self.key = key
+        self.secret = secret
+        self.signer = pkcs1_15.new(RSA.import_key(selfsigned)) if selfsigned else None
+
+        self.request_timeout = request_options.get("request_timeout", 30)
+        self.request_retries_count = request_options.get("nr_of_retries", 5)
+        self.request_retry_status_codes = request_options.get(
+            "retry_status_codes", [500, 502, 503, 504]
+        )
+        self.request_retry_backoff_factor = request_options.get("retry_backoff_factor", 0.1)
+        self.max_connections = request_options.get("max_connections", 10)
+        self.ratelimiter = ratelimiter
+        self.metrics = metrics
+        self.api_url = api_url
+        self.circuitbreaker = circuitbreaker
+        self.cache = cache
+
+        self.inflight = {}
+        self.coalesced = 0
+
+        # Created on first use, because they must belong to the running event loop
+        self.session = None
+        self.semaphore = None
+
+    def __generate_signature(self, path, data):
+        """Generate the signature needed for 3Commas API communication."""
+
+        message = str.encode(path + data)
+        if self.signer is None:
+            return hmac.new(str.encode(self.secret), message, hashlib.sha256).hexdigest()
+
+        return b64encode(self.signer.sign(SHA256.new(message))).decode("utf-8")
+
+    def __get_session(self):
+        """Return the session (keep-alive connection pool) of this client."""
+
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.max_connections, keepalive_timeout=60
+                ),
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout),
+            )
+            self.semaphore = asyncio.Semaphore(self.max_connections)
+
+        return self.session
+
+    async def request(self, entity, action="", action_id=None, action_sub_id=None,
+                      payload=None, additional_headers=None, max_age=None):
+        """Make the request and return the error and data, like Py3CW does. Reads are
+        served from the shared cache when available, and identical read requests which
+        are in progress share the same response."""
+
+        if API_METHODS.get(entity, {}).get(action, ("GET", ""))[0] != "GET":
+            error, data = await self.__send(
+                entity, action, action_id, action_sub_id, payload, additional_headers
+            )
+
+            # Also invalidate on error, the write could have been applied partly
+            if self.cache is not None:
+                await self.__run_blocking(self.cache.invalidate, entity, action_id)
+
+            return error, data
+
+        key = (
+            f"{entity}/{action}/{action_id or ''}/{action_sub_id or ''}/"
+            f"{json.dumps(payload, sort_keys=True) if payload else ''}/"
+            f"{json.dumps(additional_headers, sort_keys=True) if additional_headers else ''}"
+        )
+
+        inflight = self.inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            self.logger.debug(
+                f"Shared in-progress request {entity}/{action} {action_id or ''} "
+                f"({self.coalesced} duplicate requests saved)"
+            )
+
+            # Every caller gets its own copy, because callers can modify the data
+            return copy.deepcopy(await asyncio.shield(inflight))
+
+        ttl = 0
+        if self.cache is not None:
+            ttl = self.cache.get_ttl(entity, action)
+
+        cachekey = ThreeCommasCache.create_key(
+            entity, action, action_id, payload, additional_headers
+        )
+        if ttl > 0:
+            data = await self.__run_blocking(self.cache.get, cachekey, max_age)
+            if data is not None:
+                if self.metrics is not None:
+                    self.metrics.record_cache_hit(entity, action)
+
+                return {}, data
+
+        inflight = asyncio.ensure_future(
+            self.__send(entity, action, action_id, action_sub_id, payload, additional_headers)
+        )
+        self.inflight[key] = inflight
+        try:
+            error, data = copy.deepcopy(await asyncio.shield(inflight))
+        finally:
+            if self.inflight.get(key) is inflight:
+                del self.inflight[key]
+
+        if ttl > 0 and data and not error:
+            await self.__run_blocking(
+                self.cache.set, cachekey, entity, action_id, data, ttl
+            )
+
+        return error, data
+
+    async def __send(self, entity, action, action_id, action_sub_id, payload,
+                     additional_headers):
+        """Send the request to 3Commas."""
+
+        if entity not in API_METHODS:
+            raise ValueError("Invalid entity")
+        if action not in API_METHODS[entity]:
+            raise ValueError("Invalid action")
+
+        method, apipath = API_METHODS[entity][action]
+        if "{id}" in apipath and not action_id:
+            raise ValueError(f"Missing ID for {action}")
+
+        apipath = apipath.replace("{id}", action_id or "")
+        apipath = apipath.replace("{sub_id}", action_sub_id or "")
+        path = f"{entity}/{apipath}" if apipath else entity
+
+        if entity in API_VERSION_V2_ENTITIES:
+            relativeurl = f"{API_VERSION_V2}{path.replace('_v2', '')}"
+        else:
+            relativeurl = f"{API_VERSION_V1}{path}"
+
+        if method == "GET":
+            if payload:
+                relativeurl += f"?{urlencode(payload, quote_via=quote_plus)}"
+            payload = None
+        elif payload is not None and len(payload) == 0:
+            payload = None
+
+        body = json.dumps(payload) if payload is not None else ""
+        headers = {
+            "APIKEY": self.key,
+            "Signature": self.__generate_signature(relativeurl, body),
+            **(additional_headers or {}),
+        }
+
+        if self.circuitbreaker is not None:
+            waitseconds = await self.__run_blocking(self.circuitbreaker.allow, entity, action)
+            if waitseconds > 0:
+                return {
+                    "error": True,
+                    "msg": (
+                        f"3Commas API endpoint {entity}/{action} is unavailable, "
+                        f"retry in {waitseconds:.0f}s"
+                    ),
+                    "status_code": None,
+                    "circuit_open": True,
+                }, {}
+
+        session = self.__get_session()
+        retrycount = 0
+        while True:
+            await self.__wait_for_ratelimit()
+
+            start = time.time()
+            try:
+                async with self.semaphore:
+                    async with session.request(
+                        method, f"{self.api_url}{relativeurl}", headers=headers, json=payload
+                    ) as response:
+                        status = response.status
+                        retryafter = response.headers.get("Retry-After", "")
+                        responsebody = await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+                error = {
+                    "error": True,
+                    "msg": f"Other error occurred: {err}",
+                    "status_code": None,
+                }
+                self.__record(entity, action, start, error, len(body), 0)
+                if self.circuitbreaker is not None:
+                    await self.__run_blocking(
+                        self.circuitbreaker.record_failure, entity, action
+                    )
+                return error, {}
+
+            try:
+                responsejson = jsonbackend.loads(responsebody)
+            except ValueError as err:
+                # For example the HTML error page of a proxy, retried like other errors
+                responsejson = {"error": True, "msg": f"Other error occurred: {err}"}
+
+            iserror = isinstance(responsejson, dict) and "error" in responsejson
+            self.__record(entity, action, start, iserror, len(body), len(responsebody))
+
+            if not iserror:
+                if self.circuitbreaker is not None:
+                    await self.__run_blocking(
+                        self.circuitbreaker.record_success, entity, action
+                    )
+                return {}, responsejson
+
+            retryafter = float(retryafter) if retryafter.isdigit() else None
+            if (
+                status in self.request_retry_status_codes
+                and retrycount < self.request_retries_count
+                and (retryafter or 0) <= self.request_timeout
+            ):
+                retrycount += 1
+                await asyncio.sleep(
+                    max(
+                        retryafter or 0,
+                        get_backoff_time(retrycount, self.request_retry_backoff_factor),
+                    )
+                )
+                continue
+
+            responsejson["status_code"] = status
+            if "msg" not in responsejson:
+                responsejson["msg"] = (
+                    f"{responsejson.get('error')} {responsejson.get('error_description')}"
+                )
+
+            if self.circuitbreaker is not None:
+                if is_server_failure(responsejson):
+                    await self.__run_blocking(
+                        self.circuitbreaker.record_failure, entity, action, retryafter
+                    )
+                else:
+                    await self.__run_blocking(
+                        self.circuitbreaker.record_success, entity, action
+                    )
+
+            return responsejson, {}
+
+    @staticmethod
+    async def __run_blocking(function, *args):
+        """Run the function in a thread, because the shared rate limiter, circuit breaker
+        and cache can wait up to seconds for a lock on their database."""
+
+        return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+    def __record(self, entity, action, start, error, requestbytes, responsebytes):
+        """Record the request in the metrics, when enabled."""
+
+        if self.metrics is not None:
+            self.metrics.record(
+                entity, action, time.time() - start, error, requestbytes, responsebytes
+            )
+
+    async def __wait_for_ratelimit(self):
+        """Wait until the shared rate limiter allows the next request."""
+
+        if self.ratelimiter is None:
+            return
+
+        waited = 0.0
+        while True:
+            waitseconds = await self.__run_blocking(self.ratelimiter.reserve_token)
+            if waitseconds <= 0:
+                break
+
+            await asyncio.sleep(waitseconds)
+            waited += waitseconds
+
+        await self.__run_blocking(self.ratelimiter.register, waited)
+
+    async def close(self):
+        """Close the session and its connections."""
+
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+
+async def get_threecommas_bots_async(logger, api, botids):
+    """Get the data of multiple bots in parallel."""
+
+    results = await asyncio.gather(
+        *[
+            api.request(entity="bots", action="show", action_id=str(botid))
+            for botid in botids
+        ]
+    )
+
+    bots = {}
+    for botid, (error, data) in zip(botids, results):
+        if data:
+            bots[botid] = data
+        elif error and "msg" in error:
+            logger.error(f"Error occurred fetching bot ({botid}) data: {error['msg']}")
+        else:
+            logger.error(f"Error occurred fetching bot ({botid}) data")
+
+    return bots
+
+
+async def fetch_threecommas_account_info_async(logger, api, accountid):
+    """Fetch the account info from 3Commas, used to get the market_code."""
+
+    # get account data for accountid, in real mode
+    error, data = await api.request(
+        entity="accounts",
+        action="account_info",
+        action_id=str(accountid),
+        additional_headers={"Forced-Mode": "real"},
+    )
+    if data:
+        return data
+    if error and error.get("status_code") == 404:
+        logger.error(
+            f"Error occurred fetching 3Commas account market code: "
+            f"accountid '{accountid}' was not found!"
+        )
+    elif error and "msg" in error:
+        logger.error(
+            f"Fetching 3Commas account market code failed for id '{accountid}': {error['msg']}"
+        )
+    else:
+        logger.error(f"Fetching 3Commas account market code failed for id {accountid}")
+
+    return None
+
+
+async def get_threecommas_active_deals_async(logger, api, botid):
+    """Get the active deals from 3Commas linked to a bot."""
+
+    error, data = await api.request(
+        entity="deals",
+        action="",
+        payload={
+            "scope": "active",
+            "bot_id": str(botid),
+            "limit": 100,
+        },
+    )
+    if error:
+        if "msg" in error:
+            logger.error(
+                f"Error occurred while fetching deals error: {error['msg']}"
+            )
+        else:
+            logger.error("Error occurred while fetching deals")
+    else:
+        logger.debug(
+            f"Fetched the deals for bot {botid} OK ({len(data)} deals)"
+        )
+
+    return data
+
+
+async def trigger_threecommas_bot_deal_async(logger, api, thebot, pair, skip_checks=False):
+    """Trigger bot to start deal asap."""
+
+    error, data = await api.request(
+        entity="bots",
+        action="start_new_deal",
+        action_id=str(thebot["id"]),
+        payload={"pair": pair, "skip_signal_checks": skip_checks, "bot_id": thebot["id"]},
+    )
+    if data:
+        logger.info(
+            f"Bot '{thebot['name']}' with id '{thebot['id']}' "
+            f"triggered start_new_deal for: {pair}",
+            True
+        )
+    else:
+        if error and "msg" in error:
+            logger.error(
+                f"Error occurred while triggering start_new_deal on "
+                f"bot '{thebot['name']}': {error['msg']}"
+            )
+        else:
+            logger.error(
+                f"Error occurred while triggering start_new_deal on "
+                f"bot '{thebot['name']}'"
+            )
+
+
+async def control_threecommas_bots_async(logger, api, thebot, cmd):
+    """Enable or disable a bot."""
+
+    error, data = await api.request(
+        entity="bots",
+        action=cmd,
+        action_id=str(thebot["id"]),
+    )
+    if data:
+        logger.info(
+            f"Bot '{thebot['name']}' is {cmd}",
+            True
+        )
+    else:
+        if error and "msg" in error:
+            logger.error(
+                f"Error occurred while '{thebot['name']}' bot was {cmd}: {error['msg']}"
+            )
+        else:
+            logger.error(
+                f"Error occurred while '{thebot['name']}' bot was {cmd}"
+            )
+
+
+async def close_threecommas_deal_async(logger, api, dealid, pair):
+    """Close deal with certain id."""
+
+    error, data = await api.request(
+        entity="deals",
+        action="panic_sell",
+        action_id=str(dealid),
+    )
+    if error:
+        if "msg" in error:
+            logger.error(
+                f"Error occurred while closing deal {dealid}/{pair}: {error['msg']}"
+            )
+        else:
+            logger.error("Error occurred while closing deal")
+
+    return data
@@ -0,0 +1,286 @@
+"""Cyberjunky's 3Commas bot helpers."""
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+
+from . import jsonbackend
+
+# Number of events queued per subscriber before the oldest are dropped
+BROKER_QUEUE_SIZE = 1000
+
+# Number of seconds between the heartbeats sent to the subscribers
+BROKER_HEARTBEAT_INTERVAL = 10
+
+
+def parse_broker_address(address):
+    """Return the socket family and address: a path for a Unix domain socket,
+    or host:port for local TCP."""
+
+    if ":" in address and not address.startswith("/"):
+        host, _, port = address.rpartition(":")
+        return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+    return socket.AF_UNIX, address
+
+
+class ThreeCommasEventBroker:
+    """Republish the events of one 3Commas websocket connection to the subscribed
+    scripts, as JSON lines over a Unix domain socket or local TCP.
+
+    Each subscriber has a bounded queue, so a slow subscriber doesn't block the
+    websocket or the others. When its queue is full the oldest event is dropped, and the
+    subscriber is told to resync its channels like after a reconnect."""
+
+    def __init__(self, logger, address, queuesize=BROKER_QUEUE_SIZE):
+        self.logger = logger
+        self.address = address
+        self.queuesize = queuesize
+
+        self.lock = threading.Lock()
+        self.subscribers = {}
+        self.nextid = 0
+        self.published = 0
+
+        family, bindaddress = parse_broker_address(address)
+        if family == socket.AF_UNIX and os.path.exists(bindaddress):
+            os.remove(bindaddress)
+
+        broker = self
+
+        class SubscriberHandler(socketserver.StreamRequestHandler):
+            """Handle one subscriber connection."""
+
+            def handle(self):
+                broker.serve_subscriber(self.rfile, self.wfile, self.client_address)
+
+        serverclass = (
+            socketserver.ThreadingUnixStreamServer if family == socket.AF_UNIX
+            else socketserver.ThreadingTCPServer
+        )
+        serverclass.daemon_threads = True
+        serverclass.allow_reuse_address = True
+        self.server = serverclass(bindaddress, SubscriberHandler)
+
+    def start(self):
+        """Start accepting subscribers."""
+
+        threading.Thread(
+            target=self.server.serve_forever, name="threecommas-broker", daemon=True
+        ).start()
+        threading.Thread(
+            target=self.__heartbeat_loop, name="threecommas-broker-heartbeat", daemon=True
+        ).start()
+
+        self.logger.info(f"3Commas event broker listening on {self.address}")
+
+    def publish(self, channel, event):
+        """Queue the event for all subscribers of the channel."""
+
+        self.__publish({"type": "event", "channel": channel, "event": event}, channel)
+        self.published += 1
+
+    def publish_subscribed(self, channel):
+        """Tell the subscribers the websocket (re)subscribed, events could have been missed."""
+
+        self.__publish({"type": "subscribed", "channel": channel}, channel)
+
+    def __publish(self, message, channel):
+        """Queue the message for all subscribers of the channel."""
+
+        line = f"{json.dumps(message)}\n".encode()
+
+        with self.lock:
+            subscribers = list(self.subscribers.values())
+
+        for subscriber in subscribers:
+            if channel is not None and channel not in subscriber["channels"]:
+                continue
+
+            dropped = self.__queue(subscriber, line)
+            if dropped:
+                # The dropped events can be of other deals than this one, so the
+                # subscriber must fetch the current state again
+                for subscribedchannel in subscriber["channels"]:
+                    dropped += self.__queue(
+                        subscriber,
+                        f"{json.dumps({'type': 'subscribed', 'channel': subscribedchannel})}\n"
+                        .encode()
+                    )
+
+            with self.lock:
+                subscriber["dropped"] += dropped
+                subscriber["maxlag"] = max(subscriber["maxlag"], subscriber["queue"].qsize())
+
+    @staticmethod
+    def __queue(subscriber, line):
+        """Queue the line for the subscriber, and return the number of oldest lines
+        dropped to make room for it."""
+
+        dropped = 0
+        while True:
+            try:
+                subscriber["queue"].put_nowait(line)
+                return dropped
+            except queue.Full:
+                try:
+                    subscriber["queue"].get_nowait()
+                    dropped += 1
+                except queue.Empty:
+                    pass
+
+    def serve_subscriber(self, rfile, wfile, clientaddress):
+        """Read the subscription of the subscriber, and send its queued events until it
+        disconnects."""
+
+        try:
+            subscription = json.loads(rfile.readline() or "{}")
+        except ValueError:
+            subscription = {}
+
+        with self.lock:
+            self.nextid += 1
+            subscriberid = self.nextid
+            subscriber = {
+                "name": f"{subscription.get('name', clientaddress or 'subscriber')}-{subscriberid}",
+                "channels": set(subscription.get("channels", [])),
+                "queue": queue.Queue(self.queuesize),
+                "sent": 0,
+                "dropped": 0,
+                "maxlag": 0,
+            }
+            self.subscribers[subscriberid] = subscriber
+
+        self.logger.info(
+            f"Subscriber '{subscriber['name']}' connected to 3Commas event broker "
+            f"for {sorted(subscriber['channels'])}"
+        )
+
+        try:
+            while True:
+                line = subscriber["queue"].get()
+                wfile.write(line)
+                wfile.flush()
+                with self.lock:
+                    subscriber["sent"] += 1
+        except OSError:
+            pass
+        finally:
+            with self.lock:
+                del self.subscribers[subscriberid]
+
+            self.logger.info(
+                f"Subscriber '{subscriber['name']}' disconnected from 3Commas event broker "
+                f"({subscriber['sent']} sent, {subscriber['dropped']} dropped)"
+            )
+
+    def __heartbeat_loop(self):
+        """Send heartbeats, so subscribers can detect a broken feed."""
+
+        while True:
+            time.sleep(BROKER_HEARTBEAT_INTERVAL)
+            self.__publish({"type": "ping"}, None)
+
+    def get_stats(self):
+        """Return the number of published events, and the sent, dropped and queued
+        (lag) events per subscriber."""
+
+        with self.lock:
+            return {
+                "published": self.published,
+                "subscribers": {
+                    subscriber["name"]: {
+                        "sent": subscriber["sent"],
+                        "dropped": subscriber["dropped"],
+                        "lag": subscriber["queue"].qsize(),
+                        "max-lag": subscriber["maxlag"],
+                    }
+                    for subscriber in self.subscribers.values()
+                },
+            }
+
+
+class ThreeCommasEventSubscriber:
+    """Receive the 3Commas websocket events from the event broker. Can be used instead
+    of ThreeCommasWebsocketHandler."""
+
+    def __init__(self, logger, address, handlers, on_subscribed=None):
+        self.logger = logger
+        self.address = address
+        self.handlers = handlers
+        self.on_subscribed = on_subscribed
+        self.last_message = time.time()
+
+    def start_listener(self, seperate_thread=False):
+        """Connect to the broker and handle the events, reconnecting when needed."""
+
+        if seperate_thread:
+            threading.Thread(
+                target=self.__listen_loop, name="threecommas-subscriber", daemon=True
+            ).start()
+        else:
+            self.__listen_loop()
+
+    def get_last_message_time(self):
+        """Time the last message (event or heartbeat) was received."""
+
+        return self.last_message
+
+    def __listen_loop(self):
+        """Keep listening to the broker."""
+
+        retrydelay = 1
+        while True:
+            try:
+                self.__listen()
+                retrydelay = 1
+            except (OSError, ValueError) as err:
+                self.logger.debug(f"Connection to 3Commas event broker failed: {err}")
+
+            time.sleep(retrydelay)
+            retrydelay = min(60, retrydelay * 2)
+
+    def __listen(self):
+        """Subscribe to the broker and handle the events until the connection closes."""
+
+        family, address = parse_broker_address(self.address)
+        with socket.socket(family, socket.SOCK_STREAM) as connection:
+            connection.connect(address)
+            connection.sendall(
+                f"{json.dumps({'name': self.logger.program, 'channels': list(self.handlers)})}\n"
+                .encode()
+            )
+            self.logger.info(f"Subscribed to 3Commas event broker {self.address}")
+
+            # Events could have been missed while not connected
+            for channel in self.handlers:
+                self.__subscribed(channel)
+
+            for line in connection.makefile("r", encoding="utf-8"):
+                self.last_message = time.time()
+
+                # A bad message must not end the listener, skip it and continue
+                try:
+                    self.__handle(jsonbackend.loads(line))
+                except Exception as err:  # pylint: disable=broad-except
+                    self.logger.error(
+                        f"Handling 3Commas event broker message failed: {err!r} "
+                        f"({line.strip()[:200]})"
+                    )
+
+    def __handle(self, message):
+        """Handle one message of the broker."""
+
+        if message["type"] == "event":
+            self.handlers[message["channel"]](message["event"])
+        elif message["type"] == "subscribed":
+            self.__subscribed(message["channel"])
+
+    def __subscribed(self, channel):
+        """Call the subscribed callback, when there is one."""
+
+        if self.on_subscribed:
+            self.on_subscribed(channel)
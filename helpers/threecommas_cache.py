@@ -0,0 +1,210 @@
+"""Cyberjunky's 3Commas bot helpers."""
+import hashlib
+import json
+import threading
+import time
+
+from .database import open_database
+
+# Default number of seconds a response of the entity/action is considered valid
+CACHE_TTL = {
+    "bots/": 30,
+    "bots/show": 30,
+    "bots/pairs_black_list": 300,
+    "accounts/": 300,
+    "accounts/account_info": 3600,
+    "accounts/market_pairs": 3600,
+}
+
+# Entities of which the cached data must be removed after writing to an entity
+CACHE_INVALIDATION = {
+    "bots": ("bots",),
+    "deals": ("bots", "deals"),
+    "accounts": ("accounts",),
+}
+
+# Number of seconds between storing the hit/miss counters in the shared database
+STATS_FLUSH_INTERVAL = 60
+
+
+class ThreeCommasCache:
+    """Cache for 3Commas API responses, shared between processes by using SQLite.
+
+    Each API key has its own database, so scripts using different 3Commas accounts
+    never get each other's responses."""
+
+    def __init__(self, logger, cache_dir, apikey, ttl_overrides=None):
+        self.logger = logger
+        self.program = getattr(logger, "program", "unknown")
+        self.dbpath = f"{cache_dir}/threecommas_cache_{self.get_key_hash(apikey)}.sqlite3"
+
+        self.ttl = dict(CACHE_TTL)
+        if ttl_overrides:
+            self.ttl.update(ttl_overrides)
+
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.flushedhits = 0
+        self.flushedmisses = 0
+        self.lastflush = time.time()
+
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT Primary Key, "
+            "entity TEXT, "
+            "action_id TEXT, "
+            "fetched FLOAT, "
+            "expires FLOAT, "
+            "data TEXT"
+            ")"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS statistics ("
+            "program TEXT Primary Key, "
+            "hits INT DEFAULT 0, "
+            "misses INT DEFAULT 0, "
+            "last_updated INT"
+            ")"
+        )
+        self.db.commit()
+
+        logger.info(f"3Commas API cache '{self.dbpath}' opened successfully")
+
+    @property
+    def db(self):
+        """The connection of this thread to the database."""
+
+        return open_database(self.dbpath)
+
+    @staticmethod
+    def get_key_hash(apikey):
+        """Return a short hash of the API key, to keep the key itself out of file names."""
+
+        return hashlib.sha256(str(apikey).encode("utf-8")).hexdigest()[:16]
+
+    def get_ttl(self, entity, action):
+        """Return the TTL for the entity/action, zero when it should not be cached."""
+
+        return self.ttl.get(f"{entity}/{action}", 0)
+
+    @staticmethod
+    def create_key(entity, action, action_id, payload, additional_headers):
+        """Create the unique key for a request."""
+
+        mode = ""
+        if additional_headers:
+            mode = additional_headers.get("Forced-Mode", "")
+
+        return (
+            f"{entity}/{action}/{action_id or ''}/{mode}/"
+            f"{json.dumps(payload, sort_keys=True) if payload else ''}"
+        )
+
+    def get(self, key, max_age=None):
+        """Get the cached data for the key, or None when not (validly) cached."""
+
+        now = time.time()
+        with self.lock:
+            dbrow = self.db.execute(
+                "SELECT fetched, expires, data FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            data = None
+            if dbrow is not None and dbrow[1] > now:
+                if max_age is None or (now - dbrow[0]) <= max_age:
+                    data = json.loads(dbrow[2])
+
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+            self.__flush_stats(now)
+
+        return data
+
+    def set(self, key, entity, action_id, data, ttl):
+        """Store the data for the key."""
+
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "REPLACE INTO responses (key, entity, action_id, fetched, expires, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, entity, str(action_id or ""), now, now + ttl, json.dumps(data))
+            )
+            self.db.execute("DELETE FROM responses WHERE expires < ?", (now,))
+            self.db.commit()
+
+    def invalidate(self, entity, action_id=None):
+        """Remove cached data which could have been changed by a write to the entity."""
+
+        with self.lock:
+            for cachedentity in CACHE_INVALIDATION.get(entity, (entity,)):
+                if action_id and cachedentity == entity:
+                    # Remove the single item and all lists of this entity
+                    self.db.execute(
+                        "DELETE FROM responses WHERE entity = ? AND action_id IN (?, '')",
+                        (cachedentity, str(action_id))
+                    )
+                else:
+                    self.db.execute(
+                        "DELETE FROM responses WHERE entity = ?", (cachedentity,)
+                    )
+            self.db.commit()
+
+            self.invalidations += 1
+
+        self.logger.debug(
+            f"Invalidated cached 3Commas data after write to {entity} {action_id or ''}"
+        )
+
+    def get_stats(self):
+        """Return the hit/miss counters of this process and all processes together."""
+
+        with self.lock:
+            self.__flush_stats(time.time(), True)
+
+            totals = self.db.execute(
+                "SELECT SUM(hits), SUM(misses) FROM statistics"
+            ).fetchone()
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "total-hits": totals[0] or 0,
+            "total-misses": totals[1] or 0,
+        }
+
+    def __flush_stats(self, now, force=False):
+        """Store the new hits and misses in the shared database (lock must be held)."""
+
+        if not force and (now - self.lastflush) < STATS_FLUSH_INTERVAL:
+            return
+
+        newhits = self.hits - self.flushedhits
+        newmisses = self.misses - self.flushedmisses
+        if newhits or newmisses:
+            self.db.execute(
+                "INSERT OR IGNORE INTO statistics (program, hits, misses, last_updated) "
+                "VALUES (?, 0, 0, ?)", (self.program, int(now))
+            )
+            self.db.execute(
+                "UPDATE statistics SET hits = hits + ?, misses = misses + ?, "
+                "last_updated = ? WHERE program = ?",
+                (newhits, newmisses, int(now), self.program)
+            )
+            self.db.commit()
+
+            self.flushedhits = self.hits
+            self.flushedmisses = self.misses
+
+            self.logger.debug(
+                f"3Commas API cache: {self.hits} hits and {self.misses} misses "
+                f"since start ({self.invalidations} invalidations)"
+            )
+
+        self.lastflush = now
@@ -0,0 +1,223 @@
+"""Cyberjunky's 3Commas bot helpers."""
+import random
+import sqlite3
+import threading
+import time
+
+from .database import open_database, open_memory_database
+
+# Number of consecutive failures after which the circuit of an endpoint opens
+CIRCUIT_FAILURE_THRESHOLD = 5
+
+# First and maximum number of seconds a circuit stays open, doubled on each reopen
+CIRCUIT_OPEN_SECONDS = 30
+CIRCUIT_MAX_OPEN_SECONDS = 900
+
+# Endpoints of the stop-loss, take profit and safety order actions. These must go on,
+# so they are never rejected by an open circuit.
+CIRCUIT_CRITICAL_ENDPOINTS = (
+    "deals/update_deal",
+    "deals/add_funds",
+    "deals/cancel_order",
+    "deals/panic_sell",
+)
+
+
+def is_server_failure(error):
+    """Return True when the error means 3Commas is unavailable or overloaded, not that
+    the request itself was wrong."""
+
+    if not error:
+        return False
+
+    statuscode = error.get("status_code")
+    return statuscode is None or statuscode == 429 or statuscode >= 500
+
+
+def get_backoff_time(attempt, factor, maximum=CIRCUIT_MAX_OPEN_SECONDS):
+    """Return the exponential backoff time with full jitter for the attempt (1 based)."""
+
+    return random.uniform(0, min(maximum, factor * (2 ** (attempt - 1))))
+
+
+class ThreeCommasCircuitBreaker:
+    """Circuit breaker per 3Commas endpoint (entity/action). After repeated failures
+    the circuit opens and requests fail fast, until a single probe request is allowed
+    (half-open) which closes the circuit again on success.
+
+    With a (shared) directory, the circuits are stored on disk so all scripts know
+    3Commas is degraded."""
+
+    def __init__(self, logger, cache_dir=None, threshold=CIRCUIT_FAILURE_THRESHOLD,
+                 opentime=CIRCUIT_OPEN_SECONDS, maxopentime=CIRCUIT_MAX_OPEN_SECONDS):
+        self.logger = logger
+        self.program = getattr(logger, "program", "unknown")
+        self.threshold = threshold
+        self.opentime = opentime
+        self.maxopentime = maxopentime
+
+        self.lock = threading.Lock()
+        self.rejected = 0
+
+        self.dbpath = f"{cache_dir}/threecommas_circuits.sqlite3" if cache_dir else None
+        self.memorydb = open_memory_database(True) if not cache_dir else None
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS circuits ("
+            "endpoint TEXT Primary Key, "
+            "failures INT, "
+            "opened INT, "
+            "open_until FLOAT, "
+            "probe_until FLOAT"
+            ")"
+        )
+
+    @property
+    def db(self):
+        """The connection of this thread to the database."""
+
+        if self.memorydb is not None:
+            return self.memorydb
+
+        return open_database(self.dbpath, autocommit=True)
+
+    def __get_circuit(self, endpoint):
+        """Return the failures, number of times opened, open until and probe until
+        time of the endpoint (lock must be held)."""
+
+        dbrow = self.db.execute(
+            "SELECT failures, opened, open_until, probe_until FROM circuits "
+            "WHERE endpoint = ?",
+            (endpoint,)
+        ).fetchone()
+
+        return dbrow if dbrow is not None else (0, 0, 0.0, 0.0)
+
+    def __set_circuit(self, endpoint, failures, opened, openuntil, probeuntil):
+        """Store the circuit of the endpoint (lock must be held)."""
+
+        self.db.execute(
+            "REPLACE INTO circuits (endpoint, failures, opened, open_until, probe_until) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (endpoint, failures, opened, openuntil, probeuntil)
+        )
+
+    def allow(self, entity, action):
+        """Return 0 when the request may be sent, otherwise the number of seconds
+        until the circuit of the endpoint allows a probe request."""
+
+        endpoint = f"{entity}/{action}"
+        now = time.time()
+        critical = endpoint in CIRCUIT_CRITICAL_ENDPOINTS
+
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                failures, opened, openuntil, probeuntil = self.__get_circuit(endpoint)
+
+                waitseconds = 0.0
+                if now < openuntil and not critical:
+                    waitseconds = openuntil - now
+                elif opened and now < probeuntil and not critical:
+                    # Half-open, another request is already probing
+                    waitseconds = probeuntil - now
+                elif opened:
+                    # Half-open, this request is the probe. Another one is allowed
+                    # when it doesn't report back in time.
+                    self.__set_circuit(endpoint, failures, opened, openuntil, now + 30)
+
+                self.db.execute("COMMIT")
+            except sqlite3.Error:
+                self.db.execute("ROLLBACK")
+                raise
+
+            if waitseconds > 0:
+                self.rejected += 1
+
+        return waitseconds
+
+    def record_success(self, entity, action):
+        """Close the circuit of the endpoint."""
+
+        endpoint = f"{entity}/{action}"
+
+        with self.lock:
+            failures, opened, _, _ = self.__get_circuit(endpoint)
+            if failures or opened:
+                self.db.execute("DELETE FROM circuits WHERE endpoint = ?", (endpoint,))
+
+        if opened:
+            self.logger.info(f"3Commas API endpoint {endpoint} recovered, circuit closed")
+
+    def record_failure(self, entity, action, retryafter=None):
+        """Count the failure, and open the circuit of the endpoint when there are too many
+        failures or the probe failed."""
+
+        endpoint = f"{entity}/{action}"
+        now = time.time()
+
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                failures, opened, openuntil, probeuntil = self.__get_circuit(endpoint)
+                failures += 1
+
+                opentime = 0.0
+                if opened or failures >= self.threshold:
+                    opened += 1
+                    opentime = self.opentime * (2 ** (opened - 1))
+                    opentime = min(self.maxopentime, opentime) * random.uniform(0.5, 1.0)
+                    opentime = max(opentime, retryafter or 0)
+                    openuntil = now + opentime
+                    probeuntil = openuntil
+
+                self.__set_circuit(endpoint, failures, opened, openuntil, probeuntil)
+                self.db.execute("COMMIT")
+            except sqlite3.Error:
+                self.db.execute("ROLLBACK")
+                raise
+
+        if opentime:
+            self.logger.warning(
+                f"3Commas API endpoint {endpoint} failed {failures} times, "
+                f"circuit opened for {opentime:.0f}s",
+                False
+            )
+
+    def is_open(self, entity=None, action=None):
+        """Return True when the circuit of the endpoint, or of any endpoint when none is
+        given, is open. A half-open circuit is not, so the probe request can be sent."""
+
+        now = time.time()
+        with self.lock:
+            if entity is None:
+                dbrow = self.db.execute(
+                    "SELECT COUNT(*) FROM circuits WHERE opened > 0 AND open_until > ?",
+                    (now,)
+                ).fetchone()
+                return dbrow[0] > 0
+
+            _, opened, openuntil, _ = self.__get_circuit(f"{entity}/{action}")
+            return opened > 0 and openuntil > now
+
+    def get_retry_time(self):
+        """Return the number of seconds until all open circuits allow a probe request."""
+
+        with self.lock:
+            dbrow = self.db.execute("SELECT MAX(open_until) FROM circuits").fetchone()
+
+        return max(0.0, (dbrow[0] or 0.0) - time.time())
+
+    def get_stats(self):
+        """Return the open circuits and the number of rejected requests."""
+
+        with self.lock:
+            opencircuits = [
+                dbrow[0] for dbrow in self.db.execute(
+                    "SELECT endpoint FROM circuits WHERE opened > 0"
+                )
+            ]
+
+            return {
+                "open": opencircuits,
+                "rejected": self.rejected,
+            }
@@ -0,0 +1,136 @@
+"""Cyberjunky's 3Commas bot helpers."""
+import threading
+import time
+
+# Number of seconds without any websocket message (3Commas sends a ping every few
+# seconds) after which events could have been missed
+DEAL_STORE_MAX_SILENCE = 60
+
+# Number of seconds to collect a burst of events (like several deals updated at once),
+# so they are handled in one pass
+DEAL_STORE_COALESCE_SECONDS = 0.5
+
+# Deal statuses after which the deal is no longer active
+FINISHED_DEAL_STATUSES = ("completed", "cancelled", "failed", "panic_sold")
+
+
+class ThreeCommasDealStore:
+    """The active deals of the bots, kept up to date by the websocket DealsChannel events.
+    A bot is only fetched through REST to (re)sync it, after a reconnect or a gap."""
+
+    def __init__(self, logger, maxsilence=DEAL_STORE_MAX_SILENCE):
+        self.logger = logger
+        self.maxsilence = maxsilence
+
+        self.condition = threading.Condition()
+        self.bots = {}
+        self.deals = {}
+        self.synced = {}
+        self.pending = set()
+        self.events = 0
+
+    def on_subscribed(self, channel="DealsChannel"):
+        """(Re)subscribed to the websocket, events could have been missed in between."""
+
+        if channel != "DealsChannel":
+            return
+
+        with self.condition:
+            if self.synced:
+                self.logger.info(
+                    f"Websocket (re)connected, resyncing the deals of {len(self.synced)} bots"
+                )
+            self.synced.clear()
+
+    def on_event(self, deal):
+        """Store the deal received from the websocket."""
+
+        botid = int(deal["bot_id"])
+
+        with self.condition:
+            self.events += 1
+
+            # Deals of bots which are not monitored are not stored
+            if botid not in self.deals:
+                return
+
+            deals = self.deals[botid]
+            known = deals.get(deal["id"])
+            if known and known.get("updated_at", "") > deal.get("updated_at", ""):
+                return
+
+            if deal.get("finished?") or deal.get("status", "").lower() in FINISHED_DEAL_STATUSES:
+                deals.pop(deal["id"], None)
+            else:
+                deals[deal["id"]] = deal
+
+            self.pending.add(botid)
+            self.condition.notify_all()
+
+    def check_gap(self, lastmessage):
+        """Resync all bots when nothing has been received for too long."""
+
+        if time.time() - lastmessage <= self.maxsilence:
+            return
+
+        with self.condition:
+            if self.synced:
+                self.logger.warning(
+                    f"No websocket data received for {time.time() - lastmessage:.0f}s, "
+                    f"resyncing the deals of {len(self.synced)} bots",
+                    False
+                )
+            self.synced.clear()
+
+    def needs_sync(self, botid, maxage):
+        """Return True when the deals of the bot must be fetched through REST."""
+
+        with self.condition:
+            synced = self.synced.get(int(botid))
+
+        return synced is None or (time.time() - synced) > maxage
+
+    def sync_bot(self, botdata):
+        """Replace the stored data of the bot with the data fetched through REST."""
+
+        botid = int(botdata["id"])
+        with self.condition:
+            self.bots[botid] = botdata
+            self.deals[botid] = {deal["id"]: deal for deal in botdata["active_deals"]}
+            self.synced[botid] = time.time()
+            self.pending.discard(botid)
+
+    def get_bot(self, botid):
+        """Return the bot data with the current active deals, or None when unknown."""
+
+        with self.condition:
+            botdata = self.bots.get(int(botid))
+            if botdata is None:
+                return None
+
+            return {**botdata, "active_deals": list(self.deals[int(botid)].values())}
+
+    def wait_for_events(self, timeout, coalesce=DEAL_STORE_COALESCE_SECONDS):
+        """Wait until deals have been updated, at most timeout seconds, and then the
+        coalesce time for the rest of the burst. Returns True when there are updated
+        deals to handle (see pop_events)."""
+
+        with self.condition:
+            if not self.pending:
+                self.condition.wait(timeout)
+
+                if self.pending:
+                    deadline = time.time() + coalesce
+                    while time.time() < deadline:
+                        self.condition.wait(deadline - time.time())
+
+            return bool(self.pending)
+
+    def pop_events(self):
+        """Return the ids of the bots with updated deals, and clear them."""
+
+        with self.condition:
+            botids = self.pending
+            self.pending = set()
+
+        return botids
@@ -0,0 +1,214 @@
+"""Cyberjunky's 3Commas bot helpers."""
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (in seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class ThreeCommasMetrics:
+    """Count, errors, latency and payload size of the 3Commas API requests per
+    entity/action, exported as JSON file and/or Prometheus text endpoint."""
+
+    def __init__(self, logger, dumpfile=None, dumpinterval=0, port=0, host="127.0.0.1"):
+        self.logger = logger
+        self.program = getattr(logger, "program", "unknown")
+        self.dumpfile = dumpfile
+        self.dumpinterval = dumpinterval
+        self.lastdump = time.time()
+
+        self.lock = threading.Lock()
+        self.endpoints = {}
+        self.started = time.time()
+
+        if port:
+            self.__start_server(host, port)
+
+    def __get_endpoint(self, entity, action):
+        """Return the counters of the endpoint (lock must be held)."""
+
+        key = f"{entity}/{action}"
+        endpoint = self.endpoints.get(key)
+        if endpoint is None:
+            endpoint = {
+                "requests": 0,
+                "errors": 0,
+                "cache-hits": 0,
+                "latency-sum": 0.0,
+                "latency-buckets": [0] * (len(LATENCY_BUCKETS) + 1),
+                "request-bytes": 0,
+                "response-bytes": 0,
+            }
+            self.endpoints[key] = endpoint
+
+        return endpoint
+
+    def record(self, entity, action, duration, error, requestbytes, responsebytes):
+        """Record a request which has been sent to 3Commas, with the size of the sent
+        and received body as taken from the transport."""
+
+        with self.lock:
+            endpoint = self.__get_endpoint(entity, action)
+            endpoint["requests"] += 1
+            if error:
+                endpoint["errors"] += 1
+            endpoint["latency-sum"] += duration
+            endpoint["request-bytes"] += requestbytes
+            endpoint["response-bytes"] += responsebytes
+
+            bucket = len(LATENCY_BUCKETS)
+            for index, upperbound in enumerate(LATENCY_BUCKETS):
+                if duration <= upperbound:
+                    bucket = index
+                    break
+            endpoint["latency-buckets"][bucket] += 1
+
+        self.__dump_if_due()
+
+    def record_cache_hit(self, entity, action):
+        """Record a request which has been served without calling 3Commas."""
+
+        with self.lock:
+            self.__get_endpoint(entity, action)["cache-hits"] += 1
+
+    def get_stats(self):
+        """Return a copy of the counters per endpoint."""
+
+        with self.lock:
+            return {
+                "program": self.program,
+                "started": int(self.started),
+                "endpoints": json.loads(json.dumps(self.endpoints)),
+            }
+
+    def __dump_if_due(self):
+        """Write the JSON dump when the interval has passed."""
+
+        if not self.dumpfile or self.dumpinterval <= 0:
+            return
+
+        now = time.time()
+        with self.lock:
+            if now - self.lastdump < self.dumpinterval:
+                return
+
+            self.lastdump = now
+
+        self.dump()
+
+    def dump(self):
+        """Write the counters to the JSON dump file."""
+
+        stats = self.get_stats()
+        stats["updated"] = int(time.time())
+        stats["buckets"] = list(LATENCY_BUCKETS)
+
+        # Write to a temporary file of this writer first, so readers never see a
+        # partial file
+        tmpfile = None
+        try:
+            with tempfile.NamedTemporaryFile(
+                "w", encoding="utf-8", dir=os.path.dirname(self.dumpfile) or ".",
+                prefix=f"{os.path.basename(self.dumpfile)}.", suffix=".tmp", delete=False
+            ) as file:
+                tmpfile = file.name
+                json.dump(stats, file, indent=2)
+            os.replace(tmpfile, self.dumpfile)
+        except OSError as err:
+            self.logger.debug(f"Writing 3Commas API metrics to '{self.dumpfile}' failed: {err}")
+            if tmpfile and os.path.exists(tmpfile):
+                os.remove(tmpfile)
+
+    def render_prometheus(self):
+        """Return the counters in the Prometheus text exposition format."""
+
+        stats = self.get_stats()
+        lines = [
+            "# HELP threecommas_requests_total Requests sent to the 3Commas API.",
+            "# TYPE threecommas_requests_total counter",
+        ]
+        for key, endpoint in stats["endpoints"].items():
+            lines.append(
+                f'threecommas_requests_total{{{self.__labels(key)}}} {endpoint["requests"]}'
+            )
+
+        for name, field, description in (
+            ("errors", "errors", "Requests which returned an error."),
+            ("cache_hits", "cache-hits", "Requests served without calling 3Commas."),
+            ("request_bytes", "request-bytes", "Size of the sent request bodies."),
+            ("response_bytes", "response-bytes", "Size of the received response bodies."),
+        ):
+            lines.append(f"# HELP threecommas_{name}_total {description}")
+            lines.append(f"# TYPE threecommas_{name}_total counter")
+            for key, endpoint in stats["endpoints"].items():
+                lines.append(
+                    f"threecommas_{name}_total{{{self.__labels(key)}}} {endpoint[field]}"
+                )
+
+        lines.append(
+            "# HELP threecommas_request_duration_seconds Latency of the 3Commas API requests."
+        )
+        lines.append("# TYPE threecommas_request_duration_seconds histogram")
+        for key, endpoint in stats["endpoints"].items():
+            labels = self.__labels(key)
+            cumulative = 0
+            for upperbound, count in zip(
+                    list(LATENCY_BUCKETS) + ["+Inf"], endpoint["latency-buckets"]
+            ):
+                cumulative += count
+                lines.append(
+                    f'threecommas_request_duration_seconds_bucket{{{labels},le="{upperbound}"}} '
+                    f"{cumulative}"
+                )
+            lines.append(
+                f"threecommas_request_duration_seconds_sum{{{labels}}} "
+                f"{endpoint['latency-sum']:.6f}"
+            )
+            lines.append(
+                f"threecommas_request_duration_seconds_count{{{labels}}} {endpoint['requests']}"
+            )
+
+        return "\n".join(lines) + "\n"
+
+    def __labels(self, key):
+        """Return the Prometheus labels of the endpoint."""
+
+        entity, _, action = key.partition("/")
+
+        return f'program="{self.program}",entity="{entity}",action="{action or "list"}"'
+
+    def __start_server(self, host, port):
+        """Serve the Prometheus text format on /metrics."""
+
+        metrics = self
+
+        class MetricsRequestHandler(BaseHTTPRequestHandler):
+            """Handle the requests of the Prometheus scraper."""
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                """Return the metrics."""
+
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+
+                body = metrics.render_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+                """Don't log each scrape."""
+
+        server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+        threading.Thread(
+            target=server.serve_forever, name="threecommas-metrics", daemon=True
+        ).start()
+
+        self.logger.info(f"Serving 3Commas API metrics on {host}:{port} (/metrics)")
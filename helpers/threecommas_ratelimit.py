@@ -0,0 +1,145 @@
+"""Cyberjunky's 3Commas bot helpers."""
+import sqlite3
+import threading
+import time
+
+from .database import open_database
+
+# Part of the bucket which must be left for scripts with a higher priority
+PRIORITY_RESERVE = {
+    "high": 0.0,
+    "normal": 0.25,
+    "low": 0.5,
+}
+
+# Default priority of the scripts, all others have normal priority
+SCRIPT_PRIORITY = {
+    "trailingstoploss": "high",
+    "trailingstoploss_tp": "high",
+    "webhook": "high",
+    "allpairs": "low",
+    "altrank": "low",
+    "botassistexplorer": "low",
+    "coinmarketcap": "low",
+    "galaxyscore": "low",
+}
+
+
+class ThreeCommasRateLimiter:
+    """Token bucket for 3Commas API requests, shared between processes by using SQLite."""
+
+    def __init__(self, logger, cache_dir, rate, burst, priority=None):
+        self.logger = logger
+        self.program = getattr(logger, "program", "unknown")
+        self.dbpath = f"{cache_dir}/threecommas_ratelimit.sqlite3"
+
+        self.rate = float(rate)
+        self.burst = float(burst)
+
+        self.priority = priority or SCRIPT_PRIORITY.get(self.program, "normal")
+        if self.priority not in PRIORITY_RESERVE:
+            logger.warning(
+                f"Unknown 3Commas API priority '{self.priority}', using normal instead"
+            )
+            self.priority = "normal"
+        self.reserve = self.burst * PRIORITY_RESERVE[self.priority]
+
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.waits = 0
+        self.waittime = 0.0
+
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS bucket ("
+            "name TEXT Primary Key, "
+            "tokens FLOAT, "
+            "last_updated FLOAT"
+            ")"
+        )
+
+        logger.info(
+            f"3Commas API rate limiter '{self.dbpath}' opened successfully "
+            f"({self.rate}/s, burst {self.burst:.0f}, {self.priority} priority)"
+        )
+
+    @property
+    def db(self):
+        """The connection of this thread to the database."""
+
+        return open_database(self.dbpath, autocommit=True)
+
+    def reserve_token(self):
+        """Take a token when available for this priority and return 0, otherwise
+        return the number of seconds to wait before trying again."""
+
+        now = time.time()
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                dbrow = self.db.execute(
+                    "SELECT tokens, last_updated FROM bucket WHERE name = 'api'"
+                ).fetchone()
+
+                tokens = self.burst
+                if dbrow is not None:
+                    tokens = min(self.burst, dbrow[0] + (now - dbrow[1]) * self.rate)
+
+                waitseconds = 0.0
+                if tokens - 1 >= self.reserve:
+                    tokens -= 1
+                else:
+                    waitseconds = (self.reserve + 1 - tokens) / self.rate
+
+                self.db.execute(
+                    "REPLACE INTO bucket (name, tokens, last_updated) VALUES ('api', ?, ?)",
+                    (tokens, now)
+                )
+                self.db.execute("COMMIT")
+            except sqlite3.Error:
+                self.db.execute("ROLLBACK")
+                raise
+
+        return waitseconds
+
+    def acquire(self):
+        """Wait until a token is available and return the number of seconds waited."""
+
+        waited = 0.0
+        while True:
+            waitseconds = self.reserve_token()
+            if waitseconds <= 0:
+                break
+
+            time.sleep(waitseconds)
+            waited += waitseconds
+
+        return self.register(waited)
+
+    def register(self, waited):
+        """Register a request and the time waited before it could be made."""
+
+        with self.lock:
+            self.requests += 1
+            if waited > 0:
+                self.waits += 1
+                self.waittime += waited
+
+        if waited > 0:
+            self.logger.debug(
+                f"3Commas API rate limiter delayed request {waited:.2f}s "
+                f"({self.waits} of {self.requests} requests delayed, "
+                f"{self.waittime:.1f}s in total)"
+            )
+
+        return waited
+
+    def get_stats(self):
+        """Return the number of requests and the introduced wait time of this process."""
+
+        with self.lock:
+            return {
+                "priority": self.priority,
+                "requests": self.requests,
+                "delayed": self.waits,
+                "wait-time": round(self.waittime, 3),
+            }
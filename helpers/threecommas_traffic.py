@@ -0,0 +1,167 @@
+"""Cyberjunky's 3Commas bot helpers."""
+import atexit
+import gzip
+import json
+import threading
+import time
+from collections import deque
+
+from .threecommas_cache import ThreeCommasCache
+
+TRAFFIC_MODES = ("record", "replay")
+
+# Number of seconds between flushes of the recording, so at most this much is lost
+# when the script is killed
+TRAFFIC_FLUSH_INTERVAL = 5
+
+
+class ThreeCommasTraffic:
+    """Record the 3Commas API requests and responses with their timing to a compact
+    log (gzipped JSON lines), or replay such a log instead of calling 3Commas.
+
+    The log is flushed regularly, so it stays readable up to the last flush when the
+    script is killed while recording."""
+
+    def __init__(self, logger, mode, path, replaylatency=True):
+        self.logger = logger
+        self.mode = mode
+        self.path = path
+        self.replaylatency = replaylatency
+
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.misses = 0
+
+        self.file = None
+        self.flushed = time.time()
+        self.responses = {}
+        self.lastresponses = {}
+
+        if mode == "record":
+            self.file = gzip.open(path, "at", encoding="utf-8")
+            atexit.register(self.close)
+            logger.info(f"Recording 3Commas API traffic to '{path}'")
+        else:
+            self.__load()
+            logger.info(
+                f"Replaying 3Commas API traffic from '{path}' "
+                f"({sum(len(responses) for responses in self.responses.values())} responses)"
+            )
+
+    def __load(self):
+        """Load the recorded responses, in order of recording per request."""
+
+        with gzip.open(self.path, "rt", encoding="utf-8") as file:
+            try:
+                for line in file:
+                    record = json.loads(line)
+                    key = self.create_key(
+                        record["e"], record["a"], record["i"], record.get("s"), record["p"],
+                        record["h"]
+                    )
+                    self.responses.setdefault(key, deque()).append(
+                        (record["d"], record["r"], record["o"])
+                    )
+            except (EOFError, gzip.BadGzipFile, ValueError) as err:
+                # The recording was interrupted while writing the last request
+                self.logger.warning(
+                    f"3Commas traffic file '{self.path}' ends with an incomplete "
+                    f"request, which is skipped: {err}",
+                    False
+                )
+
+    @staticmethod
+    def create_key(entity, action, action_id, action_sub_id, payload, additional_headers):
+        """Create the unique key for a request."""
+
+        key = ThreeCommasCache.create_key(entity, action, action_id, payload, additional_headers)
+
+        return f"{key}/{action_sub_id or ''}"
+
+    def record(self, entity, action, action_id, action_sub_id, payload, additional_headers,
+               duration, error, data):
+        """Append the request and its response to the log."""
+
+        line = json.dumps(
+            {
+                "t": round(time.time() - self.started, 3),
+                "d": round(duration, 4),
+                "e": entity,
+                "a": action,
+                "i": action_id,
+                "s": action_sub_id,
+                "p": payload,
+                "h": additional_headers,
+                "r": error,
+                "o": data,
+            },
+            separators=(",", ":"),
+        )
+
+        with self.lock:
+            if self.file is None:
+                return
+
+            self.requests += 1
+            self.file.write(f"{line}\n")
+
+            now = time.time()
+            if now - self.flushed >= TRAFFIC_FLUSH_INTERVAL:
+                self.file.flush()
+                self.flushed = now
+
+    def replay(self, entity, action, action_id, action_sub_id, payload, additional_headers):
+        """Return the recorded error and data of the request. A request which was made
+        more often than recorded gets the last recorded response again."""
+
+        key = self.create_key(
+            entity, action, action_id, action_sub_id, payload, additional_headers
+        )
+
+        with self.lock:
+            self.requests += 1
+            responses = self.responses.get(key)
+            if responses:
+                response = responses.popleft()
+                self.lastresponses[key] = response
+            else:
+                response = self.lastresponses.get(key)
+
+            if response is None:
+                self.misses += 1
+
+        if response is None:
+            self.logger.debug(
+                f"No recorded 3Commas response for {entity}/{action} {action_id or ''}"
+            )
+            return {
+                "error": True,
+                "msg": f"No recorded response for {entity}/{action}",
+                "status_code": None,
+            }, {}
+
+        duration, error, data = response
+        if self.replaylatency and duration > 0:
+            time.sleep(duration)
+
+        return error, data
+
+    def get_stats(self):
+        """Return the number of recorded or replayed requests."""
+
+        with self.lock:
+            return {
+                "mode": self.mode,
+                "requests": self.requests,
+                "misses": self.misses,
+                "elapsed": round(time.time() - self.started, 3),
+            }
+
+    def close(self):
+        """Close the log."""
+
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
@@ -7,8 +7,10 @@ import logging
 import hashlib
 import hmac
 import threading
+import time
 from base64 import b64encode
-from typing import Callable, Dict, Literal
+from collections import OrderedDict
+from typing import Callable, Dict, List, Literal, Sequence, Union
 from Crypto.Signature import pkcs1_15
 from Crypto.Hash import SHA256
 from Crypto.PublicKey import RSA
@@ -16,6 +18,8 @@ from Crypto.PublicKey import RSA
 import rel
 import websocket
 
+from . import jsonbackend
+
 _LOGGER = logging.getLogger(__name__)
 
 SocketChannels = Literal["DealsChannel","SmartTradesChannel"]
@@ -27,6 +31,13 @@ channel_paths: Dict[SocketChannels, SocketPaths] = {
     "SmartTradesChannel": "/smart_trades"
 }
 
+# Number of seconds before the last received message, from which the updates are
+# fetched again after a reconnect (clocks are not exactly in sync)
+BACKFILL_MARGIN = 10
+
+# Number of deals/smart trades of which the last updated_at is remembered for deduplication
+SEEN_EVENTS_SIZE = 10000
+
 def construct_socket_data(
         api_key: str,
         api_secret: str,
@@ -68,15 +79,31 @@ class ThreeCommasWebsocket:
 
     is_running = True
 
-    def __init__(self, on_event=None, identifier=None, seperate_thread=False):
+    def __init__(self, on_event=None, identifier=None, seperate_thread=False,
+                 on_subscribed=None, identifiers=None, handlers=None, backfill=None):
         """
         :param on_event: function that get's called on received event
+        :param on_subscribed: function that get's called with the channel after (re)subscribing
+        :param identifiers: identifiers of all channels to subscribe to over this connection
+        :param handlers: function per channel that get's called on received event,
+            instead of on_event
+        :param backfill: function that get's called with the channel and disconnect time
+            after a reconnect, and returns the events missed in between
         """
         self.on_event = on_event
+        self.on_subscribed = on_subscribed
+        self.handlers = handlers or {}
+        self.backfill = backfill
+        self.last_message = time.time()
+        self.disconnected = {}
+        self.channel_by_identifier = {}
+        self.seen = OrderedDict()
+        self.seen_lock = threading.Lock()
         self.websocket = None
         self.websocket_thread = None
         self._url = 'wss://ws.3commas.io/websocket'
-        self.identifier = identifier
+        self.identifiers = identifiers or [identifier]
+        self.identifier = self.identifiers[0]
         self.seperate_thread = seperate_thread
 
     def __run_forever_rel_dispatcher(self):
@@ -141,6 +168,11 @@ class ThreeCommasWebsocket:
         if self.is_running:
             _LOGGER.debug("Websocket restart after close")
 
+            # Remember since when events could have been missed, the earliest when the
+            # reconnect fails a few times
+            for identifier in self.identifiers:
+                self.disconnected.setdefault(identifier['channel'], self.last_message)
+
             self.__refresh()
 
 
@@ -149,31 +181,45 @@ class ThreeCommasWebsocket:
         On message event
         """
         # _LOGGER.debug(f"Websocket data: {message}")
+        self.last_message = time.time()
         try:
-            message = json.loads(message)
+            message = jsonbackend.loads(message)
             if "type" not in message:
-                if (
-                    "identifier" in message
-                    and json.loads(message["identifier"])["channel"]
-                    in SocketChannelsTuple
-                ):
+                channel = None
+                if "identifier" in message:
+                    channel = self.__get_channel(message["identifier"])
+
+                if channel in SocketChannelsTuple:
                     event = message["message"]
-                    self.on_event(event)
+                    self.__dispatch(channel, event)
 
                 else:
                     _LOGGER.debug("Malformed data received\n%s", message)
 
             elif message["type"] == "welcome":
-                _LOGGER.debug("Subscribing to the %s", self.identifier['channel'])
-                self.websocket.send(
-                    json.dumps({
-                        "command": "subscribe",
-                            "identifier": json.dumps(self.identifier),
-                        }
+                # Subscribe to all channels over this one connection
+                for identifier in self.identifiers:
+                    _LOGGER.debug("Subscribing to the %s", identifier['channel'])
+                    self.websocket.send(
+                        json.dumps({
+                            "command": "subscribe",
+                                "identifier": json.dumps(identifier),
+                            }
+                        )
                     )
-                )
             elif message["type"] == "confirm_subscription":
-                _LOGGER.debug("Succesfully subscribed %s", self.identifier['channel'])
+                channel = self.__get_channel(message["identifier"])
+                _LOGGER.debug("Succesfully subscribed %s", channel)
+                if self.on_subscribed:
+                    self.on_subscribed(channel)
+
+                disconnected = self.disconnected.pop(channel, None)
+                if disconnected and self.backfill:
+                    threading.Thread(
+                        target=self.__run_backfill,
+                        args=(channel, disconnected - BACKFILL_MARGIN),
+                        daemon=True
+                    ).start()
 
             elif message["type"] == "ping":
                 pass
@@ -186,6 +232,52 @@ class ThreeCommasWebsocket:
             _LOGGER.exception(error)
 
 
+    def __get_channel(self, identifier):
+        """
+        Return the channel of the subscription identifier, parsed only once
+        """
+        channel = self.channel_by_identifier.get(identifier)
+        if channel is None:
+            channel = jsonbackend.loads(identifier)["channel"]
+            self.channel_by_identifier[identifier] = channel
+
+        return channel
+
+    def __dispatch(self, channel, event):
+        """
+        Pass the event to the handler of the channel, unless the same or a newer
+        update of the deal/smart trade has already been passed
+        """
+        if isinstance(event, dict) and "id" in event and event.get("updated_at"):
+            key = (channel, event["id"])
+            with self.seen_lock:
+                seen = self.seen.get(key)
+                if seen is not None and seen >= event["updated_at"]:
+                    _LOGGER.debug("Skipping duplicate %s event for %s", channel, event["id"])
+                    return
+
+                self.seen[key] = event["updated_at"]
+                self.seen.move_to_end(key)
+                if len(self.seen) > SEEN_EVENTS_SIZE:
+                    self.seen.popitem(last=False)
+
+        self.handlers.get(channel, self.on_event)(event)
+
+    def __run_backfill(self, channel, since):
+        """
+        Fetch and handle the events missed while disconnected
+        """
+        try:
+            events: List[Dict] = self.backfill(channel, since)
+            _LOGGER.debug("Backfilling %s %s events after reconnect", len(events), channel)
+
+            # Oldest first, like they would have been received
+            for event in reversed(events):
+                self.__dispatch(channel, event)
+        except Exception as error:
+            _LOGGER.exception(error)
+
+
     def __on_error(self, ws, error):
         """
         On Error listener
@@ -197,7 +289,8 @@ class ThreeCommasWebsocket:
 class ThreeCommasWebsocketHandler():
     """
     Three commas websocket master handler
-    Default channel: DealsChannel
+    Default channel: DealsChannel. Multiple channels share one connection, each
+    with its own handler.
     """
     external_event_handler = None
     _data = None
@@ -208,22 +301,34 @@ class ThreeCommasWebsocketHandler():
         api_secret: str,
         api_selfsigned: str,
         external_event_handler: Callable[[Dict], None] = None,
-        channel: SocketChannels = "DealsChannel"
+        channel: Union[SocketChannels, Sequence[SocketChannels]] = "DealsChannel",
+        on_subscribed: Callable[[SocketChannels], None] = None,
+        backfill: Callable[[SocketChannels, float], List[Dict]] = None
     ):
         if not api_key:
             raise SystemError("Api key missing")
         if (api_secret is None or api_secret == '') and (api_selfsigned is None or api_selfsigned == ''):
             raise SystemError("Api secret or private key missing")
-        if channel not in SocketChannelsTuple:
-            raise SystemError(f"Incorrect/unsupported stream channel {channel}")
-
-        self.identifier = construct_socket_data(
-            api_key=api_key,
-            api_secret=api_secret,
-            api_selfsigned=api_selfsigned,
-            channel=channel
-        )
+
+        self.channels = (channel,) if isinstance(channel, str) else tuple(channel)
+        for _channel in self.channels:
+            if _channel not in SocketChannelsTuple:
+                raise SystemError(f"Incorrect/unsupported stream channel {_channel}")
+
+        self.identifiers = [
+            construct_socket_data(
+                api_key=api_key,
+                api_secret=api_secret,
+                api_selfsigned=api_selfsigned,
+                channel=_channel
+            )
+            for _channel in self.channels
+        ]
+        self.identifier = self.identifiers[0]
         self.external_event_handler = external_event_handler
+        self.on_subscribed = on_subscribed
+        self.backfill = backfill
+        self.handlers = {}
 
 
     def on_event(self, data):
@@ -234,6 +339,17 @@ class ThreeCommasWebsocketHandler():
         self._data = data
 
 
+    def register_handler(self, channel: SocketChannels, handler: Callable[[Dict], None]):
+        """
+        Handle the events of the channel with the handler, instead of the
+        external event handler
+        """
+        if channel not in self.channels:
+            raise SystemError(f"Not subscribed to stream channel {channel}")
+
+        self.handlers[channel] = handler
+
+
     def start_listener(self, seperate_thread = False):
         """
         Spawn a new Listener and links it to self.on_trade.
@@ -244,8 +360,21 @@ class ThreeCommasWebsocketHandler():
 
         self.listener = ThreeCommasWebsocket(
             event_handler,
-            identifier=self.identifier,
-            seperate_thread=seperate_thread
+            seperate_thread=seperate_thread,
+            on_subscribed=self.on_subscribed,
+            identifiers=self.identifiers,
+            handlers=self.handlers,
+            backfill=self.backfill
         )
         _LOGGER.debug("Starting listener")
         self.listener.start()
+
+
+    def get_last_message_time(self):
+        """
+        Time the last message (data or ping) was received
+        """
+        if self.listener is None:
+            return time.time()
+
+        return self.listener.last_message
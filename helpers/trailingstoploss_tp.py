@@ -16,19 +16,21 @@ def determine_profit_prefix(deal_data):
 def get_profit_db_data(cursor, dealid):
     """Check if deal was already logged and get stored data."""
 
-    return cursor.execute(f"SELECT * FROM deal_profit WHERE dealid = {dealid}").fetchone()
+    return cursor.execute("SELECT * FROM deal_profit WHERE dealid = ?", (dealid,)).fetchone()
 
 
 def get_safety_db_data(cursor, dealid):
     """Check if deal was already logged and get stored data."""
 
-    return cursor.execute(f"SELECT * FROM deal_safety WHERE dealid = {dealid}").fetchone()
+    return cursor.execute("SELECT * FROM deal_safety WHERE dealid = ?", (dealid,)).fetchone()
 
 
 def get_pending_order_db_data(cursor, dealid):
     """Check if order for deal was logged and get stored data."""
 
-    return cursor.execute(f"SELECT * FROM pending_orders WHERE dealid = {dealid}").fetchone()
+    return cursor.execute(
+        "SELECT * FROM pending_orders WHERE dealid = ?", (dealid,)
+    ).fetchone()
 
 
 def check_float(potential_float):
@@ -44,7 +46,7 @@ def check_float(potential_float):
 def is_new_deal(cursor, dealid):
     """Return True if the deal is not know yet, otherwise False"""
 
-    if cursor.execute(f"SELECT * FROM deal_profit WHERE dealid = {dealid}").fetchone():
+    if cursor.execute("SELECT * FROM deal_profit WHERE dealid = ?", (dealid,)).fetchone():
         return False
 
     return True
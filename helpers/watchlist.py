@@ -1,47 +1,41 @@
 """Cyberjunky's 3Commas bot helpers."""
+import asyncio
 
 from helpers.misc import format_pair
-from helpers.threecommas import(
-    close_threecommas_deal,
-    trigger_threecommas_bot_deal
+from helpers.threecommas_async import(
+    close_threecommas_deal_async,
+    get_threecommas_bots_async,
+    trigger_threecommas_bot_deal_async
 )
 
 
-def process_botlist(logger, api, blacklistfile, blacklist, marketcodes, botidlist, coin, trade):
-    """Process the list of bots and handle the coin and trade for each bot"""
+async def process_botlist(logger, api, blacklistfile, blacklist, marketcodes, botidlist, coin, trade):
+    """Process the list of bots and handle the coin and trade for each bot in parallel"""
 
-    for botid in botidlist:
-        if botid:
-            error, data = api.request(
-                entity="bots",
-                action="show",
-                action_id=str(botid),
+    botsdata = await get_threecommas_bots_async(
+        logger, api, [botid for botid in botidlist if botid]
+    )
+
+    tasks = []
+    for data in botsdata.values():
+        # Check number of deals, otherwise error will occur anyway (save some processing)
+        if data["active_deals_count"] >= data["max_active_deals"]:
+            logger.info(
+                f"Bot '{data['name']}' reached maximum number of "
+                f"deals ({data['max_active_deals']}). "
+                f"Cannot start a new deal for {coin}!",
+                True
             )
+        else:
+            tasks.append(
+                process_bot_deal(logger, api, blacklistfile, blacklist,
+                    marketcodes, data, coin, trade)
+            )
+
+    await asyncio.gather(*tasks)
+
 
-            if data:
-                # Check number of deals, otherwise error will occur anyway (save some processing)
-                if data["active_deals_count"] >= data["max_active_deals"]:
-                    logger.info(
-                        f"Bot '{data['name']}' reached maximum number of "
-                        f"deals ({data['max_active_deals']}). "
-                        f"Cannot start a new deal for {coin}!",
-                        True
-                    )
-                else:
-                    process_bot_deal(logger, api, blacklistfile, blacklist,
-                        marketcodes, data, coin, trade)
-            else:
-                if error and "msg" in error:
-                    logger.error(
-                        "Error occurred fetching bot (%s) data: %s" % (str(botid), error["msg"])
-                    )
-                else:
-                    logger.error(
-                        "Error occurred fetching bot (%s) data" % str(botid)
-                    )
-
-
-def process_bot_deal(logger, api, blacklistfile, blacklist, marketcodes, thebot, coin, trade):
+async def process_bot_deal(logger, api, blacklistfile, blacklist, marketcodes, thebot, coin, trade):
     """Check pair and trigger open or close the deal."""
 
     # Gather some bot values
@@ -95,14 +89,16 @@ def process_bot_deal(logger, api, blacklistfile, blacklist, marketcodes, thebot,
 
         # We have valid pair for our bot so we trigger an open asap action
         logger.info("Triggering your 3Commas bot for a start deal of '%s'" % pair)
-        trigger_threecommas_bot_deal(logger, api, thebot, pair, (len(blacklistfile) > 0))
+        await trigger_threecommas_bot_deal_async(
+            logger, api, thebot, pair, (len(blacklistfile) > 0)
+        )
     else:
         # Find active deal(s) for this bot so we can close deal(s) for pair
         if deals:
             for deal in deals:
                 if deal["pair"] == pair:
                     logger.info("Triggering your 3Commas bot for a (panic) sell of '%s'" % pair)
-                    if close_threecommas_deal(logger, api, deal["id"], pair):
+                    if await close_threecommas_deal_async(logger, api, deal["id"], pair):
                         logger.info(
                             f"Closed deal (panic_sell) for deal '{deal['id']}' and pair '{pair}'",
                             True
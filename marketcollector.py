@@ -8,8 +8,12 @@ import sys
 import time
 from pathlib import Path
 from helpers.database import (
-    get_next_process_time,
-    set_next_process_time
+    check_identifier,
+    explain_query,
+    fetch_all,
+    fetch_one,
+    open_database,
+    ProcessScheduler
 )
 from helpers.datasources import (
     get_botassist_data,
@@ -21,6 +25,15 @@ from helpers.logging import (
     Logger,
     NotificationHandler
 )
+from helpers.marketdata import (
+    HISTORY_DAY,
+    HISTORY_HOUR,
+    HISTORY_RAW,
+    MarketDataBatch,
+    MarketDataHistory,
+    create_marketdata_indexes,
+    create_marketdata_tables
+)
 from helpers.misc import (
     unix_timestamp_to_string,
     wait_time_interval,
@@ -40,7 +53,13 @@ def load_config():
         "cleanup-treshold": 86400,
         "debug": False,
         "debug-log-query": False,
+        "debug-query-plan": False,
         "debug-coin-data": False,
+        "history-enabled": False,
+        "history-metrics": "coinmarketcap,altrank,galaxyscore,change_1h,change_24h,volatility_24h",
+        "history-retention-raw-hours": 48,
+        "history-retention-1h-days": 30,
+        "history-retention-1d-days": 365,
         "logrotate": 7,
         "cmc-apikey": "Your CoinMarketCap API Key",
         "cg-apikey": "Your CoinGecko API key (only required for paid plans), or empty",
@@ -116,6 +135,14 @@ def upgrade_config(cfg):
 
         logger.info("Upgraded section settings to have debug-log-query option")
 
+    if not cfg.has_option("settings", "debug-query-plan"):
+        cfg.set("settings", "debug-query-plan", "False")
+
+        with open(f"{datadir}/{program}.ini", "w+") as cfgfile:
+            cfg.write(cfgfile)
+
+        logger.info("Upgraded section settings to have debug-query-plan option")
+
     if not cfg.has_option("settings", "debug-coin-data"):
         cfg.set("settings", "debug-coin-data", "False")
 
@@ -124,6 +151,21 @@ def upgrade_config(cfg):
 
         logger.info("Upgraded section settings to have debug-coin-data option")
 
+    if not cfg.has_option("settings", "history-enabled"):
+        cfg.set("settings", "history-enabled", "False")
+        cfg.set(
+            "settings", "history-metrics",
+            "coinmarketcap,altrank,galaxyscore,change_1h,change_24h,volatility_24h"
+        )
+        cfg.set("settings", "history-retention-raw-hours", "48")
+        cfg.set("settings", "history-retention-1h-days", "30")
+        cfg.set("settings", "history-retention-1d-days", "365")
+
+        with open(f"{datadir}/{program}.ini", "w+") as cfgfile:
+            cfg.write(cfgfile)
+
+        logger.info("Upgraded section settings to have history options")
+
     for cfgsection in cfg.sections():
         if cfgsection == "settings":
             continue
@@ -153,73 +195,58 @@ def open_shared_db():
 
     try:
         shareddbname = "marketdata.sqlite3"
-        shareddbpath = f"file:{sharedir}/{shareddbname}?mode=rw"
-        shareddbconnection = sqlite3.connect(shareddbpath, uri=True)
-        shareddbconnection.row_factory = sqlite3.Row
+        shareddbconnection = open_database(f"{sharedir}/{shareddbname}", "rw")
 
         logger.info(f"Shared database '{sharedir}/{shareddbname}' opened successfully")
 
     except sqlite3.OperationalError:
-        shareddbconnection = sqlite3.connect(f"{sharedir}/{shareddbname}")
-        shareddbconnection.row_factory = sqlite3.Row
-        shareddbcursor = shareddbconnection.cursor()
+        shareddbconnection = open_database(f"{sharedir}/{shareddbname}")
         logger.info(f"Shared database '{sharedir}/{shareddbname}' created successfully")
 
-        shareddbcursor.execute(
-            "CREATE TABLE IF NOT EXISTS pairs ("
-            "base STRING, "
-            "coin STRING, "
-            "last_updated INT, "
-            "PRIMARY KEY(base, coin)"
-            ")"
-        )
-
-        shareddbcursor.execute(
-            "CREATE TABLE IF NOT EXISTS rankings ("
-            "base STRING, "
-            "coin STRING, "
-            "coinmarketcap INT DEFAULT 0, "
-            "altrank INT DEFAULT 0, "
-            "galaxyscore FLOAT DEFAULT 0.0, "
-            "PRIMARY KEY(base, coin)"
-            ")"
-        )
-
-        shareddbcursor.execute(
-            "CREATE TABLE IF NOT EXISTS prices ("
-            "base STRING, "
-            "coin STRING, "
-            "change_1h FLOAT DEFAULT 0.0, "
-            "change_24h FLOAT DEFAULT 0.0, "
-            "change_7d FLOAT DEFAULT 0.0, "
-            "change_14d FLOAT DEFAULT 0.0, "
-            "change_30d FLOAT DEFAULT 0.0, "
-            "change_200d FLOAT DEFAULT 0.0, "
-            "change_1y FLOAT DEFAULT 0.0, "
-            "volatility_24h FLOAT DEFAULT 0.0, "
-            "PRIMARY KEY(base, coin)"
-            ")"
-        )
+        create_marketdata_tables(shareddbconnection)
 
         logger.info("Shared database tables created successfully")
 
+    create_marketdata_indexes(logger, shareddbconnection)
+
     return shareddbconnection
 
 
+def open_history():
+    """Open the market data history in the shared database, when enabled"""
+
+    if not config.getboolean("settings", "history-enabled", fallback=False):
+        return None
+
+    metrics = [
+        metric.strip()
+        for metric in config.get("settings", "history-metrics", fallback="").split(",")
+        if metric.strip()
+    ]
+    retention = {
+        HISTORY_RAW: int(config.get("settings", "history-retention-raw-hours")) * 3600,
+        HISTORY_HOUR: int(config.get("settings", "history-retention-1h-days")) * 86400,
+        HISTORY_DAY: int(config.get("settings", "history-retention-1d-days")) * 86400,
+    }
+
+    markethistory = MarketDataHistory(logger, shareddb, metrics, retention)
+
+    logger.info(f"Recording market data history of {', '.join(markethistory.metrics)}")
+
+    return markethistory
+
+
 def open_mc_db():
     """Create or open database to store data."""
 
     try:
         dbname = f"{program}.sqlite3"
-        dbpath = f"file:{datadir}/{dbname}?mode=rw"
-        dbconnection = sqlite3.connect(dbpath, uri=True)
-        dbconnection.row_factory = sqlite3.Row
+        dbconnection = open_database(f"{datadir}/{dbname}", "rw")
 
         logger.info(f"Database '{datadir}/{dbname}' opened successfully")
 
     except sqlite3.OperationalError:
-        dbconnection = sqlite3.connect(f"{datadir}/{dbname}")
-        dbconnection.row_factory = sqlite3.Row
+        dbconnection = open_database(f"{datadir}/{dbname}")
         dbcursor = dbconnection.cursor()
         logger.info(f"Database '{datadir}/{dbname}' created successfully")
 
@@ -254,53 +281,12 @@ def has_pair(base, coin):
     ubase = base.upper()
     ucoin = coin.upper()
 
-    query = "SELECT * FROM pairs WHERE "
-
-    if ubase != "*":
-        query += f"base = '{ubase}' AND "
-
-    query += f"coin = '{ucoin}'"
-
-    return sharedcursor.execute(query).fetchone()
-
-
-def add_pair(base, coin):
-    """Add a new base_coin to the tables in the database"""
-
-    ubase = base.upper()
-    ucoin = coin.upper()
-
-    if config.getboolean("settings", "debug-coin-data"):
-        logger.debug(
-            f"Add pair {ubase}_{ucoin} to database."
-        )
+    if ubase == "*":
+        return fetch_one(shareddb, "SELECT * FROM pairs WHERE coin = ?", (ucoin,))
 
-    shareddb.execute(
-        f"INSERT INTO pairs ("
-        f"base, "
-        f"coin, "
-        f"last_updated "
-        f") VALUES ("
-        f"'{ubase}', '{ucoin}', {int(time.time())}"
-        f")"
-    )
-    shareddb.execute(
-        f"INSERT INTO rankings ("
-        f"base, "
-        f"coin "
-        f") VALUES ("
-        f"'{ubase}', '{ucoin}'"
-        f")"
-    )
-    shareddb.execute(
-        f"INSERT INTO prices ("
-        f"base, "
-        f"coin "
-        f") VALUES ("
-        f"'{ubase}', '{ucoin}'"
-        f")"
+    return fetch_one(
+        shareddb, "SELECT * FROM pairs WHERE base = ? AND coin = ?", (ubase, ucoin)
     )
-    # shareddb.commit() left out on purpose
 
 
 def remove_pair(base, coin):
@@ -314,31 +300,10 @@ def remove_pair(base, coin):
             f"Remove pair {ubase}_{ucoin} from database."
         )
 
-    shareddb.execute(
-        f"DELETE FROM pairs "
-        f"WHERE base = '{ubase}' AND coin = '{ucoin}'"
-    )
-    shareddb.execute(
-        f"DELETE FROM rankings "
-        f"WHERE base = '{ubase}' AND coin = '{ucoin}'"
-    )
-    shareddb.execute(
-        f"DELETE FROM prices "
-        f"WHERE base = '{ubase}' AND coin = '{ucoin}'"
-    )
-    # shareddb.commit() left out on purpose
-
-
-def update_pair_last_updated(base, coin):
-    """Update the pair's last updated value in database."""
-
-    ubase = base.upper()
-    ucoin = coin.upper()
-
-    shareddb.execute(
-        f"UPDATE pairs SET last_updated = {int(time.time())} "
-        f"WHERE base = '{ubase}' AND coin = '{ucoin}'"
-    )
+    for table in ("pairs", "rankings", "prices"):
+        shareddb.execute(
+            f"DELETE FROM {table} WHERE base = ? AND coin = ?", (ubase, ucoin)
+        )
     # shareddb.commit() left out on purpose
 
 
@@ -348,32 +313,49 @@ def update_values(table, base, coin, data):
     ubase = base.upper()
     ucoin = coin.upper()
 
-    query = f"UPDATE {table} SET "
-
-    keyvalues = ""
-    for key, value in data.items():
-        if keyvalues:
-            keyvalues += ", "
-
-        keyvalues += f"{key} = {value}"
-
-    query += keyvalues
-    query += " WHERE "
+    query = f"UPDATE {check_identifier(table)} SET "
+    query += ", ".join(f"{check_identifier(key)} = ?" for key in data)
+    parameters = list(data.values())
 
     if ubase != "*":
-        query += f"base = '{ubase}' AND "
-
-    query += f"coin = '{ucoin}'"
+        query += " WHERE base = ? AND coin = ?"
+        parameters += [ubase, ucoin]
+    else:
+        query += " WHERE coin = ?"
+        parameters.append(ucoin)
 
     if config.getboolean("settings", "debug-log-query"):
         logger.debug(
-            f"Execute query '{query}' for pair {ubase}_{ucoin}."
+            f"Execute query '{query}' with {parameters} for pair {ubase}_{ucoin}."
         )
 
-    shareddb.execute(query)
+    shareddb.execute(query, parameters)
     # shareddb.commit() left out on purpose
 
 
+def store_batch(batch, addmissing, updatetime=True):
+    """Store the collected market data in one transaction, and return the skipped coins"""
+
+    starttime = time.time()
+
+    stored, skippedcoins = batch.store(shareddb, addmissing, updatetime)
+    if history is not None:
+        history.record(batch)
+    shareddb.commit()
+
+    if config.getboolean("settings", "debug-coin-data"):
+        for coin in skippedcoins:
+            logger.debug(
+                f"Coin {coin} not in database, cannot update data for this coin."
+            )
+
+    logger.debug(
+        f"Stored market data of {stored} pairs in {time.time() - starttime:.3f}s."
+    )
+
+    return skippedcoins
+
+
 def process_cmc_section(section_id):
     """Process the cmc section from the configuration"""
 
@@ -416,6 +398,13 @@ def process_cmc_section(section_id):
 
     isindexprovider = config.get("settings", "index-provider").lower() == "coinmarketcap"
 
+    # Rankings are only updated by the index provider
+    batch = MarketDataBatch(
+        base,
+        ("coinmarketcap",) if isindexprovider else (),
+        ("change_1h", "change_24h", "change_7d")
+    )
+
     for entry in data[2]:
         try:
             coin = str(entry["symbol"])
@@ -424,50 +413,26 @@ def process_cmc_section(section_id):
             if base == coin:
                 continue
 
-            coinpercent1h = float(entry["quote"][base]["percent_change_1h"])
-            coinpercent24h = float(entry["quote"][base]["percent_change_24h"])
-            coinpercent7d = float(entry["quote"][base]["percent_change_7d"])
-
-            if not has_pair(base, coin):
-                if isindexprovider:
-                    # Pair does not yet exist and CoinMarketCap is the index provider
-                    add_pair(base, coin)
-                else:
-                    # Coin does not exist, skip this one
-                    if config.getboolean("settings", "debug-coin-data"):
-                        logger.debug(
-                            f"Coin {coin} not in database, cannot update data for this coin."
-                        )
-
-                    continue
-
-            if isindexprovider:
-                # Update rankings data
-                rankdata = {}
-                rankdata["coinmarketcap"] = entry["cmc_rank"]
-                update_values("rankings", base, coin, rankdata)
-
-            # Update pricings data
-            pricesdata = {}
-            pricesdata["change_1h"] = coinpercent1h
-            pricesdata["change_24h"] = coinpercent24h
-            pricesdata["change_7d"] = coinpercent7d
-            update_values("prices", base, coin, pricesdata)
-
-            # Make sure to update the last_updated field to avoid deletion
-            update_pair_last_updated(base, coin)
+            batch.add(
+                coin,
+                (entry["cmc_rank"],) if isindexprovider else (),
+                (
+                    float(entry["quote"][base]["percent_change_1h"]),
+                    float(entry["quote"][base]["percent_change_24h"]),
+                    float(entry["quote"][base]["percent_change_7d"]),
+                )
+            )
         except KeyError as err:
             logger.error(
                 f"Something went wrong while parsing CoinMarketCap data. KeyError for field: {err}"
             )
-            # Rollback any pending changes
-            shareddb.rollback()
 
             # Parser error, retry in one hour
             return False, (60 * 60 * 1)
 
-    # Commit everyting to the database
-    shareddb.commit()
+    # New pairs are only added by the index provider, and the last_updated field
+    # is updated to avoid deletion
+    store_batch(batch, isindexprovider)
 
     logger.info(
         f"CoinMarketCap; updated {len(data[2])} coins ({startnumber}-{endnumber}) "
@@ -549,6 +514,15 @@ def process_cg_section(section_id):
 
     isindexprovider = config.get("settings", "index-provider").lower() == "coingecko"
 
+    periods = ("1h", "24h", "7d", "14d", "30d", "200d", "1y")
+
+    # Rankings are only updated by the index provider
+    batch = MarketDataBatch(
+        base,
+        ("coinmarketcap",) if isindexprovider else (),
+        [f"change_{period}" for period in periods]
+    )
+
     for entry in data[1]:
         try:
             coin = str(entry["symbol"])
@@ -557,77 +531,26 @@ def process_cg_section(section_id):
             if base == coin:
                 continue
 
-            coinpercent1h = 0.0
-            if entry.get("price_change_percentage_1h_in_currency") is not None:
-                coinpercent1h = float(entry["price_change_percentage_1h_in_currency"])
-
-            coinpercent24h = 0.0
-            if entry.get("price_change_percentage_24h_in_currency") is not None:
-                coinpercent24h = float(entry["price_change_percentage_24h_in_currency"])
-
-            coinpercent7d = 0.0
-            if entry.get("price_change_percentage_7d_in_currency") is not None:
-                coinpercent7d = float(entry["price_change_percentage_7d_in_currency"])
-
-            coinpercent14d = 0.0
-            if entry.get("price_change_percentage_14d_in_currency") is not None:
-                coinpercent14d = float(entry["price_change_percentage_14d_in_currency"])
-
-            coinpercent30d = 0.0
-            if entry.get("price_change_percentage_30d_in_currency") is not None:
-                coinpercent30d = float(entry["price_change_percentage_30d_in_currency"])
-
-            coinpercent200d = 0.0
-            if entry.get("price_change_percentage_200d_in_currency") is not None:
-                coinpercent200d = float(entry["price_change_percentage_200d_in_currency"])
-
-            coinpercent1y = 0.0
-            if entry.get("price_change_percentage_1y_in_currency") is not None:
-                coinpercent1y = float(entry["price_change_percentage_1y_in_currency"])
-
-            if not has_pair(base, coin):
-                if isindexprovider:
-                    # Pair does not yet exist and CoinGecko is the index provider
-                    add_pair(base, coin)
-                else:
-                    # Coin does not exist, skip this one
-                    if config.getboolean("settings", "debug-coin-data"):
-                        logger.debug(
-                            f"Coin {coin} not in database, cannot update data for this coin."
-                        )
-
-                    continue
-
-            if isindexprovider:
-                # Update rankings data
-                rankdata = {}
-                rankdata["coinmarketcap"] = entry["market_cap_rank"]
-                update_values("rankings", base, coin, rankdata)
-
-            # Update pricings data
-            pricesdata = {}
-            pricesdata["change_1h"] = coinpercent1h
-            pricesdata["change_24h"] = coinpercent24h
-            pricesdata["change_7d"] = coinpercent7d
-            pricesdata["change_14d"] = coinpercent14d
-            pricesdata["change_30d"] = coinpercent30d
-            pricesdata["change_200d"] = coinpercent200d
-            pricesdata["change_1y"] = coinpercent1y
-            update_values("prices", base, coin, pricesdata)
-
-            # Make sure to update the last_updated field to avoid deletion
-            update_pair_last_updated(base, coin)
+            pricechanges = []
+            for period in periods:
+                value = entry.get(f"price_change_percentage_{period}_in_currency")
+                pricechanges.append(float(value) if value is not None else 0.0)
+
+            batch.add(
+                coin,
+                (entry["market_cap_rank"],) if isindexprovider else (),
+                pricechanges
+            )
         except KeyError as err:
             logger.error(
                 f"Something went wrong while parsing CoinGecko data. KeyError for field: {err}"
             )
-            # Rollback any pending changes
-            shareddb.rollback()
 
             return False, (60 * 60 * 1)
 
-    # Commit everyting to the database
-    shareddb.commit()
+    # New pairs are only added by the index provider, and the last_updated field
+    # is updated to avoid deletion
+    store_batch(batch, isindexprovider)
 
     logger.info(
         f"CoinGecko; updated {numberofcoins} coins ({startnumber}-{endnumber}) "
@@ -644,7 +567,7 @@ def process_lunarcrush_section(section_id, listtype):
 
     # Reset existing data
     shareddb.execute(
-        f"UPDATE rankings SET {listtype.lower()} = {0.0}"
+        f"UPDATE rankings SET {check_identifier(listtype.lower())} = ?", (0.0,)
     )
 
     # Download LunarCrush data
@@ -658,30 +581,13 @@ def process_lunarcrush_section(section_id, listtype):
         # Retry in 15 minutes
         return False, (60 * 15)
 
-    # Parse LunaCrush data
-    updatedcoins = 0
+    # Parse LunaCrush data, both Altrank and GalaxyScore are available in the data. The
+    # coins are updated for all bases they exist with.
+    batch = MarketDataBatch("*", ("altrank", "galaxyscore"))
     for entry in lunarcrushdata:
-        coin = entry["s"]
+        batch.add(entry["s"], (float(entry["acr"]), float(entry["gs"])))
 
-        if not has_pair("*", coin):
-            # Coin does not exist, skip this one
-            if config.getboolean("settings", "debug-coin-data"):
-                logger.debug(
-                    f"Coin {coin} not in database, cannot update {listtype} data for this coin."
-                )
-
-            continue
-
-        # Update rankings data (both Altrank and GalaxyScore are available in the data)
-        rankdata = {}
-        rankdata["altrank"] = float(entry["acr"])
-        rankdata["galaxyscore"] = float(entry["gs"])
-        update_values("rankings", "*", coin, rankdata)
-
-        updatedcoins += 1
-
-    # Commit everyting to the database
-    shareddb.commit()
+    updatedcoins = len(batch) - len(store_batch(batch, False, False))
 
     logger.info(
         f"{listtype}; updated {updatedcoins} coins.",
@@ -718,20 +624,12 @@ def process_volatility_section(section_id):
 
     aggregatedlist = aggregate_volatility_list(combinedlist)
 
+    batch = MarketDataBatch("USD", (), ("volatility_24h",))
     for coin, data in aggregatedlist.items():
-        volatility = data["volatility"]
-
-        if not has_pair("USD", coin):
-            # Pair does not yet exist
-            add_pair("USD", coin)
+        batch.add(coin, (), (data["volatility"],))
 
-        # Update pricings data
-        pricesdata = {}
-        pricesdata["volatility_24h"] = volatility
-        update_values("prices", "USD", coin, pricesdata)
-
-    # Commit all changes to the database
-    shareddb.commit()
+    # Pairs which do not yet exist are added
+    store_batch(batch, True, False)
 
     # Cleanup old data
     if section_id in sectionstorage:
@@ -828,6 +726,15 @@ def cleanup_volatility_data(current_data, previous_data):
     )
 
 
+def log_query_plan(query, parameters):
+    """Log the query plan of the query, when enabled"""
+
+    if config.getboolean("settings", "debug-query-plan"):
+        logger.debug(
+            f"Query plan of '{query}': {explain_query(shareddb, query, parameters)}"
+        )
+
+
 def cleanup_database():
     """Cleanup the database and remove old / not updated data"""
 
@@ -838,9 +745,10 @@ def cleanup_database():
         f"{unix_timestamp_to_string(cleanuptime, '%Y-%m-%d %H:%M:%S')}."
     )
 
-    pairdata = sharedcursor.execute(
-            f"SELECT base, coin FROM pairs WHERE last_updated < {cleanuptime}"
-        ).fetchall()
+    query = "SELECT base, coin FROM pairs WHERE last_updated < ?"
+    log_query_plan(query, (cleanuptime,))
+
+    pairdata = fetch_all(shareddb, query, (cleanuptime,))
 
     if pairdata:
         logger.info(f"Found {len(pairdata)} pairs to cleanup...")
@@ -863,17 +771,11 @@ def reset_database_data():
         "Initialize volatility data..."
     )
 
-    shareddb.execute(
-        f"UPDATE rankings SET altrank = {0.0}"
-    )
+    shareddb.execute("UPDATE rankings SET altrank = ?", (0.0,))
 
-    shareddb.execute(
-        f"UPDATE rankings SET galaxyscore = {0.0}"
-    )
+    shareddb.execute("UPDATE rankings SET galaxyscore = ?", (0.0,))
 
-    shareddb.execute(
-        f"UPDATE prices SET volatility_24h = {0.0}"
-    )
+    shareddb.execute("UPDATE prices SET volatility_24h = ?", (0.0,))
 
     shareddb.commit()
 
@@ -945,7 +847,6 @@ else:
 
 # Initialize or open the database
 db = open_mc_db()
-cursor = db.cursor()
 
 # Initialize or open the shared database
 shareddb = open_shared_db()
@@ -954,6 +855,12 @@ sharedcursor = shareddb.cursor()
 # Upgrade the database if needed
 upgrade_mc_db(sharedcursor)
 
+# Open the market data history, when enabled
+history = open_history()
+
+# Next processing time of each section
+scheduler = ProcessScheduler(db, "sections", "sectionid")
+
 # Storage of data for each section (if applicable)
 sectionstorage = {}
 
@@ -975,7 +882,10 @@ while True:
 
     # House keeping
     cleanup_database()
+    if history is not None:
+        history.downsample()
 
+    scheduler.keep(config.sections())
     for section in config.sections():
         iscmcsection = section.startswith("cmc_")
         iscgsection = section.startswith("cg_")
@@ -987,7 +897,7 @@ while True:
             isgalaxyscoresection or isvolatilitysection
         ):
             sectiontimeinterval = int(config.get(section, "timeinterval"))
-            nextprocesstime = get_next_process_time(db, "sections", "sectionid", section)
+            nextprocesstime = scheduler.get(section)
 
             # Only process the section if it's forced, or it's time for the next interval
             if currenttime >= nextprocesstime:
@@ -1015,7 +925,7 @@ while True:
                         f"{unix_timestamp_to_string(newtime, '%Y-%m-%d %H:%M:%S')}."
                     )
 
-                set_next_process_time(db, "sections", "sectionid", section, newtime)
+                scheduler.set(section, newtime)
             else:
                 logger.debug(
                     f"Section {section} will be processed after "
@@ -1027,5 +937,10 @@ while True:
                 False
             )
 
+    scheduler.persist()
+
+    # Wait until the next section is due, and reload the configuration at least
+    # each timeinterval
+    timeint = scheduler.get_wait_time(timeint)
     if not wait_time_interval(logger, notification, timeint, False):
         break
@@ -0,0 +1,38 @@
+"""Shared fixtures of the tests."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+class DummyLogger:
+    """Logger with the interface of helpers.logging.Logger, which keeps the messages."""
+
+    def __init__(self, program="test", datadir=None):
+        self.program = program
+        self.datadir = datadir
+        self.messages = []
+
+    def __log(self, level, message, *args):
+        self.messages.append((level, message))
+
+    def debug(self, message, *args):
+        self.__log("debug", message)
+
+    def info(self, message, *args):
+        self.__log("info", message)
+
+    def warning(self, message, *args):
+        self.__log("warning", message)
+
+    def error(self, message, *args):
+        self.__log("error", message)
+
+
+@pytest.fixture
+def logger(tmp_path):
+    """Logger of the test program."""
+
+    return DummyLogger(datadir=str(tmp_path))
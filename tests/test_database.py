@@ -0,0 +1,176 @@
+"""Tests of the shared database helpers."""
+import threading
+import time
+
+import pytest
+
+from helpers.database import (
+    ProcessScheduler,
+    check_identifier,
+    commit,
+    flush,
+    open_database,
+    open_memory_database,
+    write_batch,
+)
+
+
+@pytest.fixture
+def database(tmp_path):
+    """Database with a table of values, in a directory which needs URI escaping."""
+
+    directory = tmp_path / "data #1?mode=ro %20"
+    directory.mkdir()
+
+    dbconnection = open_database(str(directory / "test.sqlite3"))
+    dbconnection.execute("CREATE TABLE IF NOT EXISTS values_ (value INTEGER)")
+    dbconnection.commit()
+
+    yield dbconnection
+
+    dbconnection.close()
+
+
+def test_open_database_escapes_path(database, tmp_path):
+    assert (tmp_path / "data #1?mode=ro %20" / "test.sqlite3").is_file()
+
+    database.execute("INSERT INTO values_ VALUES (1)")
+    database.commit()
+
+
+def test_open_database_pools_per_thread(tmp_path):
+    path = str(tmp_path / "pool.sqlite3")
+    dbconnection = open_database(path)
+
+    assert open_database(path) is dbconnection
+
+    others = []
+    thread = threading.Thread(target=lambda: others.append(open_database(path)))
+    thread.start()
+    thread.join()
+    assert others[0] is not dbconnection
+
+    # A closed connection is replaced
+    dbconnection.close()
+    assert open_database(path) is not dbconnection
+
+
+def test_open_database_readwrite_requires_existing(tmp_path):
+    with pytest.raises(Exception):
+        open_database(str(tmp_path / "missing.sqlite3"), mode="rw")
+
+
+def test_write_batch_commits_at_end(database):
+    with write_batch(database):
+        with write_batch(database):
+            database.execute("INSERT INTO values_ VALUES (1)")
+            commit(database)
+            assert database.in_transaction
+
+        commit(database)
+        assert database.in_transaction
+
+    assert not database.in_transaction
+
+    database.execute("INSERT INTO values_ VALUES (2)")
+    commit(database)
+    assert not database.in_transaction
+
+
+def test_write_batch_commits_on_error(database):
+    with pytest.raises(RuntimeError):
+        with write_batch(database):
+            database.execute("INSERT INTO values_ VALUES (1)")
+            raise RuntimeError("failed")
+
+    assert not database.in_transaction
+    assert database.execute("SELECT COUNT(*) FROM values_").fetchone()[0] == 1
+
+
+def test_flush_within_write_batch(database):
+    with write_batch(database):
+        database.execute("INSERT INTO values_ VALUES (1)")
+        flush(database)
+        assert not database.in_transaction
+
+
+def test_check_identifier():
+    assert check_identifier("next_processing_timestamp") == "next_processing_timestamp"
+
+    with pytest.raises(ValueError):
+        check_identifier("bots; DROP TABLE bots")
+
+
+@pytest.fixture
+def scheduled():
+    """Database with the processing times of two bots."""
+
+    dbconnection = open_memory_database()
+    dbconnection.execute(
+        "CREATE TABLE bots (botid INT Primary Key, next_processing_timestamp INT)"
+    )
+    dbconnection.executemany(
+        "INSERT INTO bots VALUES (?, ?)", [(1, 1000), (2, int(time.time()) + 600)]
+    )
+    dbconnection.commit()
+
+    return dbconnection
+
+
+def test_scheduler_loads_and_schedules(scheduled):
+    scheduler = ProcessScheduler(scheduled, "bots", "botid")
+
+    assert scheduler.next_due() is None
+    assert scheduler.get(1) == 1000
+    assert scheduler.next_due() == 1000
+
+    # New items are due directly
+    assert scheduler.get(3) <= time.time()
+    assert scheduler.next_due() == 1000
+
+
+def test_scheduler_reschedule_and_keep(scheduled):
+    scheduler = ProcessScheduler(scheduled, "bots", "botid")
+    for botid in (1, 2):
+        scheduler.get(botid)
+
+    now = int(time.time())
+    scheduler.set(1, now + 1200)
+    assert scheduler.next_due() == scheduler.get(2)
+
+    # Bot 2 is removed from the configuration
+    scheduler.keep(["1"])
+    assert scheduler.next_due() == now + 1200
+
+
+def test_scheduler_wait_time(scheduled):
+    scheduler = ProcessScheduler(scheduled, "bots", "botid")
+
+    assert scheduler.get_wait_time(300) == 300
+
+    scheduler.get(2)
+    assert 1 <= scheduler.get_wait_time(3600) <= 600
+    assert scheduler.get_wait_time(60) == 60
+    assert scheduler.get_wait_time(0) == 0
+
+    # Overdue items were not processed this pass, they are retried after the maximum
+    scheduler.get(1)
+    assert scheduler.get_wait_time(300) == 300
+
+
+def test_scheduler_persist(scheduled):
+    scheduler = ProcessScheduler(scheduled, "bots", "botid")
+    scheduler.set(1, 2000)
+    scheduler.set(3, 3000)
+    scheduler.persist()
+
+    assert dict(scheduled.execute("SELECT * FROM bots").fetchall()) == {
+        1: 2000, 2: scheduler.times["2"], 3: 3000
+    }
+    assert not scheduled.in_transaction
+    assert ProcessScheduler(scheduled, "bots", "botid").times["3"] == 3000
+
+
+def test_scheduler_checks_identifiers(scheduled):
+    with pytest.raises(ValueError):
+        ProcessScheduler(scheduled, "bots", "botid; DROP TABLE bots")
@@ -0,0 +1,191 @@
+"""Tests of the market data batch and history."""
+import time
+
+import pytest
+
+from helpers.database import open_memory_database
+from helpers.marketdata import (
+    HISTORY_DAY,
+    HISTORY_HOUR,
+    HISTORY_RAW,
+    MarketDataBatch,
+    MarketDataHistory,
+    create_marketdata_tables,
+)
+
+# Start of a day, so the hour and day buckets are easy to follow
+DAY = 1_700_006_400
+
+
+@pytest.fixture
+def database():
+    """Empty market data database."""
+
+    dbconnection = open_memory_database()
+    create_marketdata_tables(dbconnection)
+
+    return dbconnection
+
+
+def store_ranks(database, base, ranks, addmissing=True, updatetime=True):
+    """Store the CoinMarketCap rank per coin, return the batch and result of store()."""
+
+    batch = MarketDataBatch(base, rankcolumns=("coinmarketcap",))
+    for coin, rank in ranks.items():
+        batch.add(coin, (rank,))
+
+    return batch, batch.store(database, addmissing, updatetime)
+
+
+def get_ranks(database):
+    """Return the CoinMarketCap rank per (base, coin)."""
+
+    return {
+        (dbrow[0], dbrow[1]): dbrow[2]
+        for dbrow in database.execute("SELECT base, coin, coinmarketcap FROM rankings")
+    }
+
+
+def test_store_adds_and_updates(database):
+    _, result = store_ranks(database, "usdt", {"btc": 1, "eth": 2})
+    assert result == (2, [])
+
+    _, result = store_ranks(database, "USDT", {"BTC": 3}, addmissing=False)
+    assert result == (1, [])
+
+    assert get_ranks(database) == {("USDT", "BTC"): 3, ("USDT", "ETH"): 2}
+    assert database.execute("SELECT COUNT(*) FROM prices").fetchone()[0] == 2
+
+
+def test_store_skips_missing_pairs(database):
+    store_ranks(database, "USDT", {"BTC": 1})
+
+    _, result = store_ranks(database, "USDT", {"BTC": 2, "ADA": 9}, addmissing=False)
+
+    assert result == (1, ["ADA"])
+    assert get_ranks(database) == {("USDT", "BTC"): 2}
+
+
+def test_store_all_bases(database):
+    store_ranks(database, "USDT", {"BTC": 1})
+    store_ranks(database, "BUSD", {"BTC": 1, "ETH": 2})
+
+    batch, result = store_ranks(database, "*", {"BTC": 5, "ADA": 9}, addmissing=True)
+
+    assert result == (2, ["ADA"])
+    assert sorted(batch.storedrankings) == [("BUSD", "BTC", 5), ("USDT", "BTC", 5)]
+    assert get_ranks(database) == {
+        ("USDT", "BTC"): 5, ("BUSD", "BTC"): 5, ("BUSD", "ETH"): 2
+    }
+
+
+def test_store_keeps_time_without_updatetime(database):
+    store_ranks(database, "USDT", {"BTC": 1})
+    database.execute("UPDATE pairs SET last_updated = 1")
+
+    store_ranks(database, "USDT", {"BTC": 2, "ETH": 3}, updatetime=False)
+
+    assert dict(
+        database.execute("SELECT coin, last_updated FROM pairs").fetchall()
+    )["BTC"] == 1
+
+
+@pytest.fixture
+def history(logger, database):
+    """History of the altrank, with the default retention."""
+
+    return MarketDataHistory(
+        logger,
+        database,
+        ["altrank", "unknown"],
+        {
+            HISTORY_RAW: 48 * HISTORY_HOUR,
+            HISTORY_HOUR: 30 * HISTORY_DAY,
+            HISTORY_DAY: 365 * HISTORY_DAY,
+        },
+    )
+
+
+def record_altrank(database, history, timestamp, ranks):
+    """Store and record the altrank per coin for the USDT base at the time."""
+
+    batch = MarketDataBatch("USDT", rankcolumns=("altrank",))
+    for coin, rank in ranks.items():
+        batch.add(coin, (rank,))
+    batch.store(database, addmissing=True)
+
+    return history.record(batch, timestamp)
+
+
+def test_history_records_known_metrics(database, history):
+    assert history.metrics == ["altrank"]
+    assert record_altrank(database, history, DAY, {"BTC": 10, "ETH": 20}) == 2
+
+
+def test_downsample_hourly(database, history):
+    record_altrank(database, history, DAY + 60, {"BTC": 10})
+    record_altrank(database, history, DAY + 1800, {"BTC": 20})
+    record_altrank(database, history, DAY + 3000, {"BTC": 60})
+    record_altrank(database, history, DAY + HISTORY_HOUR + 60, {"BTC": 5})
+
+    history.downsample(DAY + HISTORY_HOUR + 120)
+
+    hours = history.get_range(
+        "usdt", "btc", "altrank", DAY, DAY + HISTORY_DAY, HISTORY_HOUR
+    )
+    assert [tuple(row) for row in hours] == [(DAY, 30.0, 10.0, 60.0, 3)]
+
+    # The incomplete hour is aggregated once complete, the raw samples remain
+    history.downsample(DAY + 2 * HISTORY_HOUR)
+    hours = history.get_range(
+        "USDT", "BTC", "altrank", DAY, DAY + HISTORY_DAY, HISTORY_HOUR
+    )
+    assert [row[0] for row in hours] == [DAY, DAY + HISTORY_HOUR]
+    assert len(
+        history.get_range("USDT", "BTC", "altrank", DAY, DAY + HISTORY_DAY, HISTORY_RAW)
+    ) == 4
+
+
+def test_downsample_daily_and_retention(database, history):
+    record_altrank(database, history, DAY, {"BTC": 10})
+    record_altrank(database, history, DAY + HISTORY_HOUR, {"BTC": 30})
+
+    history.downsample(DAY + 2 * HISTORY_HOUR)
+    history.downsample(DAY + 3 * HISTORY_DAY)
+
+    days = history.get_range(
+        "USDT", "BTC", "altrank", DAY, DAY + 3 * HISTORY_DAY, HISTORY_DAY
+    )
+    assert [tuple(row) for row in days] == [(DAY, 20.0, 10.0, 30.0, 2)]
+
+    # The raw samples are older than their retention of 48 hours
+    assert history.get_range(
+        "USDT", "BTC", "altrank", DAY, DAY + 3 * HISTORY_DAY, HISTORY_RAW
+    ) == []
+
+
+def test_get_changes(database, history):
+    record_altrank(database, history, DAY, {"BTC": 50, "ETH": 10})
+    record_altrank(database, history, DAY + 600, {"BTC": 40})
+    record_altrank(database, history, DAY + 1200, {"BTC": 30, "ETH": 15})
+
+    assert history.get_changes("usdt", "altrank", 3600, DAY + 1800) == {
+        "BTC": -20.0, "ETH": 5.0
+    }
+    assert history.get_changes("USDT", "altrank", 900, DAY + 1800) == {
+        "BTC": 0.0, "ETH": 0.0
+    }
+
+
+def test_get_aggregate(database, history):
+    # Recent samples, so the raw resolution is used
+    start = int(time.time()) - 600
+    record_altrank(database, history, start, {"BTC": 10})
+    record_altrank(database, history, start + 60, {"BTC": 30})
+
+    aggregate = history.get_aggregate("USDT", "BTC", "altrank", start)
+
+    assert aggregate == {
+        "average": 20.0, "minimum": 10.0, "maximum": 30.0, "first": 10.0, "last": 30.0
+    }
+    assert history.get_aggregate("USDT", "ETH", "altrank", start) is None
@@ -0,0 +1,53 @@
+"""Tests of the subscriber of the 3Commas event broker."""
+import json
+import socket
+import threading
+import time
+
+from helpers.threecommas_broker import ThreeCommasEventSubscriber, parse_broker_address
+
+
+def serve_messages(lines):
+    """Start a broker which sends the lines to the first subscriber, return its address."""
+
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+
+    def serve():
+        connection, _ = server.accept()
+        with connection:
+            connection.makefile("r").readline()
+            connection.sendall("".join(f"{line}\n" for line in lines).encode())
+            time.sleep(1)
+        server.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+
+    return f"127.0.0.1:{server.getsockname()[1]}"
+
+
+def test_parse_broker_address():
+    assert parse_broker_address(":8500") == (socket.AF_INET, ("127.0.0.1", 8500))
+    assert parse_broker_address("/tmp/broker.sock") == (socket.AF_UNIX, "/tmp/broker.sock")
+
+
+def test_subscriber_skips_bad_messages(logger):
+    received = []
+    done = threading.Event()
+
+    def on_deal(deal):
+        received.append(deal)
+        done.set()
+
+    address = serve_messages([
+        "not json",
+        json.dumps({"type": "event"}),
+        json.dumps({"type": "event", "channel": "DealsChannel", "event": {"id": 1}}),
+    ])
+    subscriber = ThreeCommasEventSubscriber(logger, address, {"DealsChannel": on_deal})
+    subscriber.start_listener(True)
+
+    assert done.wait(5)
+    assert received == [{"id": 1}]
+    assert len([level for level, _ in logger.messages if level == "error"]) == 2
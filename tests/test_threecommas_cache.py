@@ -0,0 +1,80 @@
+"""Tests of the shared 3Commas response cache."""
+from helpers.threecommas_cache import ThreeCommasCache
+
+
+def test_get_returns_stored_data(logger, tmp_path):
+    cache = ThreeCommasCache(logger, tmp_path, "key")
+    key = ThreeCommasCache.create_key("bots", "show", "1", None, None)
+
+    assert cache.get(key) is None
+
+    cache.set(key, "bots", "1", {"id": 1}, 30)
+
+    assert cache.get(key) == {"id": 1}
+    assert cache.get(key, max_age=-1) is None
+
+
+def test_expired_data_is_not_returned(logger, tmp_path):
+    cache = ThreeCommasCache(logger, tmp_path, "key")
+    key = ThreeCommasCache.create_key("bots", "show", "1", None, None)
+
+    cache.set(key, "bots", "1", {"id": 1}, -1)
+
+    assert cache.get(key) is None
+
+
+def test_api_keys_do_not_share_responses(logger, tmp_path):
+    cache = ThreeCommasCache(logger, tmp_path, "key-of-account-1")
+    othercache = ThreeCommasCache(logger, tmp_path, "key-of-account-2")
+    key = ThreeCommasCache.create_key("bots", "", None, {"limit": 100}, None)
+
+    cache.set(key, "bots", None, [{"id": 1}], 30)
+
+    assert cache.get(key) == [{"id": 1}]
+    assert othercache.get(key) is None
+    assert cache.dbpath != othercache.dbpath
+    assert "key-of-account" not in cache.dbpath
+
+
+def test_same_api_key_shares_responses(logger, tmp_path):
+    cache = ThreeCommasCache(logger, tmp_path, "key")
+    othercache = ThreeCommasCache(logger, tmp_path, "key")
+    key = ThreeCommasCache.create_key("bots", "show", "1", None, None)
+
+    cache.set(key, "bots", "1", {"id": 1}, 30)
+
+    assert othercache.get(key) == {"id": 1}
+
+
+def test_invalidate_removes_item_and_lists(logger, tmp_path):
+    cache = ThreeCommasCache(logger, tmp_path, "key")
+    showkey = ThreeCommasCache.create_key("bots", "show", "1", None, None)
+    otherkey = ThreeCommasCache.create_key("bots", "show", "2", None, None)
+    listkey = ThreeCommasCache.create_key("bots", "", None, None, None)
+
+    cache.set(showkey, "bots", "1", {"id": 1}, 30)
+    cache.set(otherkey, "bots", "2", {"id": 2}, 30)
+    cache.set(listkey, "bots", None, [{"id": 1}, {"id": 2}], 30)
+
+    cache.invalidate("bots", "1")
+
+    assert cache.get(showkey) is None
+    assert cache.get(listkey) is None
+    assert cache.get(otherkey) == {"id": 2}
+
+
+def test_write_to_deals_invalidates_bots(logger, tmp_path):
+    cache = ThreeCommasCache(logger, tmp_path, "key")
+    key = ThreeCommasCache.create_key("bots", "show", "1", None, None)
+
+    cache.set(key, "bots", "1", {"id": 1}, 30)
+    cache.invalidate("deals", "10")
+
+    assert cache.get(key) is None
+
+
+def test_ttl_overrides(logger, tmp_path):
+    cache = ThreeCommasCache(logger, tmp_path, "key", {"bots/show": 5})
+
+    assert cache.get_ttl("bots", "show") == 5
+    assert cache.get_ttl("deals", "") == 0
@@ -0,0 +1,81 @@
+"""Tests of the circuit breaker per 3Commas endpoint."""
+import time
+
+from helpers.threecommas_circuit import (
+    ThreeCommasCircuitBreaker,
+    get_backoff_time,
+    is_server_failure,
+)
+
+
+def open_circuit(circuitbreaker, entity, action, failures=2):
+    """Fail the endpoint often enough to open its circuit."""
+
+    for _ in range(failures):
+        circuitbreaker.record_failure(entity, action)
+
+
+def test_circuit_opens_after_threshold(logger):
+    circuitbreaker = ThreeCommasCircuitBreaker(logger, threshold=2, opentime=60)
+
+    circuitbreaker.record_failure("bots", "show")
+    assert circuitbreaker.allow("bots", "show") == 0
+    assert not circuitbreaker.is_open()
+
+    circuitbreaker.record_failure("bots", "show")
+    assert circuitbreaker.allow("bots", "show") > 0
+    assert circuitbreaker.is_open()
+    assert circuitbreaker.is_open("bots", "show")
+    assert not circuitbreaker.is_open("deals", "")
+    assert circuitbreaker.get_stats()["rejected"] == 1
+
+
+def test_half_open_circuit_allows_one_probe(logger):
+    circuitbreaker = ThreeCommasCircuitBreaker(
+        logger, threshold=1, opentime=0.05, maxopentime=0.05
+    )
+
+    open_circuit(circuitbreaker, "bots", "show", 1)
+    time.sleep(0.06)
+
+    # Half-open is not open, so the scripts send the probe request
+    assert not circuitbreaker.is_open()
+    assert circuitbreaker.get_retry_time() == 0
+    assert circuitbreaker.allow("bots", "show") == 0
+    assert circuitbreaker.allow("bots", "show") > 0
+
+    circuitbreaker.record_success("bots", "show")
+    assert circuitbreaker.allow("bots", "show") == 0
+    assert circuitbreaker.get_stats()["open"] == []
+
+
+def test_critical_endpoints_are_never_rejected(logger):
+    circuitbreaker = ThreeCommasCircuitBreaker(logger, threshold=1, opentime=60)
+
+    open_circuit(circuitbreaker, "deals", "panic_sell", 1)
+    open_circuit(circuitbreaker, "deals", "show", 1)
+
+    assert circuitbreaker.allow("deals", "panic_sell") == 0
+    assert circuitbreaker.allow("deals", "show") > 0
+
+
+def test_circuits_are_shared_through_the_directory(logger, tmp_path):
+    circuitbreaker = ThreeCommasCircuitBreaker(logger, tmp_path, threshold=1, opentime=60)
+    othercircuitbreaker = ThreeCommasCircuitBreaker(logger, tmp_path, threshold=1)
+
+    open_circuit(circuitbreaker, "bots", "", 1)
+
+    assert othercircuitbreaker.allow("bots", "") > 0
+
+
+def test_is_server_failure():
+    assert not is_server_failure({})
+    assert is_server_failure({"status_code": None})
+    assert is_server_failure({"status_code": 429})
+    assert is_server_failure({"status_code": 502})
+    assert not is_server_failure({"status_code": 422})
+
+
+def test_backoff_time_is_bounded():
+    for attempt in range(1, 20):
+        assert 0 <= get_backoff_time(attempt, 1, 30) <= 30
@@ -0,0 +1,54 @@
+"""Tests of the 3Commas API request metrics."""
+import json
+import threading
+
+from helpers.threecommas_metrics import ThreeCommasMetrics
+
+
+def test_record_counts_per_endpoint(logger):
+    metrics = ThreeCommasMetrics(logger)
+
+    metrics.record("bots", "show", 0.2, False, 0, 1000)
+    metrics.record("bots", "show", 20.0, True, 10, 50)
+    metrics.record_cache_hit("bots", "show")
+
+    endpoint = metrics.get_stats()["endpoints"]["bots/show"]
+    assert endpoint["requests"] == 2
+    assert endpoint["errors"] == 1
+    assert endpoint["cache-hits"] == 1
+    assert endpoint["request-bytes"] == 10
+    assert endpoint["response-bytes"] == 1050
+    assert endpoint["latency-buckets"][2] == 1
+    assert endpoint["latency-buckets"][-1] == 1
+
+
+def test_concurrent_dumps(logger, tmp_path):
+    dumpfile = tmp_path / "metrics.json"
+    metrics = ThreeCommasMetrics(logger, str(dumpfile), 1)
+    metrics.lastdump = 0
+
+    def record():
+        for _ in range(50):
+            metrics.record("deals", "", 0.1, False, 0, 10)
+            metrics.dump()
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    metrics.dump()
+
+    assert json.loads(dumpfile.read_text())["endpoints"]["deals/"]["requests"] == 400
+    assert [path.name for path in tmp_path.iterdir()] == ["metrics.json"]
+
+
+def test_render_prometheus(logger):
+    metrics = ThreeCommasMetrics(logger)
+    metrics.record("bots", "", 0.01, False, 0, 10)
+
+    text = metrics.render_prometheus()
+
+    assert 'threecommas_requests_total{program="test",entity="bots",action="list"} 1' in text
+    assert 'le="+Inf"} 1' in text
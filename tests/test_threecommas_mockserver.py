@@ -0,0 +1,174 @@
+"""Tests of the routes of the mock 3Commas API, through the 3Commas client."""
+import asyncio
+import os
+import sys
+import threading
+
+import pytest
+import requests
+from aiohttp import web
+
+from helpers.threecommas import ThreeCommasApi
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tools"))
+
+# pylint: disable=wrong-import-position
+from threecommas_mockserver import MockServer, MockState  # noqa: E402
+
+
+def start_server(ratelimitrate=0.0):
+    """Serve a small mock API in a thread, return the server and its URL."""
+
+    server = MockServer(MockState(5, 2, 2, 1), 0, 0, ratelimitrate, 3)
+    started = threading.Event()
+    url = []
+
+    async def serve():
+        runner = web.AppRunner(server.create_app())
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        url.append(f"http://127.0.0.1:{runner.addresses[0][1]}")
+        started.set()
+        await asyncio.Event().wait()
+
+    threading.Thread(target=asyncio.run, args=(serve(),), daemon=True).start()
+    started.wait(5)
+
+    return server, url[0]
+
+
+@pytest.fixture(scope="module")
+def mockserver():
+    """Mock server shared by the tests of this module."""
+
+    return start_server()
+
+
+@pytest.fixture
+def api(logger, mockserver):
+    """3Commas client of the mock server."""
+
+    return ThreeCommasApi(
+        logger, "key", "secret", None, {"nr_of_retries": 0}, api_url=mockserver[1]
+    )
+
+
+def test_bots_list_and_pagination(api):
+    error, bots = api.request(entity="bots", action="", payload={"limit": 100})
+    assert not error
+    assert [bot["id"] for bot in bots] == [10000000 + index for index in range(5)]
+
+    _, page = api.request(entity="bots", action="", payload={"limit": 2, "offset": 4})
+    assert [bot["id"] for bot in page] == [10000004]
+
+    _, bots = api.request(entity="bots", action="", payload={"account_id": 30000001})
+    assert {bot["account_id"] for bot in bots} == {30000001}
+
+
+def test_bots_show_and_not_found(api):
+    error, bot = api.request(entity="bots", action="show", action_id="10000001")
+    assert not error
+    assert bot["id"] == 10000001
+    assert len(bot["active_deals"]) == bot["active_deals_count"]
+
+    error, bot = api.request(entity="bots", action="show", action_id="1")
+    assert not bot
+    assert error["status_code"] == 404
+    assert "Bot not found" in error["msg"]
+
+
+def test_bots_update(api):
+    error, bot = api.request(
+        entity="bots",
+        action="update",
+        action_id="10000002",
+        payload={"bot_id": 10000002, "pairs": ["USDT_BTC"], "max_active_deals": 1},
+    )
+    assert not error
+    assert bot["pairs"] == ["USDT_BTC"]
+
+    _, bot = api.request(entity="bots", action="show", action_id="10000002")
+    assert bot["max_active_deals"] == 1
+
+
+def test_deal_orders_and_panic_sell(api):
+    _, deals = api.request(
+        entity="deals", action="", payload={"bot_id": 10000003, "scope": "active"}
+    )
+    dealid = str(deals[0]["id"])
+
+    error, data = api.request(
+        entity="deals",
+        action="add_funds",
+        action_id=dealid,
+        payload={"quantity": 1, "is_market": False, "rate": 10, "deal_id": dealid},
+    )
+    assert not error
+
+    _, orders = api.request(entity="deals", action="market_orders", action_id=dealid)
+    assert data["order_id"] in [order["order_id"] for order in orders]
+
+    _, orders = api.request(
+        entity="deals",
+        action="cancel_order",
+        action_id=dealid,
+        payload={"order_id": data["order_id"]},
+    )
+    assert [
+        order["status_string"] for order in orders if order["order_id"] == data["order_id"]
+    ] == ["Cancelled"]
+
+    error, deal = api.request(entity="deals", action="panic_sell", action_id=dealid)
+    assert not error
+    assert deal["finished?"]
+    assert deal["status"] == "panic_sold"
+
+
+def test_accounts(api):
+    _, accounts = api.request(entity="accounts", action="")
+    assert [account["id"] for account in accounts] == [30000000, 30000001]
+
+    _, account = api.request(entity="accounts", action="account_info", action_id="30000000")
+    assert account["market_code"] == "binance"
+
+    _, pairs = api.request(
+        entity="accounts", action="market_pairs", payload={"market_code": "binance"}
+    )
+    assert "USDT_BTC" in pairs
+
+
+def test_smart_trades_v2(api):
+    error, trades = api.request(entity="smart_trades_v2", action="")
+    assert not error
+    assert isinstance(trades, list)
+
+
+def test_missing_signature_rejected(mockserver):
+    response = requests.get(f"{mockserver[1]}/public/api/ver1/bots", timeout=5)
+
+    assert response.status_code == 401
+    assert response.json()["error"] == "signature_invalid"
+
+
+def test_ratelimit_errors():
+    server, url = start_server(ratelimitrate=1.0)
+
+    response = requests.get(
+        f"{url}/public/api/ver1/bots",
+        headers={"APIKEY": "key", "Signature": "signature"},
+        timeout=5,
+    )
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "3"
+    assert server.ratelimited == 1
+
+
+def test_stats_counts_endpoints(mockserver, api):
+    api.request(entity="bots", action="pairs_black_list")
+
+    stats = requests.get(f"{mockserver[1]}/mock/stats", timeout=5).json()
+
+    assert stats["requests"] == mockserver[0].requests
+    assert stats["endpoints"]["GET /public/api/ver1/bots/pairs_black_list"] >= 1
@@ -0,0 +1,52 @@
+"""Tests of the token bucket shared by the scripts."""
+import pytest
+
+from helpers.threecommas_ratelimit import ThreeCommasRateLimiter
+
+
+def test_burst_then_wait(logger, tmp_path):
+    ratelimiter = ThreeCommasRateLimiter(logger, str(tmp_path), 10, 3, "high")
+
+    assert [ratelimiter.reserve_token() for _ in range(3)] == [0, 0, 0]
+
+    waitseconds = ratelimiter.reserve_token()
+    assert 0 < waitseconds <= 0.1
+
+
+def test_lower_priority_leaves_reserve(logger, tmp_path):
+    low = ThreeCommasRateLimiter(logger, str(tmp_path), 0.01, 4, "low")
+    high = ThreeCommasRateLimiter(logger, str(tmp_path), 0.01, 4, "high")
+
+    # Half of the bucket is reserved for the scripts with a higher priority
+    assert [low.reserve_token() for _ in range(2)] == [0, 0]
+    assert low.reserve_token() > 0
+
+    assert [high.reserve_token() for _ in range(2)] == [0, 0]
+    assert high.reserve_token() > 0
+
+
+def test_bucket_is_shared(logger, tmp_path):
+    first = ThreeCommasRateLimiter(logger, str(tmp_path), 0.01, 2, "high")
+    second = ThreeCommasRateLimiter(logger, str(tmp_path), 0.01, 2, "high")
+
+    assert first.reserve_token() == 0
+    assert second.reserve_token() == 0
+    assert first.reserve_token() > 0
+
+
+def test_acquire_waits_and_counts(logger, tmp_path):
+    ratelimiter = ThreeCommasRateLimiter(logger, str(tmp_path), 50, 1, "high")
+
+    assert ratelimiter.acquire() == 0
+    assert ratelimiter.acquire() == pytest.approx(0.02, abs=0.01)
+
+    stats = ratelimiter.get_stats()
+    assert stats["requests"] == 2
+    assert stats["delayed"] == 1
+
+
+def test_unknown_priority_is_normal(logger, tmp_path):
+    ratelimiter = ThreeCommasRateLimiter(logger, str(tmp_path), 1, 4, "urgent")
+
+    assert ratelimiter.priority == "normal"
+    assert any(level == "warning" for level, _ in logger.messages)
@@ -0,0 +1,62 @@
+"""Tests of the recording and replaying of the 3Commas API traffic."""
+import os
+
+from helpers import threecommas_traffic
+from helpers.threecommas_traffic import ThreeCommasTraffic
+
+
+def record_requests(logger, path):
+    """Record two orders of the same deal and a repeated bot request."""
+
+    traffic = ThreeCommasTraffic(logger, "record", path)
+    traffic.record("deals", "cancel_order", "1", "10", None, None, 0.1, {}, {"id": 10})
+    traffic.record("deals", "cancel_order", "1", "11", None, None, 0.1, {}, {"id": 11})
+    traffic.record("bots", "show", "5", None, None, None, 0.1, {}, {"name": "first"})
+    traffic.record("bots", "show", "5", None, None, None, 0.1, {}, {"name": "second"})
+    traffic.close()
+
+
+def test_replay_in_recorded_order(logger, tmp_path):
+    path = str(tmp_path / "traffic.jsonl.gz")
+    record_requests(logger, path)
+
+    traffic = ThreeCommasTraffic(logger, "replay", path, replaylatency=False)
+
+    assert traffic.replay("deals", "cancel_order", "1", "11", None, None) == ({}, {"id": 11})
+    assert traffic.replay("deals", "cancel_order", "1", "10", None, None) == ({}, {"id": 10})
+    assert traffic.replay("bots", "show", "5", None, None, None)[1] == {"name": "first"}
+    assert traffic.replay("bots", "show", "5", None, None, None)[1] == {"name": "second"}
+    assert traffic.replay("bots", "show", "5", None, None, None)[1] == {"name": "second"}
+
+    error, _ = traffic.replay("bots", "show", "6", None, None, None)
+    assert error["error"]
+    assert traffic.get_stats()["misses"] == 1
+
+
+def test_recording_is_one_stream(logger, tmp_path):
+    path = str(tmp_path / "traffic.jsonl.gz")
+    record_requests(logger, path)
+
+    # One gzip header for the whole recording, not one per request
+    with open(path, "rb") as file:
+        assert file.read().count(b"\x1f\x8b\x08") == 1
+
+
+def test_replay_truncated_recording(logger, tmp_path, monkeypatch):
+    monkeypatch.setattr(threecommas_traffic, "TRAFFIC_FLUSH_INTERVAL", 0)
+
+    path = str(tmp_path / "traffic.jsonl.gz")
+    traffic = ThreeCommasTraffic(logger, "record", path)
+    traffic.record("bots", "show", "5", None, None, None, 0.1, {}, {"name": "flushed"})
+
+    # Killed while recording, the log is cut off after the last flush
+    size = os.path.getsize(path)
+    traffic.record("bots", "show", "6", None, None, None, 0.1, {}, {"name": "lost"})
+    traffic.close()
+    with open(path, "r+b") as file:
+        file.truncate(size)
+
+    traffic = ThreeCommasTraffic(logger, "replay", path, replaylatency=False)
+
+    assert traffic.replay("bots", "show", "5", None, None, None) == ({}, {"name": "flushed"})
+    assert any(level == "warning" for level, _ in logger.messages)
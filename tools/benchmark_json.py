@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Measure the cost of decoding 3Commas websocket frames and API responses, with the
+previous stdlib path and with the current JSON backend.
+
+Uses synthetic DealsChannel frames by default, or the recorded frames of a file with
+one raw websocket frame per line:
+
+    python3 tools/benchmark_json.py --frames websocket_frames.txt
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# pylint: disable=wrong-import-position
+from threecommas_mockserver import MockState
+
+from helpers import jsonbackend
+
+
+def create_frames(state, nrofframes):
+    """Return DealsChannel frames with the deals of the mock state, like 3Commas sends."""
+
+    identifier = json.dumps(
+        {"channel": "DealsChannel", "users": [{"api_key": "key", "signature": "signature"}]}
+    )
+    deals = list(state.deals.values())
+
+    return [
+        json.dumps({"identifier": identifier, "message": deals[i % len(deals)]})
+        for i in range(nrofframes)
+    ]
+
+
+def load_frames(path):
+    """Return the recorded frames, one per line."""
+
+    with open(path, encoding="utf-8") as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+def parse_frame_stdlib(frame):
+    """The previous path: the frame and its identifier decoded with json."""
+
+    message = json.loads(frame)
+    if "identifier" in message:
+        return json.loads(message["identifier"])["channel"], message.get("message")
+
+    return None, message
+
+
+def create_parse_frame_backend():
+    """The current path: the frame decoded with the backend, the identifier parsed once."""
+
+    channels = {}
+
+    def parse_frame(frame):
+        message = jsonbackend.loads(frame)
+        if "identifier" in message:
+            identifier = message["identifier"]
+            channel = channels.get(identifier)
+            if channel is None:
+                channel = jsonbackend.loads(identifier)["channel"]
+                channels[identifier] = channel
+
+            return channel, message.get("message")
+
+        return None, message
+
+    return parse_frame
+
+
+def measure(function, items, rounds):
+    """Return the average number of microseconds per item, best of the rounds."""
+
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for item in items:
+            function(item)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best / len(items) * 1000000
+
+
+def main():
+    """Run the benchmark."""
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", help="file with one recorded websocket frame per line")
+    parser.add_argument("--count", type=int, default=10000, help="number of synthetic frames")
+    parser.add_argument("--bots", type=int, default=500, help="number of bots in the payloads")
+    parser.add_argument("--rounds", type=int, default=5, help="rounds, best one is reported")
+    args = parser.parse_args()
+
+    state = MockState(args.bots, 3, 3, 1)
+    frames = load_frames(args.frames) if args.frames else create_frames(state, args.count)
+
+    botsshow = json.dumps(state.get_bot(min(state.bots)))
+    botslist = json.dumps([state.get_bot(botid) for botid in sorted(state.bots)[:100]])
+
+    # Both paths must return the same data
+    parse_frame_backend = create_parse_frame_backend()
+    for frame in frames[:100]:
+        assert parse_frame_stdlib(frame) == parse_frame_backend(frame)
+
+    print(f"JSON backend: {jsonbackend.BACKEND}")
+    print(f"{'payload':<28}{'count':>7}{'json (us)':>12}{'backend (us)':>14}{'speedup':>9}")
+
+    for name, function_stdlib, function_backend, items in (
+        ("websocket frame", parse_frame_stdlib, parse_frame_backend, frames),
+        ("bots/show", json.loads, jsonbackend.loads, [botsshow] * 1000),
+        ("bots list (100 bots)", json.loads, jsonbackend.loads, [botslist] * 50),
+    ):
+        before = measure(function_stdlib, items, args.rounds)
+        after = measure(function_backend, items, args.rounds)
+        print(
+            f"{name:<28}{len(items):>7}{before:>12.2f}{after:>14.2f}{before / after:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""Measure the time to store a CoinGecko section in the shared market data database,
+with the previous statements per coin and with the bulk MarketDataBatch.
+
+Reports the milliseconds per 1000 coins for the whole section (including the commit)
+as the median and the min-max over the rounds, for new and for existing pairs:
+
+    python3 tools/benchmark_marketdata.py --coins 1000 --rounds 10
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# pylint: disable=wrong-import-position
+from helpers.database import open_database
+from helpers.marketdata import MarketDataBatch, create_marketdata_tables
+
+PERIODS = ("1h", "24h", "7d", "14d", "30d", "200d", "1y")
+
+
+def create_payload(nrofcoins, seed):
+    """Return a CoinGecko like payload, with the rank and price changes of the coins."""
+
+    rand = random.Random(seed)
+    return [
+        {
+            "symbol": f"COIN{index}",
+            "market_cap_rank": index + 1,
+            **{
+                f"price_change_percentage_{period}_in_currency": rand.uniform(-20.0, 20.0)
+                for period in PERIODS
+            },
+        }
+        for index in range(nrofcoins)
+    ]
+
+
+def store_per_coin(database, base, payload):
+    """The previous path: look up, maybe add, and update each coin separately."""
+
+    for entry in payload:
+        coin = entry["symbol"].upper()
+
+        if not database.execute(
+            "SELECT * FROM pairs WHERE base = ? AND coin = ?", (base, coin)
+        ).fetchone():
+            database.execute(
+                "INSERT INTO pairs (base, coin, last_updated) VALUES (?, ?, ?)",
+                (base, coin, int(time.time()))
+            )
+            database.execute("INSERT INTO rankings (base, coin) VALUES (?, ?)", (base, coin))
+            database.execute("INSERT INTO prices (base, coin) VALUES (?, ?)", (base, coin))
+
+        database.execute(
+            "UPDATE rankings SET coinmarketcap = ? WHERE base = ? AND coin = ?",
+            (entry["market_cap_rank"], base, coin)
+        )
+        database.execute(
+            "UPDATE prices SET "
+            + ", ".join(f"change_{period} = ?" for period in PERIODS)
+            + " WHERE base = ? AND coin = ?",
+            (
+                *[entry[f"price_change_percentage_{period}_in_currency"] for period in PERIODS],
+                base, coin
+            )
+        )
+        database.execute(
+            "UPDATE pairs SET last_updated = ? WHERE base = ? AND coin = ?",
+            (int(time.time()), base, coin)
+        )
+
+    database.commit()
+
+
+def store_batch(database, base, payload):
+    """The current path: collect the payload, then store it with one statement per table."""
+
+    batch = MarketDataBatch(
+        base, ("coinmarketcap",), [f"change_{period}" for period in PERIODS]
+    )
+    for entry in payload:
+        batch.add(
+            entry["symbol"],
+            (entry["market_cap_rank"],),
+            [entry[f"price_change_percentage_{period}_in_currency"] for period in PERIODS]
+        )
+
+    batch.store(database, True)
+    database.commit()
+
+
+def measure(function, payload, rounds):
+    """Return the times of the rounds in seconds, for a new and for an already filled
+    database."""
+
+    times = ([], [])
+    for _ in range(rounds):
+        with tempfile.TemporaryDirectory() as tempdir:
+            database = open_database(f"{tempdir}/marketdata.sqlite3")
+            create_marketdata_tables(database)
+
+            for index in range(2):
+                start = time.perf_counter()
+                function(database, "USDT", payload)
+                times[index].append(time.perf_counter() - start)
+
+            database.close()
+
+    return times
+
+
+def format_times(times, nrofcoins):
+    """Return the median and min-max of the times, in milliseconds per 1000 coins."""
+
+    pertimes = [elapsed * 1000000 / nrofcoins for elapsed in times]
+
+    return (
+        f"{statistics.median(pertimes):.1f} "
+        f"({min(pertimes):.1f}-{max(pertimes):.1f})"
+    )
+
+
+def main():
+    """Run the benchmark."""
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--coins", type=int, default=1000, help="number of coins")
+    parser.add_argument("--rounds", type=int, default=10, help="number of rounds")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the random payload")
+    args = parser.parse_args()
+
+    payload = create_payload(args.coins, args.seed)
+
+    print("ms per 1000 coins, median (min-max) of the rounds")
+    print(f"{'path':<12}{'new pairs':>22}{'existing pairs':>22}")
+    for name, function in (("per coin", store_per_coin), ("batch", store_batch)):
+        newpairs, existingpairs = measure(function, payload, args.rounds)
+        print(
+            f"{name:<12}{format_times(newpairs, args.coins):>22}"
+            f"{format_times(existingpairs, args.coins):>22}"
+        )
+
+
+if __name__ == "__main__":
+    main()
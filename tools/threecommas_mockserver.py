@@ -0,0 +1,727 @@
+#!/usr/bin/env python3
+"""Local mock of the 3Commas API, to load test the scripts without touching production.
+
+Point a script at it by adding this to the [settings] section of its config:
+
+    3c-api-url = http://127.0.0.1:8765
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from aiohttp import web
+
+API_VERSION_V1 = "/public/api/ver1"
+API_VERSION_V2 = "/public/api/v2"
+
+BASES = ("USDT", "BUSD", "BTC")
+COINS = (
+    "BTC", "ETH", "BNB", "ADA", "XRP", "SOL", "DOT", "DOGE", "AVAX", "MATIC",
+    "LTC", "LINK", "ATOM", "UNI", "XLM", "ETC", "FIL", "TRX", "NEAR", "ALGO",
+)
+MARKETS = ("binance", "paper_trading", "ftx")
+
+
+def utcnow():
+    """Return the current time in the format used by 3Commas."""
+
+    return time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+
+
+class MockState:
+    """Synthetic accounts, bots, deals, grid bots and smart trades."""
+
+    def __init__(self, nrofbots, nrofdeals, nrofaccounts, seed):
+        self.random = random.Random(seed)
+        self.accounts = {}
+        self.bots = {}
+        self.deals = {}
+        self.orders = {}
+        self.gridbots = {}
+        self.smarttrades = {}
+        self.nextid = 1000000
+
+        for index in range(nrofaccounts):
+            accountid = 30000000 + index
+            self.accounts[accountid] = {
+                "id": accountid,
+                "name": f"Mock account {index}",
+                "market_code": MARKETS[index % len(MARKETS)],
+                "usd_amount": "10000.0",
+                "btc_amount": "0.5",
+            }
+
+        accountids = list(self.accounts)
+        for index in range(nrofbots):
+            self.__create_bot(10000000 + index, accountids[index % len(accountids)], nrofdeals)
+
+        for index in range(max(1, nrofbots // 10)):
+            gridbotid = 20000000 + index
+            self.gridbots[gridbotid] = {
+                "id": gridbotid,
+                "account_id": accountids[index % len(accountids)],
+                "pair": f"USDT_{COINS[index % len(COINS)]}",
+                "upper_price": "110.0",
+                "lower_price": "90.0",
+                "grids_quantity": "20",
+                "quantity_per_grid": "1.0",
+                "current_price": "100.0",
+                "strategy_type": "manual",
+                "is_enabled": True,
+                "updated_at": utcnow(),
+            }
+
+    def create_id(self):
+        """Return a new unique id."""
+
+        self.nextid += 1
+        return self.nextid
+
+    def __create_bot(self, botid, accountid, nrofdeals):
+        """Create a bot with its active and finished deals."""
+
+        base = BASES[botid % len(BASES)]
+        pairs = [
+            f"{base}_{coin}" for coin in self.random.sample(COINS, self.random.randint(1, 8))
+        ]
+        self.bots[botid] = {
+            "id": botid,
+            "account_id": accountid,
+            "account_name": self.accounts[accountid]["name"],
+            "name": f"Mock bot {botid}",
+            "is_enabled": True,
+            "pairs": pairs,
+            "max_active_deals": max(1, nrofdeals),
+            "active_deals_count": 0,
+            "base_order_volume": "10.0",
+            "safety_order_volume": "20.0",
+            "safety_order_step_percentage": "1.5",
+            "martingale_volume_coefficient": "1.05",
+            "martingale_step_coefficient": "1.2",
+            "max_safety_orders": 5,
+            "active_safety_orders_count": 1,
+            "take_profit": "1.5",
+            "take_profit_type": "total",
+            "strategy": "long",
+            "strategy_list": [{"strategy": "nonstop", "options": {}}],
+            "leverage_type": "not_specified",
+            "leverage_custom_value": None,
+            "allowed_deals_on_same_pair": 1,
+            "finished_deals_count": "0",
+            "finished_deals_profit_usd": "0.0",
+            "updated_at": utcnow(),
+        }
+
+        for index in range(nrofdeals):
+            self.create_deal(botid, pairs[index % len(pairs)], "bought")
+
+        # Also some finished deals, for the scripts processing the history
+        for index in range(nrofdeals):
+            self.create_deal(botid, pairs[index % len(pairs)], "completed")
+
+    def create_deal(self, botid, pair, status):
+        """Create a deal for the bot."""
+
+        bot = self.bots[botid]
+        dealid = self.create_id()
+        price = round(self.random.uniform(0.1, 100.0), 4)
+        profit = round(self.random.uniform(-5.0, 5.0), 2)
+        finished = status == "completed"
+
+        deal = {
+            "id": dealid,
+            "bot_id": botid,
+            "bot_name": bot["name"],
+            "account_id": bot["account_id"],
+            "pair": pair,
+            "status": status,
+            "finished?": finished,
+            "strategy": bot["strategy"],
+            "created_at": utcnow(),
+            "updated_at": utcnow(),
+            "closed_at": utcnow() if finished else None,
+            "base_order_volume": bot["base_order_volume"],
+            "safety_order_volume": bot["safety_order_volume"],
+            "safety_order_step_percentage": bot["safety_order_step_percentage"],
+            "martingale_volume_coefficient": bot["martingale_volume_coefficient"],
+            "martingale_step_coefficient": bot["martingale_step_coefficient"],
+            "max_safety_orders": bot["max_safety_orders"],
+            "active_safety_orders_count": bot["active_safety_orders_count"],
+            "current_active_safety_orders_count": 1,
+            "completed_safety_orders_count": self.random.randint(0, 3),
+            "completed_manual_safety_orders_count": 0,
+            "take_profit": bot["take_profit"],
+            "stop_loss_percentage": "0.0",
+            "stop_loss_price": None,
+            "tsl_enabled": False,
+            "trailing_enabled": False,
+            "bought_amount": "10.0",
+            "bought_volume": str(round(price * 10.0, 4)),
+            "bought_average_price": str(price),
+            "sold_volume": str(round(price * 10.0 * (1 + profit / 100), 4)) if finished else "0.0",
+            "current_price": str(round(price * (1 + profit / 100), 4)),
+            "actual_profit_percentage": str(profit),
+            "final_profit": str(round(price * 10.0 * profit / 100, 4)) if finished else "0.0",
+            "reserved_quote_funds": "0.0",
+        }
+        self.deals[dealid] = deal
+
+        self.orders[dealid] = [
+            {
+                "order_id": str(self.create_id()),
+                "order_type": "BUY",
+                "deal_order_type": "Base",
+                "status_string": "Filled",
+                "rate": str(price),
+                "quantity": "10.0",
+                "created_at": utcnow(),
+            }
+        ]
+
+        if not finished:
+            bot["active_deals_count"] += 1
+
+        return deal
+
+    def get_bot(self, botid):
+        """Return the bot with its active deals, like bots/show does."""
+
+        bot = dict(self.bots[botid])
+        bot["active_deals"] = [
+            deal for deal in self.deals.values()
+            if deal["bot_id"] == botid and not deal["finished?"]
+        ]
+        return bot
+
+
+class MockServer:
+    """The aiohttp application serving the 3Commas API endpoints."""
+
+    def __init__(self, state, latency, jitter, ratelimitrate, retryafter):
+        self.state = state
+        self.latency = latency
+        self.jitter = jitter
+        self.ratelimitrate = ratelimitrate
+        self.retryafter = retryafter
+
+        self.requests = 0
+        self.ratelimited = 0
+        self.endpoints = {}
+
+    def create_app(self):
+        """Return the application with all routes."""
+
+        app = web.Application(middlewares=[self.middleware])
+        v1 = API_VERSION_V1
+        v2 = API_VERSION_V2
+        app.add_routes([
+            web.get("/mock/stats", self.stats),
+            web.get(f"{v1}/bots", self.bots_list),
+            web.get(f"{v1}/bots/pairs_black_list", self.bots_pairs_black_list),
+            web.get(f"{v1}/bots/{{id}}/show", self.bots_show),
+            web.patch(f"{v1}/bots/{{id}}/update", self.bots_update),
+            web.post(f"{v1}/bots/{{id}}/start_new_deal", self.bots_start_new_deal),
+            web.post(f"{v1}/bots/{{id}}/enable", self.bots_enable),
+            web.post(f"{v1}/bots/{{id}}/disable", self.bots_disable),
+            web.get(f"{v1}/deals", self.deals_list),
+            web.get(f"{v1}/deals/{{id}}/show", self.deals_show),
+            web.patch(f"{v1}/deals/{{id}}/update_deal", self.deals_update_deal),
+            web.post(f"{v1}/deals/{{id}}/add_funds", self.deals_add_funds),
+            web.get(f"{v1}/deals/{{id}}/market_orders", self.deals_market_orders),
+            web.post(f"{v1}/deals/{{id}}/cancel_order", self.deals_cancel_order),
+            web.post(f"{v1}/deals/{{id}}/panic_sell", self.deals_panic_sell),
+            web.get(
+                f"{v1}/deals/{{id}}/data_for_adding_funds", self.deals_data_for_adding_funds
+            ),
+            web.get(f"{v1}/accounts", self.accounts_list),
+            web.get(f"{v1}/accounts/market_pairs", self.accounts_market_pairs),
+            web.get(f"{v1}/accounts/currency_rates", self.accounts_currency_rates),
+            web.get(f"{v1}/accounts/{{id}}", self.accounts_account_info),
+            web.post(f"{v1}/accounts/{{id}}/load_balances", self.accounts_load_balances),
+            web.get(f"{v1}/grid_bots/{{id}}", self.grid_bots_get),
+            web.patch(f"{v1}/grid_bots/{{id}}/manual", self.grid_bots_manual_update),
+            web.get(f"{v2}/smart_trades", self.smart_trades_list),
+            web.post(f"{v2}/smart_trades", self.smart_trades_new),
+            web.get(f"{v2}/smart_trades/{{id}}", self.smart_trades_get),
+            web.patch(f"{v2}/smart_trades/{{id}}", self.smart_trades_update),
+            web.delete(f"{v2}/smart_trades/{{id}}", self.smart_trades_cancel),
+            web.get(f"{v2}/smart_trades/{{id}}/trades", self.smart_trades_get_trades),
+            web.post(
+                f"{v2}/smart_trades/{{id}}/close_by_market", self.smart_trades_close_by_market
+            ),
+        ])
+        return app
+
+    @web.middleware
+    async def middleware(self, request, handler):
+        """Add the latency, inject rate limit errors and count the requests."""
+
+        if request.path.startswith("/mock/"):
+            return await handler(request)
+
+        self.requests += 1
+        route = request.match_info.route.resource
+        endpoint = f"{request.method} {route.canonical if route else request.path}"
+        self.endpoints[endpoint] = self.endpoints.get(endpoint, 0) + 1
+
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if "APIKEY" not in request.headers or "Signature" not in request.headers:
+            return self.error(401, "signature_invalid", "Missing APIKEY or Signature header")
+
+        if self.ratelimitrate > 0 and random.random() < self.ratelimitrate:
+            self.ratelimited += 1
+            return self.error(
+                429, "rate_limit", "Too many requests",
+                headers={"Retry-After": str(self.retryafter)},
+            )
+
+        return await handler(request)
+
+    @staticmethod
+    def error(status, error, description, headers=None):
+        """Return an error response like 3Commas does."""
+
+        return web.json_response(
+            {"error": error, "error_description": description}, status=status, headers=headers
+        )
+
+    def get_item(self, items, request):
+        """Return the item with the id of the request, or None."""
+
+        try:
+            return items.get(int(request.match_info["id"]))
+        except ValueError:
+            return None
+
+    @staticmethod
+    async def get_payload(request):
+        """Return the JSON payload of the request."""
+
+        if not request.can_read_body:
+            return {}
+        try:
+            return await request.json()
+        except ValueError:
+            return {}
+
+    @staticmethod
+    def paginate(items, request):
+        """Apply the limit and offset query parameters."""
+
+        limit = int(request.query.get("limit", 50))
+        offset = int(request.query.get("offset", 0))
+        return items[offset:offset + limit]
+
+    async def stats(self, request):
+        """Return the request counters of the mock server."""
+
+        return web.json_response(
+            {
+                "requests": self.requests,
+                "rate-limited": self.ratelimited,
+                "endpoints": self.endpoints,
+                "bots": len(self.state.bots),
+                "deals": len(self.state.deals),
+            }
+        )
+
+    async def bots_list(self, request):
+        """GET bots"""
+
+        bots = list(self.state.bots.values())
+        if "account_id" in request.query:
+            bots = [bot for bot in bots if str(bot["account_id"]) == request.query["account_id"]]
+        scope = request.query.get("scope")
+        if scope == "enabled":
+            bots = [bot for bot in bots if bot["is_enabled"]]
+        elif scope == "disabled":
+            bots = [bot for bot in bots if not bot["is_enabled"]]
+
+        return web.json_response(
+            [self.state.get_bot(bot["id"]) for bot in self.paginate(bots, request)]
+        )
+
+    async def bots_pairs_black_list(self, request):
+        """GET bots/pairs_black_list"""
+
+        return web.json_response({"pairs": ["USDT_BUSD", "USDT_USDC"]})
+
+    async def bots_show(self, request):
+        """GET bots/{id}/show"""
+
+        bot = self.get_item(self.state.bots, request)
+        if bot is None:
+            return self.error(404, "not_found", "Bot not found")
+
+        return web.json_response(self.state.get_bot(bot["id"]))
+
+    async def bots_update(self, request):
+        """PATCH bots/{id}/update"""
+
+        bot = self.get_item(self.state.bots, request)
+        if bot is None:
+            return self.error(404, "not_found", "Bot not found")
+
+        payload = await self.get_payload(request)
+        payload.pop("bot_id", None)
+        bot.update(payload)
+        bot["updated_at"] = utcnow()
+        return web.json_response(self.state.get_bot(bot["id"]))
+
+    async def bots_start_new_deal(self, request):
+        """POST bots/{id}/start_new_deal"""
+
+        bot = self.get_item(self.state.bots, request)
+        if bot is None:
+            return self.error(404, "not_found", "Bot not found")
+        if bot["active_deals_count"] >= int(bot["max_active_deals"]):
+            return self.error(422, "record_invalid", "Max active deals reached")
+
+        payload = await self.get_payload(request)
+        deal = self.state.create_deal(bot["id"], payload.get("pair", bot["pairs"][0]), "bought")
+        return web.json_response(deal)
+
+    async def bots_enable(self, request):
+        """POST bots/{id}/enable"""
+
+        return await self.__set_bot_enabled(request, True)
+
+    async def bots_disable(self, request):
+        """POST bots/{id}/disable"""
+
+        return await self.__set_bot_enabled(request, False)
+
+    async def __set_bot_enabled(self, request, enabled):
+        """Enable or disable the bot."""
+
+        bot = self.get_item(self.state.bots, request)
+        if bot is None:
+            return self.error(404, "not_found", "Bot not found")
+
+        bot["is_enabled"] = enabled
+        bot["updated_at"] = utcnow()
+        return web.json_response(self.state.get_bot(bot["id"]))
+
+    async def deals_list(self, request):
+        """GET deals"""
+
+        deals = list(self.state.deals.values())
+        if "bot_id" in request.query:
+            deals = [deal for deal in deals if str(deal["bot_id"]) == request.query["bot_id"]]
+        if "account_id" in request.query:
+            deals = [
+                deal for deal in deals if str(deal["account_id"]) == request.query["account_id"]
+            ]
+        scope = request.query.get("scope")
+        if scope == "active":
+            deals = [deal for deal in deals if not deal["finished?"]]
+        elif scope in ("finished", "completed"):
+            deals = [deal for deal in deals if deal["finished?"]]
+
+        order = request.query.get("order", "created_at")
+        if order in ("created_at", "updated_at", "closed_at"):
+            deals.sort(
+                key=lambda deal: (deal[order] or "", deal["id"]),
+                reverse=request.query.get("order_direction", "desc") == "desc",
+            )
+
+        return web.json_response(self.paginate(deals, request))
+
+    async def deals_show(self, request):
+        """GET deals/{id}/show"""
+
+        deal = self.get_item(self.state.deals, request)
+        if deal is None:
+            return self.error(404, "not_found", "Deal not found")
+
+        return web.json_response(deal)
+
+    async def deals_update_deal(self, request):
+        """PATCH deals/{id}/update_deal"""
+
+        deal = self.get_item(self.state.deals, request)
+        if deal is None:
+            return self.error(404, "not_found", "Deal not found")
+
+        payload = await self.get_payload(request)
+        payload.pop("deal_id", None)
+        deal.update(payload)
+        deal["updated_at"] = utcnow()
+        return web.json_response(deal)
+
+    async def deals_add_funds(self, request):
+        """POST deals/{id}/add_funds"""
+
+        deal = self.get_item(self.state.deals, request)
+        if deal is None:
+            return self.error(404, "not_found", "Deal not found")
+
+        payload = await self.get_payload(request)
+        orderid = str(self.state.create_id())
+        self.state.orders[deal["id"]].append(
+            {
+                "order_id": orderid,
+                "order_type": "BUY",
+                "deal_order_type": "Manual Safety",
+                "status_string": "Active",
+                "rate": str(payload.get("rate", deal["current_price"])),
+                "quantity": str(payload.get("quantity", 0)),
+                "created_at": utcnow(),
+            }
+        )
+        deal["completed_manual_safety_orders_count"] += 1
+        deal["updated_at"] = utcnow()
+        return web.json_response({"status": "success", "order_id": orderid})
+
+    async def deals_market_orders(self, request):
+        """GET deals/{id}/market_orders"""
+
+        deal = self.get_item(self.state.deals, request)
+        if deal is None:
+            return self.error(404, "not_found", "Deal not found")
+
+        return web.json_response(self.state.orders[deal["id"]])
+
+    async def deals_cancel_order(self, request):
+        """POST deals/{id}/cancel_order"""
+
+        deal = self.get_item(self.state.deals, request)
+        if deal is None:
+            return self.error(404, "not_found", "Deal not found")
+
+        payload = await self.get_payload(request)
+        for order in self.state.orders[deal["id"]]:
+            if str(order["order_id"]) == str(payload.get("order_id")):
+                order["status_string"] = "Cancelled"
+        deal["updated_at"] = utcnow()
+        return web.json_response(self.state.orders[deal["id"]])
+
+    async def deals_panic_sell(self, request):
+        """POST deals/{id}/panic_sell"""
+
+        deal = self.get_item(self.state.deals, request)
+        if deal is None:
+            return self.error(404, "not_found", "Deal not found")
+
+        if not deal["finished?"]:
+            deal.update(
+                {"status": "panic_sold", "finished?": True, "closed_at": utcnow()}
+            )
+            self.state.bots[deal["bot_id"]]["active_deals_count"] -= 1
+        deal["updated_at"] = utcnow()
+        return web.json_response(deal)
+
+    async def deals_data_for_adding_funds(self, request):
+        """GET deals/{id}/data_for_adding_funds"""
+
+        deal = self.get_item(self.state.deals, request)
+        if deal is None:
+            return self.error(404, "not_found", "Deal not found")
+
+        return web.json_response(
+            {
+                "min_lot_size": "0.001",
+                "max_lot_size": "10000.0",
+                "min_price": "0.0001",
+                "max_price": "100000.0",
+                "min_total": "10.0",
+                "price_step": "0.0001",
+                "lot_step": "0.001",
+                "orderbook_price_currency": deal["pair"].split("_")[0],
+                "limit_price": deal["current_price"],
+            }
+        )
+
+    async def accounts_list(self, request):
+        """GET accounts"""
+
+        return web.json_response(list(self.state.accounts.values()))
+
+    async def accounts_market_pairs(self, request):
+        """GET accounts/market_pairs"""
+
+        return web.json_response(
+            [f"{base}_{coin}" for base in BASES for coin in COINS if base != coin]
+        )
+
+    async def accounts_currency_rates(self, request):
+        """GET accounts/currency_rates"""
+
+        return web.json_response({"last": "20000.0", "bid": "19999.0", "ask": "20001.0"})
+
+    async def accounts_account_info(self, request):
+        """GET accounts/{id}"""
+
+        account = self.get_item(self.state.accounts, request)
+        if account is None:
+            return self.error(404, "not_found", "Account not found")
+
+        return web.json_response(account)
+
+    async def accounts_load_balances(self, request):
+        """POST accounts/{id}/load_balances"""
+
+        account = self.get_item(self.state.accounts, request)
+        if account is None:
+            return self.error(404, "not_found", "Account not found")
+
+        return web.json_response(account)
+
+    async def grid_bots_get(self, request):
+        """GET grid_bots/{id}"""
+
+        gridbot = self.get_item(self.state.gridbots, request)
+        if gridbot is None:
+            return self.error(404, "not_found", "Grid bot not found")
+
+        return web.json_response(gridbot)
+
+    async def grid_bots_manual_update(self, request):
+        """PATCH grid_bots/{id}/manual"""
+
+        gridbot = self.get_item(self.state.gridbots, request)
+        if gridbot is None:
+            return self.error(404, "not_found", "Grid bot not found")
+
+        payload = await self.get_payload(request)
+        payload.pop("bot_id", None)
+        gridbot.update(payload)
+        gridbot["updated_at"] = utcnow()
+        return web.json_response(gridbot)
+
+    async def smart_trades_list(self, request):
+        """GET smart_trades"""
+
+        return web.json_response(
+            self.paginate(list(self.state.smarttrades.values()), request)
+        )
+
+    async def smart_trades_new(self, request):
+        """POST smart_trades"""
+
+        payload = await self.get_payload(request)
+        tradeid = self.state.create_id()
+        smarttrade = {
+            "id": tradeid,
+            "account_id": payload.get("account_id"),
+            "pair": payload.get("pair"),
+            "status": {"type": "waiting_position", "title": "Waiting position"},
+            "position": payload.get("position", {}),
+            "take_profit": payload.get("take_profit", {}),
+            "stop_loss": payload.get("stop_loss", {}),
+            "note": payload.get("note", ""),
+            "created_at": utcnow(),
+            "updated_at": utcnow(),
+        }
+        self.state.smarttrades[tradeid] = smarttrade
+        return web.json_response(smarttrade)
+
+    async def smart_trades_get(self, request):
+        """GET smart_trades/{id}"""
+
+        smarttrade = self.get_item(self.state.smarttrades, request)
+        if smarttrade is None:
+            return self.error(404, "not_found", "Smart trade not found")
+
+        return web.json_response(smarttrade)
+
+    async def smart_trades_update(self, request):
+        """PATCH smart_trades/{id}"""
+
+        smarttrade = self.get_item(self.state.smarttrades, request)
+        if smarttrade is None:
+            return self.error(404, "not_found", "Smart trade not found")
+
+        smarttrade.update(await self.get_payload(request))
+        smarttrade["updated_at"] = utcnow()
+        return web.json_response(smarttrade)
+
+    async def smart_trades_cancel(self, request):
+        """DELETE smart_trades/{id}"""
+
+        smarttrade = self.get_item(self.state.smarttrades, request)
+        if smarttrade is None:
+            return self.error(404, "not_found", "Smart trade not found")
+
+        smarttrade["status"] = {"type": "cancelled", "title": "Cancelled"}
+        smarttrade["updated_at"] = utcnow()
+        return web.json_response(smarttrade)
+
+    async def smart_trades_get_trades(self, request):
+        """GET smart_trades/{id}/trades"""
+
+        smarttrade = self.get_item(self.state.smarttrades, request)
+        if smarttrade is None:
+            return self.error(404, "not_found", "Smart trade not found")
+
+        return web.json_response(
+            [
+                {
+                    "id": smarttrade["id"] + 1,
+                    "status": "finished",
+                    "side": "buy",
+                    "initial_amount": "1.0",
+                    "realised_amount": "1.0",
+                    "created_at": smarttrade["created_at"],
+                }
+            ]
+        )
+
+    async def smart_trades_close_by_market(self, request):
+        """POST smart_trades/{id}/close_by_market"""
+
+        smarttrade = self.get_item(self.state.smarttrades, request)
+        if smarttrade is None:
+            return self.error(404, "not_found", "Smart trade not found")
+
+        smarttrade["status"] = {"type": "panic_sold", "title": "Closed at market price"}
+        smarttrade["updated_at"] = utcnow()
+        return web.json_response(smarttrade)
+
+
+def main():
+    """Parse the arguments and serve the mock API."""
+
+    parser = argparse.ArgumentParser(description="Local mock of the 3Commas API.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="port to listen on")
+    parser.add_argument("--bots", type=int, default=500, help="number of bots")
+    parser.add_argument(
+        "--deals", type=int, default=3, help="number of active (and finished) deals per bot"
+    )
+    parser.add_argument("--accounts", type=int, default=3, help="number of accounts")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the data generator")
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="seconds added to each response"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.05, help="random extra latency in seconds"
+    )
+    parser.add_argument(
+        "--ratelimit-rate", type=float, default=0.0,
+        help="fraction (0-1) of the requests answered with a 429 error"
+    )
+    parser.add_argument(
+        "--retry-after", type=int, default=1, help="Retry-After seconds of the 429 errors"
+    )
+    args = parser.parse_args()
+
+    state = MockState(args.bots, args.deals, args.accounts, args.seed)
+    server = MockServer(
+        state, args.latency, args.jitter, args.ratelimit_rate, args.retry_after
+    )
+
+    print(
+        f"Serving mock 3Commas API on http://{args.host}:{args.port} "
+        f"({len(state.bots)} bots, {len(state.deals)} deals, "
+        f"{len(state.accounts)} accounts, bot ids {min(state.bots)}-{max(state.bots)})"
+    )
+    web.run_app(server.create_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,7 @@ import sys
 import time
 from pathlib import Path
 
+from helpers.database import open_database
 from helpers.logging import Logger, NotificationHandler
 from helpers.misc import check_deal, wait_time_interval
 from helpers.threecommas import init_threecommas_api
@@ -114,13 +115,13 @@ def increment_takeprofit(thebot):
             existing_deal = check_deal(cursor, deal_id)
             if existing_deal is not None:
                 db.execute(
-                    f"UPDATE deals SET safety_count = {completed_safety_orders_count} "
-                    f"WHERE dealid = {deal_id}"
+                    "UPDATE deals SET safety_count = ? WHERE dealid = ?",
+                    (completed_safety_orders_count, deal_id)
                 )
             else:
                 db.execute(
-                    f"INSERT INTO deals (dealid, safety_count) VALUES ({deal_id}, "
-                    f"{completed_safety_orders_count})"
+                    "INSERT INTO deals (dealid, safety_count) VALUES (?, ?)",
+                    (deal_id, completed_safety_orders_count)
                 )
 
             existing_deal_safety_count = (
@@ -149,15 +150,12 @@ def init_tpincrement_db():
     """Create or open database to store bot and deals data."""
     try:
         dbname = f"{program}.sqlite3"
-        dbpath = f"file:{datadir}/{dbname}?mode=rw"
-        dbconnection = sqlite3.connect(dbpath, uri=True)
-        dbconnection.row_factory = sqlite3.Row
+        dbconnection = open_database(f"{datadir}/{dbname}", "rw")
 
         logger.info(f"Database '{datadir}/{dbname}' opened successfully")
 
     except sqlite3.OperationalError:
-        dbconnection = sqlite3.connect(f"{datadir}/{dbname}")
-        dbconnection.row_factory = sqlite3.Row
+        dbconnection = open_database(f"{datadir}/{dbname}")
         dbcursor = dbconnection.cursor()
         logger.info(f"Database '{datadir}/{dbname}' created successfully")
 
@@ -9,6 +9,7 @@ import sys
 import time
 from pathlib import Path
 
+from helpers.database import open_database
 from helpers.logging import Logger, NotificationHandler
 from helpers.misc import check_deal, wait_time_interval
 from helpers.threecommas import init_threecommas_api
@@ -159,14 +160,16 @@ def trailing_stoploss(thebot):
 
                     if existing_deal is not None:
                         db.execute(
-                            f"UPDATE deals SET last_profit_percentage = {actual_profit_percentage}, "
-                            f"last_stop_loss_percentage = {new_stoploss} "
-                            f"WHERE dealid = {deal_id}"
+                            "UPDATE deals SET last_profit_percentage = ?, "
+                            "last_stop_loss_percentage = ? "
+                            "WHERE dealid = ?",
+                            (actual_profit_percentage, new_stoploss, deal_id)
                         )
                     else:
                         db.execute(
-                            f"INSERT INTO deals (dealid, last_profit_percentage, last_stop_loss_percentage) "
-                            f"VALUES ({deal_id}, {actual_profit_percentage}, {new_stoploss})"
+                            "INSERT INTO deals (dealid, last_profit_percentage, "
+                            "last_stop_loss_percentage) VALUES (?, ?, ?)",
+                            (deal_id, actual_profit_percentage, new_stoploss)
                         )
                         logger.info(
                             f"New deal found {deal_id}/{deal['pair']} on bot \"{thebot['name']}\""
@@ -182,15 +185,12 @@ def init_tsl_db():
     """Create or open database to store bot and deals data."""
     try:
         dbname = f"{program}.sqlite3"
-        dbpath = f"file:{datadir}/{dbname}?mode=rw"
-        dbconnection = sqlite3.connect(dbpath, uri=True)
-        dbconnection.row_factory = sqlite3.Row
+        dbconnection = open_database(f"{datadir}/{dbname}", "rw")
 
         logger.info(f"Database '{datadir}/{dbname}' opened successfully")
 
     except sqlite3.OperationalError:
-        dbconnection = sqlite3.connect(f"{datadir}/{dbname}")
-        dbconnection.row_factory = sqlite3.Row
+        dbconnection = open_database(f"{datadir}/{dbname}")
         dbcursor = dbconnection.cursor()
         logger.info(f"Database '{datadir}/{dbname}' created successfully")
 
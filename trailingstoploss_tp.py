@@ -13,8 +13,13 @@ from pathlib import Path
 
 from helpers.logging import Logger, NotificationHandler
 from helpers.database import (
-    get_next_process_time,
-    set_next_process_time
+    commit,
+    fetch_one,
+    flush,
+    open_database,
+    replace_row,
+    write_batch,
+    ProcessScheduler
 )
 from helpers.misc import (
     get_round_digits,
@@ -22,14 +27,18 @@ from helpers.misc import (
     wait_time_interval
 )
 from helpers.threecommas import (
+    clear_threecommas_deal_market_orders,
     close_threecommas_deal,
+    get_threecommas_bots_by_id,
     get_threecommas_deal_order_id,
     get_threecommas_deal_order_status,
     init_threecommas_api,
+    init_threecommas_websocket,
     threecommas_deal_add_funds,
     threecommas_deal_cancel_order,
     threecommas_get_data_for_adding_funds
 )
+from helpers.threecommas_dealstore import ThreeCommasDealStore
 from helpers.trailingstoploss_tp import (
     calculate_safety_order,
     calculate_sl_percentage,
@@ -66,6 +75,7 @@ def load_config():
         "notify-trailing-start": True,
         "notify-trailing-update": True,
         "notify-trailing-reset": True,
+        "use-websocket": False,
     }
 
     cfgsectionprofitconfig = list()
@@ -213,6 +223,14 @@ def upgrade_config(thelogger, cfg):
 
         logger.info("Upgraded the configuration file (3c-apikey-path)")
 
+    if not cfg.has_option("settings", "use-websocket"):
+        cfg.set("settings", "use-websocket", "False")
+
+        with open(f"{datadir}/{program}.ini", "w+", encoding = "utf-8") as cfgfile:
+            cfg.write(cfgfile)
+
+        thelogger.info("Upgraded the configuration file (use-websocket)")
+
     return cfg
 
 
@@ -641,6 +659,8 @@ def evaluate_mp_stoploss(bot_data, deal_data, current_profit_percentage, last_re
 
     if current_profit_percentage <= last_readable_sl_percentage:
         if current_profit_percentage >= float(deal_data["min_profit_percentage"]):
+            # Store the state first, closing the deal can't be undone
+            flush(db)
             if close_threecommas_deal(logger, api, deal_data["id"], deal_data["pair"]):
                 logger.info(
                     f"\"{bot_data['name']}\": {deal_data['pair']}/{deal_data['id']}: "
@@ -692,7 +712,9 @@ def evaluate_deal_orders(bot_data, deal_data, deal_db_data, order_db_data, total
                 return requiremonitoring, refreshdealdbdata
 
             # Profit has passed the SO boundary, time to cancel the pending order
-            # and start over with trailing
+            # and start over with trailing. Store the state first, the cancel can't
+            # be undone.
+            flush(db)
             if threecommas_deal_cancel_order(
                 logger, api, deal_data["id"], order_db_data["order_id"]
             ):
@@ -776,24 +798,16 @@ def remove_closed_deals(bot_id, current_deals):
     """Remove all deals for the given bot, except the ones in the list."""
 
     if current_deals:
-        # Remove start and end square bracket so we can properly use it
-        current_deals_str = str(current_deals)[1:-1]
+        logger.debug(f"Deleting old deals from bot {bot_id} except {current_deals}")
 
-        logger.debug(f"Deleting old deals from bot {bot_id} except {current_deals_str}")
-        db.execute(
-            f"DELETE FROM deal_profit WHERE botid = {bot_id} "
-            f"AND dealid NOT IN ({current_deals_str})"
-        )
-        db.execute(
-            f"DELETE FROM deal_safety WHERE botid = {bot_id} "
-            f"AND dealid NOT IN ({current_deals_str})"
-        )
-        db.execute(
-            f"DELETE FROM pending_orders WHERE botid = {bot_id} "
-            f"AND dealid NOT IN ({current_deals_str})"
-        )
+        placeholders = ", ".join("?" for _ in current_deals)
+        for table in ("deal_profit", "deal_safety", "pending_orders"):
+            db.execute(
+                f"DELETE FROM {table} WHERE botid = ? AND dealid NOT IN ({placeholders})",
+                (bot_id, *current_deals)
+            )
 
-        db.commit()
+        commit(db)
 
 
 def remove_all_deals(bot_id):
@@ -803,25 +817,18 @@ def remove_all_deals(bot_id):
         f"Removing all stored deals for bot {bot_id}."
     )
 
-    db.execute(
-        f"DELETE FROM deal_profit WHERE botid = {bot_id}"
-    )
-    db.execute(
-        f"DELETE FROM deal_safety WHERE botid = {bot_id}"
-    )
-    db.execute(
-        f"DELETE FROM pending_orders WHERE botid = {bot_id}"
-    )
+    for table in ("deal_profit", "deal_safety", "pending_orders"):
+        db.execute(f"DELETE FROM {table} WHERE botid = ?", (bot_id,))
 
-    db.commit()
+    commit(db)
 
 
 def get_bot_next_process_time(bot_id):
     """Get the next processing time for the specified bot."""
 
-    dbrow = cursor.execute(
-            f"SELECT next_processing_timestamp FROM bots WHERE botid = {bot_id}"
-        ).fetchone()
+    dbrow = fetch_one(
+        db, "SELECT next_processing_timestamp FROM bots WHERE botid = ?", (bot_id,)
+    )
 
     nexttime = int(time.time())
     if dbrow is not None:
@@ -841,132 +848,128 @@ def set_bot_next_process_time(bot_id, new_time):
         f"{unix_timestamp_to_string(new_time, '%Y-%m-%d %H:%M:%S')}."
     )
 
-    db.execute(
-        f"REPLACE INTO bots (botid, next_processing_timestamp) "
-        f"VALUES ({bot_id}, {new_time})"
-    )
-
-    db.commit()
+    replace_row(db, "bots", {"botid": bot_id, "next_processing_timestamp": new_time})
 
 
 def add_deal_in_db(deal_id, bot_id):
     """Add default data for deal (short or long) to database."""
 
     db.execute(
-        f"INSERT INTO deal_profit ("
-        f"dealid, "
-        f"botid, "
-        f"last_profit_percentage, "
-        f"last_readable_sl_percentage, "
-        f"last_readable_tp_percentage "
-        f") VALUES ("
-        f"{deal_id}, {bot_id}, {0.0}, {0.0}, {0.0}"
-        f")"
+        "INSERT INTO deal_profit ("
+        "dealid, "
+        "botid, "
+        "last_profit_percentage, "
+        "last_readable_sl_percentage, "
+        "last_readable_tp_percentage "
+        ") VALUES (?, ?, ?, ?, ?)",
+        (deal_id, bot_id, 0.0, 0.0, 0.0)
     )
     db.execute(
-        f"INSERT INTO deal_safety ("
-        f"dealid, "
-        f"botid, "
-        f"last_profit_percentage, "
-        f"add_funds_percentage, "
-        f"next_so_percentage, "
-        f"filled_so_count, "
-        f"shift_percentage "
-        f") VALUES ("
-        f"{deal_id}, {bot_id}, {0.0}, {0.0}, {0.0}, {0}, {0.0}"
-        f")"
+        "INSERT INTO deal_safety ("
+        "dealid, "
+        "botid, "
+        "last_profit_percentage, "
+        "add_funds_percentage, "
+        "next_so_percentage, "
+        "filled_so_count, "
+        "shift_percentage "
+        ") VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (deal_id, bot_id, 0.0, 0.0, 0.0, 0, 0.0)
     )
 
     logger.debug(
         f"Added deal {deal_id} on bot {bot_id} as new deal to db."
     )
 
-    db.commit()
+    commit(db)
 
 
 def update_profit_in_db(deal_id, tp_percentage, readable_sl_percentage, readable_tp_percentage):
     """Update deal profit related fields (short or long) in database."""
 
     db.execute(
-        f"UPDATE deal_profit SET "
-        f"last_profit_percentage = {tp_percentage}, "
-        f"last_readable_sl_percentage = {readable_sl_percentage}, "
-        f"last_readable_tp_percentage = {readable_tp_percentage} "
-        f"WHERE dealid = {deal_id}"
+        "UPDATE deal_profit SET "
+        "last_profit_percentage = ?, "
+        "last_readable_sl_percentage = ?, "
+        "last_readable_tp_percentage = ? "
+        "WHERE dealid = ?",
+        (tp_percentage, readable_sl_percentage, readable_tp_percentage, deal_id)
     )
 
-    db.commit()
+    commit(db)
 
 
 def update_safetyorder_in_db(deal_id, filled_so_count, next_so_percentage, shift_percentage):
     """Update deal safety related fields (short or long) in database."""
 
     db.execute(
-        f"UPDATE deal_safety SET "
-        f"next_so_percentage = {next_so_percentage}, "
-        f"filled_so_count = {filled_so_count}, "
-        f"shift_percentage = {shift_percentage} "
-        f"WHERE dealid = {deal_id}"
+        "UPDATE deal_safety SET "
+        "next_so_percentage = ?, "
+        "filled_so_count = ?, "
+        "shift_percentage = ? "
+        "WHERE dealid = ?",
+        (next_so_percentage, filled_so_count, shift_percentage, deal_id)
     )
 
-    db.commit()
+    commit(db)
 
 
 def update_safetyorder_monitor_in_db(deal_id, last_profit_percentage, add_funds_percentage):
     """Update deal safety monitor fields (short or long) in database."""
 
     db.execute(
-        f"UPDATE deal_safety SET "
-        f"last_profit_percentage = {last_profit_percentage}, "
-        f"add_funds_percentage = {add_funds_percentage} "
-        f"WHERE dealid = {deal_id}"
+        "UPDATE deal_safety SET "
+        "last_profit_percentage = ?, "
+        "add_funds_percentage = ? "
+        "WHERE dealid = ?",
+        (last_profit_percentage, add_funds_percentage, deal_id)
     )
 
-    db.commit()
+    commit(db)
 
 
 def add_pending_order_in_db(deal_id, bot_id, active_order_id, cancel_at_percentage, number_of_so, next_so_percentage, shift_percentage):
     """Add deal safety order (short or long) in database."""
 
     db.execute(
-        f"INSERT INTO pending_orders ("
-        f"dealid, "
-        f"botid, "
-        f"order_id, "
-        f"cancel_at_percentage, "
-        f"number_of_so, "
-        f"next_so_percentage, "
-        f"shift_percentage "
-        f") VALUES ("
-        f"{deal_id}, {bot_id}, '{active_order_id}', {cancel_at_percentage}, {number_of_so}, {next_so_percentage}, {shift_percentage}"
-        f")"
+        "INSERT INTO pending_orders ("
+        "dealid, "
+        "botid, "
+        "order_id, "
+        "cancel_at_percentage, "
+        "number_of_so, "
+        "next_so_percentage, "
+        "shift_percentage "
+        ") VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (
+            deal_id, bot_id, str(active_order_id), cancel_at_percentage, number_of_so,
+            next_so_percentage, shift_percentage
+        )
     )
 
-    db.commit()
+    commit(db)
 
 
 def update_pending_order_in_db(deal_id, old_order_id, new_order_id):
     """Update the id of the current open active order"""
 
     db.execute(
-        f"UPDATE pending_orders SET "
-        f"order_id = '{new_order_id}' "
-        f"WHERE dealid = {deal_id} "
-        f"AND order_id = '{old_order_id}'"
+        "UPDATE pending_orders SET order_id = ? WHERE dealid = ? AND order_id = ?",
+        (str(new_order_id), deal_id, str(old_order_id))
     )
 
-    db.commit()
+    commit(db)
 
 
 def remove_pending_order_from_db(deal_id, order_id):
     """Remove deal safety order (short or long) from database."""
 
     db.execute(
-        f"DELETE FROM pending_orders WHERE dealid = {deal_id} "
-        f"AND order_id = '{order_id}'"
+        "DELETE FROM pending_orders WHERE dealid = ? AND order_id = ?",
+        (deal_id, str(order_id))
     )
 
-    db.commit()
+    commit(db)
 
 
 def handle_deal_safety(bot_data, deal_data, deal_db_data, safety_config, current_profit_percentage):
@@ -1059,6 +1062,8 @@ def handle_deal_safety(bot_data, deal_data, deal_db_data, safety_config, current
                     logger, bot_data, deal_data, limitdata, quantity
                 )
 
+                # Store the state first, the order can't be undone
+                flush(db)
                 if threecommas_deal_add_funds(
                     logger, api, deal_data["pair"], deal_data["id"], quantity, limitprice
                 ):
@@ -1162,15 +1167,12 @@ def open_tsl_db():
 
     try:
         dbname = f"{program}.sqlite3"
-        dbpath = f"file:{datadir}/{dbname}?mode=rw"
-        dbconnection = sqlite3.connect(dbpath, uri=True)
-        dbconnection.row_factory = sqlite3.Row
+        dbconnection = open_database(f"{datadir}/{dbname}", "rw")
 
         logger.info(f"Database '{datadir}/{dbname}' opened successfully")
 
     except sqlite3.OperationalError:
-        dbconnection = sqlite3.connect(f"{datadir}/{dbname}")
-        dbconnection.row_factory = sqlite3.Row
+        dbconnection = open_database(f"{datadir}/{dbname}")
         dbcursor = dbconnection.cursor()
         logger.info(f"Database '{datadir}/{dbname}' created successfully")
 
@@ -1284,6 +1286,9 @@ program = Path(__file__).stem
 # Parse and interpret options.
 parser = argparse.ArgumentParser(description="Cyberjunky's 3Commas bot helper.")
 parser.add_argument("-d", "--datadir", help="data directory to use", type=str)
+parser.add_argument(
+    "-s", "--sharedir", help="directory to use for shared files", type=str
+)
 
 args = parser.parse_args()
 if args.datadir:
@@ -1291,6 +1296,12 @@ if args.datadir:
 else:
     datadir = os.getcwd()
 
+# pylint: disable-msg=C0103
+if args.sharedir:
+    sharedir = args.sharedir
+else:
+    sharedir = None
+
 # Create or load configuration file
 config = load_config()
 if not config:
@@ -1331,7 +1342,7 @@ else:
     logger.info(f"Loaded configuration from '{datadir}/{program}.ini'")
 
 # Initialize 3Commas API
-api = init_threecommas_api(logger, config)
+api = init_threecommas_api(logger, config, sharedir)
 if not api:
     sys.exit(0)
 
@@ -1342,6 +1353,24 @@ cursor = db.cursor()
 # Upgrade the database if needed
 upgrade_trailingstoploss_tp_db()
 
+# Next processing time of each bot
+scheduler = ProcessScheduler(db, "bots", "botid")
+
+# Keep the active deals up to date using the 3Commas websocket instead of polling
+dealstore = None
+websocket = None
+if config.getboolean("settings", "use-websocket", fallback=False):
+    dealstore = ThreeCommasDealStore(logger)
+    websocket = init_threecommas_websocket(
+        logger, config, dealstore.on_event, dealstore.on_subscribed, api
+    )
+    if not websocket:
+        sys.exit(0)
+    websocket.start_listener(seperate_thread = True)
+
+# Bots with deals updated by the websocket, to process right away
+eventbots = set()
+
 # TrailingStopLoss and TakeProfit %
 while True:
 
@@ -1362,6 +1391,16 @@ while True:
     # Current time to determine which bots to process
     starttime = int(time.time())
 
+    # Market orders of the deals are fetched again each pass
+    clear_threecommas_deal_market_orders(api)
+
+    # Only the bots of the configured sections are scheduled
+    scheduler.keep(
+        bot
+        for section in config.sections() if section.startswith("tsl_tp_")
+        for bot in json.loads(config.get(section, "botids"))
+    )
+
     for section in config.sections():
         if section.startswith("tsl_tp_"):
             # Bot configuration for section
@@ -1379,47 +1418,67 @@ while True:
                 )
                 continue
 
-            # Walk through all bots configured
+            # Determine the bots which must be processed
+            duebots = []
             for bot in botids:
-                nextprocesstime = get_next_process_time(db, "bots", "botid", bot)
+                nextprocesstime = scheduler.get(bot)
 
                 # Only process the bot if it's time for the next interval, or
                 # time exceeds the check interval (clock has changed somehow)
-                if starttime >= nextprocesstime or (
+                if int(bot) in eventbots or starttime >= nextprocesstime or (
                         abs(nextprocesstime - starttime) > checkinterval
                 ):
-                    boterror, botdata = api.request(
-                        entity="bots",
-                        action="show",
-                        action_id=str(bot),
+                    duebots.append(bot)
+                else:
+                    logger.debug(
+                        f"Bot {bot} will be processed after "
+                        f"{unix_timestamp_to_string(nextprocesstime, '%Y-%m-%d %H:%M:%S')}."
                     )
+
+            # Only fetch the bots of which the deals are not known from the websocket. As a
+            # safety net, those are also fetched again each check-interval.
+            fetchbots = duebots
+            if dealstore is not None:
+                dealstore.check_gap(websocket.get_last_message_time())
+                fetchbots = [bot for bot in duebots if dealstore.needs_sync(bot, checkinterval)]
+
+            # Walk through all bots which must be processed, fetched at once
+            botsdata, boterrors = get_threecommas_bots_by_id(
+                logger, api, fetchbots, max_age=10
+            )
+            for bot in duebots:
+                botdata = botsdata.get(int(bot))
+                if dealstore is not None:
                     if botdata:
-                        try:
+                        dealstore.sync_bot(botdata)
+                    elif bot not in fetchbots:
+                        botdata = dealstore.get_bot(bot)
+                if botdata:
+                    try:
+                        # All database writes of the bot are committed at once
+                        with write_batch(db):
                             bot_deals_to_monitor = process_deals(
-                                botdata, sectionprofitconfig, sectionsafetyconfig, sectionsafetymode
+                                botdata, sectionprofitconfig, sectionsafetyconfig,
+                                sectionsafetymode
                             )
 
-                            # Determine new time to process this bot, based on the monitored deals
+                            # Determine new time to process this bot, based on the
+                            # monitored deals
                             newtime = starttime + (
                                 checkinterval if bot_deals_to_monitor == 0 else monitorinterval
                             )
-                            set_next_process_time(db, "bots", "botid", bot, newtime)
-
-                            deals_to_monitor += bot_deals_to_monitor
-                        except Exception as err:
-                            logger.error(err)
-                            logger.error(traceback.print_exc())
-                            logger.error(traceback.print_tb(err.__traceback__))
-                            sys.exit(0)
-                    else:
-                        if boterror and "msg" in boterror:
-                            logger.error(f"Error occurred updating bots: {boterror['msg']}")
-                        else:
-                            logger.error("Error occurred updating bots")
+                            scheduler.set(bot, newtime)
+
+                        deals_to_monitor += bot_deals_to_monitor
+                    except Exception as err:
+                        logger.error(err)
+                        logger.error(traceback.print_exc())
+                        logger.error(traceback.print_tb(err.__traceback__))
+                        sys.exit(0)
                 else:
-                    logger.debug(
-                        f"Bot {bot} will be processed after "
-                        f"{unix_timestamp_to_string(nextprocesstime, '%Y-%m-%d %H:%M:%S')}."
+                    logger.error(
+                        f"Error occurred updating bot {bot}: "
+                        f"{boterrors.get(int(bot), 'unknown error')}"
                     )
         elif section not in ("settings"):
             logger.warning(
@@ -1427,6 +1486,20 @@ while True:
                 False
             )
 
-    timeint = checkinterval if deals_to_monitor == 0 else monitorinterval
-    if not wait_time_interval(logger, notification, timeint, False):
+    scheduler.persist()
+
+    # Wait until the next bot is due, at most the interval
+    timeint = scheduler.get_wait_time(
+        checkinterval if deals_to_monitor == 0 else monitorinterval
+    )
+    # With the websocket, stop waiting as soon as deals have been updated
+    if not wait_time_interval(
+        logger, notification, timeint, False,
+        dealstore.wait_for_events if dealstore is not None else None
+    ):
         break
+
+    if dealstore is not None:
+        eventbots = dealstore.pop_events()
+        if eventbots:
+            logger.debug(f"Deals updated by websocket for bot(s) {sorted(eventbots)}")
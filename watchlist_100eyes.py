@@ -12,13 +12,13 @@ from pathlib import Path
 from telethon import TelegramClient, events
 
 from helpers.logging import Logger, NotificationHandler
-from helpers.misc import format_pair
 from helpers.threecommas import (
-    get_threecommas_account_marketcode,
     init_threecommas_api,
+    init_threecommas_async_api,
     load_blacklist,
-    trigger_threecommas_bot_deal,
+    prefetch_marketcodes
 )
+from helpers.watchlist import process_botlist
 
 
 def load_config():
@@ -74,55 +74,6 @@ def upgrade_config(cfg):
     return cfg
 
 
-def watchlist_100eyes_deal(thebot, base, coin):
-    """Check pair and trigger the bot deal."""
-    triggerbase = base
-    triggercoin = coin
-    logger.debug("Trigger base coin: %s" % triggerbase)
-
-    # Store some bot settings
-    base = thebot["pairs"][0].split("_")[0]
-    exchange = thebot["account_name"]
-    minvolume = thebot["min_volume_btc_24h"]
-
-    logger.debug("Base coin for this bot: %s" % base)
-    logger.debug("Minimal 24h volume in BTC for this bot: %s" % minvolume)
-
-    # Get marketcode (exchange) from account
-    marketcode = get_threecommas_account_marketcode(logger, api, thebot["account_id"])
-    if not marketcode:
-        return
-
-    logger.info("Bot exchange: %s (%s)" % (exchange, marketcode))
-
-    skipchecks = False
-    blacklist = load_blacklist(logger, api, blacklistfile)
-    if len(blacklistfile):
-        skipchecks = True
-
-    # Construct pair based on bot settings and marketcode (BTC stays BTC, but USDT can become BUSD)
-    pair = format_pair(marketcode, base, triggercoin)
-
-    # Check if pair is on 3Commas blacklist
-    if pair in blacklist:
-        logger.debug(
-            "This pair is on your 3Commas blacklist and was skipped: %s" % pair, True
-        )
-        return
-
-    # Check if pair is in bot's pairlist
-    if pair not in thebot["pairs"]:
-        logger.debug(
-            "This pair is not in bot's pairlist, and was skipped: %s" % pair,
-            True,
-        )
-        return
-
-    # We have valid pair for our bot so we trigger a deal
-    logger.info("Triggering your 3Commas bot")
-    trigger_threecommas_bot_deal(logger, api, thebot, pair, skipchecks)
-
-
 def parse_line(msgline):
     """Does line contains pair and signal, if so extract them."""
 
@@ -208,6 +159,18 @@ api = init_threecommas_api(logger, config)
 if not api:
     sys.exit(0)
 
+# Initialize the asyncio 3Commas API, used for handling the Telegram events
+asyncapi = init_threecommas_async_api(logger, config, None, api.metrics, api.cache)
+if not asyncapi:
+    sys.exit(0)
+
+# Prefetch marketcodes for all bots
+botids = json.loads(config.get("settings", "usdt-botids")) + json.loads(config.get("settings", "btc-botids"))
+marketcodes = prefetch_marketcodes(logger, api, botids)
+
+# Prefetch blacklists
+blacklist = load_blacklist(logger, api, blacklistfile)
+
 # Get trigger settings from config
 triggers = list(config["triggers"].keys())
 
@@ -257,28 +220,9 @@ async def callback(event):
                 logger.error("Error the base of pair '%s' is not supported yet!" % pair)
                 continue
 
-            for bot in botids:
-                if bot == 0:
-                    logger.debug("No valid botid configured for '%s', skipping" % base)
-                    continue
-
-                error, data = api.request(
-                    entity="bots",
-                    action="show",
-                    action_id=str(bot),
-                )
-
-                if data:
-                    await client.loop.run_in_executor(
-                        None, watchlist_100eyes_deal, data, base, coin
-                    )
-                else:
-                    if error and "msg" in error:
-                        logger.error(
-                            "Error occurred triggering bots: %s" % error["msg"]
-                        )
-                    else:
-                        logger.error("Error occurred triggering bots")
+            await process_botlist(
+                logger, asyncapi, blacklistfile, blacklist, marketcodes, botids, coin, "LONG"
+            )
         else:
             logger.info("Not a crypto trigger line")
 
@@ -13,10 +13,11 @@ from telethon import TelegramClient, events
 from helpers.logging import Logger, NotificationHandler
 from helpers.threecommas import (
     init_threecommas_api,
+    init_threecommas_async_api,
     load_blacklist,
     prefetch_marketcodes
 )
-from watchlist import process_botlist
+from helpers.watchlist import process_botlist
 
 
 def load_config():
@@ -113,8 +114,8 @@ async def handle_hodloo_event(category, event):
         )
         return
 
-    await client.loop.run_in_executor(
-        None, process_botlist, logger, api, blacklistfile, blacklist, marketcodes, botids, coin, "LONG"
+    await process_botlist(
+        logger, asyncapi, blacklistfile, blacklist, marketcodes, botids, coin, "LONG"
     )
 
 
@@ -130,6 +131,9 @@ program = Path(__file__).stem
 # Parse and interpret options.
 parser = argparse.ArgumentParser(description="Cyberjunky's 3Commas bot helper.")
 parser.add_argument("-d", "--datadir", help="data directory to use", type=str)
+parser.add_argument(
+    "-s", "--sharedir", help="directory to use for shared files", type=str
+)
 parser.add_argument("-b", "--blacklist", help="blacklist to use", type=str)
 
 args = parser.parse_args()
@@ -138,6 +142,12 @@ if args.datadir:
 else:
     datadir = os.getcwd()
 
+# pylint: disable-msg=C0103
+if args.sharedir:
+    sharedir = args.sharedir
+else:
+    sharedir = None
+
 # pylint: disable-msg=C0103
 if args.blacklist:
     blacklistfile = f"{datadir}/{args.blacklist}"
@@ -199,10 +209,15 @@ if mode not in ("Telegram", "Websocket"):
     sys.exit(0)
 
 # Initialize 3Commas API
-api = init_threecommas_api(logger, config)
+api = init_threecommas_api(logger, config, sharedir)
 if not api:
     sys.exit(0)
 
+# Initialize the asyncio 3Commas API, used for handling the Telegram events
+asyncapi = init_threecommas_async_api(logger, config, sharedir, api.metrics, api.cache)
+if not asyncapi:
+    sys.exit(0)
+
 # Prefetch marketcodes for all bots
 botids = list()
 for category in ("5", "10"):
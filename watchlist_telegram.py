@@ -23,6 +23,7 @@ from helpers.smarttrade import (
 from helpers.threecommas import (
     get_threecommas_currency_rate,
     init_threecommas_api,
+    init_threecommas_async_api,
     load_blacklist,
     prefetch_marketcodes
 )
@@ -182,9 +183,8 @@ async def handle_custom_event(event):
         )
         return
 
-    await client.loop.run_in_executor(
-        None, process_botlist, logger, api, blacklistfile, blacklist, marketcodecache,
-                                botids, coin, trade
+    await process_botlist(
+        logger, asyncapi, blacklistfile, blacklist, marketcodecache, botids, coin, trade
     )
 
 
@@ -429,9 +429,8 @@ async def handle_hodloo_event(category, event):
         )
         return
 
-    await client.loop.run_in_executor(
-        None, process_botlist, logger, api, blacklistfile, blacklist, marketcodecache,
-                                botids, coin, "LONG"
+    await process_botlist(
+        logger, asyncapi, blacklistfile, blacklist, marketcodecache, botids, coin, "LONG"
     )
 
 
@@ -577,6 +576,11 @@ api = init_threecommas_api(logger, config)
 if not api:
     sys.exit(0)
 
+# Initialize the asyncio 3Commas API, used for handling the Telegram events
+asyncapi = init_threecommas_async_api(logger, config, None, api.metrics, api.cache)
+if not asyncapi:
+    sys.exit(0)
+
 # Code to enable testing instead of waiting for events.
 #run_tests()
 #sys.exit(0)
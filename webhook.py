@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """Cyberjunky's 3Commas bot helpers."""
 import argparse
+import asyncio
 import configparser
 import json
 import os
@@ -15,13 +16,17 @@ from aiohttp import web
 from helpers.logging import Logger, NotificationHandler
 from helpers.misc import format_pair
 from helpers.threecommas import (
-    close_threecommas_deal,
-    control_threecommas_bots,
-    get_threecommas_account_marketcode,
-    get_threecommas_deals,
     init_threecommas_api,
+    init_threecommas_async_api,
     load_blacklist,
-    trigger_threecommas_bot_deal,
+)
+from helpers.threecommas_async import (
+    close_threecommas_deal_async,
+    control_threecommas_bots_async,
+    fetch_threecommas_account_info_async,
+    get_threecommas_active_deals_async,
+    get_threecommas_bots_async,
+    trigger_threecommas_bot_deal_async,
 )
 
 
@@ -87,6 +92,9 @@ parser = argparse.ArgumentParser(description="Cyberjunky's 3Commas bot helper.")
 parser.add_argument(
     "-d", "--datadir", help="directory to use for config and logs files", type=str
 )
+parser.add_argument(
+    "-s", "--sharedir", help="directory to use for shared files", type=str
+)
 parser.add_argument(
     "-b", "--blacklist", help="local blacklist to use instead of 3Commas's", type=str
 )
@@ -97,6 +105,12 @@ if args.datadir:
 else:
     datadir = os.getcwd()
 
+# pylint: disable-msg=C0103
+if args.sharedir:
+    sharedir = args.sharedir
+else:
+    sharedir = None
+
 # pylint: disable-msg=C0103
 if args.blacklist:
     blacklistfile = args.blacklist
@@ -143,7 +157,7 @@ else:
     logger.info(f"Loaded configuration from '{datadir}/{program}.ini'")
 
 
-def webhook_deal(thebot, coin, trade):
+async def webhook_deal(thebot, coin, trade):
     """Check pair and trigger the bot deal."""
 
     # Gather some bot values
@@ -154,10 +168,22 @@ def webhook_deal(thebot, coin, trade):
     logger.debug("Base coin for this bot: %s" % base)
     logger.debug("Minimal 24h volume in BTC for this bot: %s" % minvolume)
 
-    # Get marketcode (exchange) from account
-    marketcode = get_threecommas_account_marketcode(logger, api, thebot["account_id"])
+    # Get marketcode (exchange) from account, the account cache is a (shared) database
+    loop = asyncio.get_running_loop()
+    marketcode = await loop.run_in_executor(
+        None, api.accounts.lookup_marketcode, thebot["account_id"]
+    )
     if not marketcode:
-        return
+        accountdata = await fetch_threecommas_account_info_async(
+            logger, asyncapi, thebot["account_id"]
+        )
+        if not accountdata:
+            return
+
+        await loop.run_in_executor(
+            None, api.accounts.store, thebot["account_id"], accountdata
+        )
+        marketcode = accountdata["market_code"]
 
     logger.info("Bot exchange: %s (%s)" % (exchange, marketcode))
 
@@ -186,14 +212,14 @@ def webhook_deal(thebot, coin, trade):
     if trade == "buy":
         # We have valid pair for our bot so we trigger an open asap action
         logger.info("Triggering your 3Commas bot for buy")
-        trigger_threecommas_bot_deal(logger, api, thebot, pair, skipchecks)
+        await trigger_threecommas_bot_deal_async(logger, asyncapi, thebot, pair, skipchecks)
     else:
         # Find active deal(s) for this bot so we can close deal(s) for pair
-        deals = get_threecommas_deals(logger, api, thebot["id"], "active")
+        deals = await get_threecommas_active_deals_async(logger, asyncapi, thebot["id"])
         if deals:
             for deal in deals:
                 if deal["pair"] == pair:
-                    if close_threecommas_deal(logger, api, deal["id"], pair):
+                    if await close_threecommas_deal_async(logger, asyncapi, deal["id"], pair):
                         logger.info(
                             f"Closed deal (panic_sell) for deal '{deal['id']}' and pair '{pair}'",
                             True
@@ -209,10 +235,15 @@ def webhook_deal(thebot, coin, trade):
 
 
 # Initialize 3Commas API
-api = init_threecommas_api(logger, config)
+api = init_threecommas_api(logger, config, sharedir)
 if not api:
     sys.exit(0)
 
+# Initialize the asyncio 3Commas API, used for handling the webhook calls
+asyncapi = init_threecommas_async_api(logger, config, sharedir, api.metrics, api.cache)
+if not asyncapi:
+    sys.exit(0)
+
 blacklist = load_blacklist(logger, api, blacklistfile)
 
 # Webserver app
@@ -252,21 +283,15 @@ async def handle(request):
             logger.debug(f"Webhook bot command received: {actiontype}")
             botids = json.loads(config.get(f"webhook_{token}", "control-botids"))
 
-            # Walk through the configured bot(s)
-            for botid in botids:
-                error, data = api.request(
-                    entity="bots",
-                    action="show",
-                    action_id=str(botid),
+            # Walk through the configured bot(s), in parallel
+            botsdata = await get_threecommas_bots_async(logger, asyncapi, botids)
+            tasks = []
+            for botid, data in botsdata.items():
+                logger.debug(f"Webhook '{actiontype}' bot with id '{botid}'")
+                tasks.append(
+                    control_threecommas_bots_async(logger, asyncapi, data, actiontype)
                 )
-                if data:
-                    logger.debug(f"Webhook '{actiontype}' bot with id '{botid}'")
-                    control_threecommas_bots(logger, api, data, actiontype)
-                else:
-                    if error and "msg" in error:
-                        logger.error("Error occurred updating bots: %s" % error["msg"])
-                    else:
-                        logger.error("Error occurred updating bots")
+            await asyncio.gather(*tasks)
 
         # Deal actions
         elif actiontype in ["buy", "sell"]:
@@ -301,26 +326,18 @@ async def handle(request):
                 logger.error("Error the base of pair '%s' is not supported yet!" % pair)
                 return web.Response()
 
-            for botid in botids:
-                if botid == 0:
-                    logger.debug("No valid botid configured, skipping")
-                    continue
+            if 0 in botids:
+                logger.debug("No valid botid configured, skipping")
 
-                error, data = api.request(
-                    entity="bots",
-                    action="show",
-                    action_id=str(botid),
-                )
-                if data:
-                    logger.debug(f"Webhook '{actiontype}' bot with id '{botid}'")
-                    webhook_deal(data, coin, actiontype)
-                else:
-                    if error and "msg" in error:
-                        logger.error(
-                            "Error occurred triggering bots: %s" % error["msg"]
-                        )
-                    else:
-                        logger.error("Error occurred triggering bots")
+            # Walk through the configured bot(s), in parallel
+            botsdata = await get_threecommas_bots_async(
+                logger, asyncapi, [botid for botid in botids if botid != 0]
+            )
+            tasks = []
+            for botid, data in botsdata.items():
+                logger.debug(f"Webhook '{actiontype}' bot with id '{botid}'")
+                tasks.append(webhook_deal(data, coin, actiontype))
+            await asyncio.gather(*tasks)
         else:
             logger.error(
                 f"Webhook alert received ignored, unsupported type '{actiontype}'"
@@ -332,8 +349,15 @@ async def handle(request):
     return web.Response(status=403)
 
 
+async def close_asyncapi(application):
+    """Close the connections of the asyncio 3Commas API."""
+
+    await asyncapi.close()
+
+
 # Prepare webhook webserver
 app.router.add_post(f"/{baseurl}", handle)
+app.on_cleanup.append(close_asyncapi)
 logger.info(f"Starting webserver listening to '/{baseurl}'")
 
 # https
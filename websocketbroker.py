@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Cyberjunky's 3Commas bot helpers."""
+import argparse
+import configparser
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from helpers.logging import Logger, NotificationHandler
+from helpers.misc import wait_time_interval
+from helpers.threecommas import init_threecommas_api, init_threecommas_websocket
+from helpers.threecommas_broker import ThreeCommasEventBroker
+from helpers.threecommas_websocket import SocketChannelsTuple
+
+
+def load_config():
+    """Create default or load existing config file."""
+
+    cfg = configparser.ConfigParser()
+    if cfg.read(f"{datadir}/{program}.ini"):
+        return cfg
+
+    cfg["settings"] = {
+        "timezone": "Europe/Amsterdam",
+        "timeinterval": 300,
+        "debug": False,
+        "logrotate": 7,
+        "3c-apikey": "Your 3Commas API Key",
+        "3c-apisecret": "Your 3Commas API Secret",
+        "3c-apikey-path": "Path to your own generated RSA private key, or empty",
+        "broker-address": "/tmp/3commas-events.sock",
+        "queue-size": 1000,
+        "notifications": False,
+        "notify-urls": ["notify-url1"],
+    }
+
+    with open(f"{datadir}/{program}.ini", "w") as cfgfile:
+        cfg.write(cfgfile)
+
+    return None
+
+
+# Start application
+program = Path(__file__).stem
+
+# Parse and interpret options.
+parser = argparse.ArgumentParser(description="Cyberjunky's 3Commas bot helper.")
+parser.add_argument(
+    "-d", "--datadir", help="directory to use for config and logs files", type=str
+)
+
+args = parser.parse_args()
+if args.datadir:
+    datadir = args.datadir
+else:
+    datadir = os.getcwd()
+
+# Create or load configuration file
+config = load_config()
+if not config:
+    # Initialise temp logging
+    logger = Logger(datadir, program, None, 7, False, False)
+    logger.info(
+        f"Created example config file '{datadir}/{program}.ini', edit it and restart the program"
+    )
+    sys.exit(0)
+else:
+    # Handle timezone
+    if hasattr(time, "tzset"):
+        os.environ["TZ"] = config.get(
+            "settings", "timezone", fallback="Europe/Amsterdam"
+        )
+        time.tzset()
+
+    # Init notification handler
+    notification = NotificationHandler(
+        program,
+        config.getboolean("settings", "notifications"),
+        config.get("settings", "notify-urls"),
+    )
+
+    # Initialise logging
+    logger = Logger(
+        datadir,
+        program,
+        notification,
+        int(config.get("settings", "logrotate", fallback=7)),
+        config.getboolean("settings", "debug"),
+        config.getboolean("settings", "notifications"),
+    )
+
+    logger.info(f"Loaded configuration from '{datadir}/{program}.ini'")
+
+# Initialize 3Commas API, to fetch the deals updated while the websocket was disconnected
+api = init_threecommas_api(logger, config)
+if not api:
+    sys.exit(0)
+
+# Start the broker, the helper scripts subscribe to it by setting 3c-websocket-broker
+broker = ThreeCommasEventBroker(
+    logger,
+    config.get("settings", "broker-address"),
+    int(config.get("settings", "queue-size", fallback=1000)),
+)
+broker.start()
+
+# The broker itself must always hold the websocket connection to 3Commas
+config.remove_option("settings", "3c-websocket-broker")
+
+# Initialize 3Commas WebSocket connection, for all channels
+websocket = init_threecommas_websocket(
+    logger,
+    config,
+    {
+        channel: (lambda event, channel=channel: broker.publish(channel, event))
+        for channel in SocketChannelsTuple
+    },
+    broker.publish_subscribed,
+    api,
+)
+if not websocket:
+    sys.exit(0)
+websocket.start_listener(seperate_thread = True)
+
+# Report the drop and lag metrics of the subscribers
+while True:
+
+    # Configuration settings
+    timeint = int(config.get("settings", "timeinterval"))
+
+    stats = broker.get_stats()
+    logger.info(
+        f"Published {stats['published']} events to {len(stats['subscribers'])} subscriber(s)"
+    )
+    for name, subscriberstats in stats["subscribers"].items():
+        logger.info(f"Subscriber '{name}': {json.dumps(subscriberstats)}")
+
+    with open(f"{datadir}/{program}_stats.json", "w", encoding="utf-8") as statsfile:
+        json.dump(stats, statsfile, indent=2)
+
+    if not wait_time_interval(logger, notification, timeint, False):
+        break